@@ -1,5 +1,10 @@
-# admin.py: Django admin configuration (not used for MongoDB collections).
+# admin.py: Django admin configuration (MongoDB collections are not managed here).
 from django.contrib import admin
+from .models import ComparisonJob
 
-# No models to register since MongoDB is accessed directly.
-# If you add Django ORM models, register them here for admin access.
+
+@admin.register(ComparisonJob)
+class ComparisonJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source', 'status', 'processed', 'total', 'rows', 'created_at', 'finished_at')
+    list_filter = ('source', 'status')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class AddressComparisonAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'address_comparison_app'
+
+    def ready(self):
+        # Jobs of a previous server process are recovered when this one serves its first request
+        # (not here: the database may not be migrated yet when ready() runs)
+        from .jobs import recover_jobs_once
+        request_started.connect(recover_jobs_once, dispatch_uid='address_comparison_app.recover_jobs')
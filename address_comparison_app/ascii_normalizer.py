@@ -0,0 +1,111 @@
+# ascii_normalizer.py: Memoized, batch-wise NFKD -> ASCII normalization for address data.
+import os
+import unicodedata
+
+# Upper bound on distinct non-ASCII strings remembered by the shared normalizer
+NORMALIZER_CACHE_SIZE = int(os.environ.get('ASCII_NORMALIZER_CACHE_SIZE', '65536'))
+
+
+def to_ascii(value):
+    """
+    Closest ASCII representation of a string (accents and other non-ASCII characters removed).
+    This is the reference conversion; AsciiNormalizer produces identical output.
+    """
+    return unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+
+
+# AsciiNormalizer applies to_ascii to whole batches of rows or columns. Pure-ASCII strings are
+# returned untouched (NFKD leaves them unchanged) and repeated non-ASCII values (cities,
+# countries, providers, localities...) are converted once and then served from a memo table.
+class AsciiNormalizer:
+    def __init__(self, cache_size=NORMALIZER_CACHE_SIZE):
+        """
+        Initialize with a memo table bounded to cache_size entries (reset when full).
+        """
+        self.cache_size = cache_size
+        self._memo = {}
+
+    def normalize_str(self, value):
+        """
+        Normalize one string through the ASCII fast path and the memo table.
+        """
+        if value.isascii():
+            return value
+        converted = self._memo.get(value)
+        if converted is None:
+            converted = self._remember(value)
+        return converted
+
+    def normalize_value(self, value):
+        """
+        Normalize a string or the string elements of a list; other values pass through unchanged.
+        """
+        if isinstance(value, str):
+            return self.normalize_str(value)
+        if isinstance(value, list):
+            return [self.normalize_str(i) if isinstance(i, str) else i for i in value]
+        return value
+
+    def normalize_records(self, records):
+        """
+        Normalize every string and list-of-string field of a batch of row dicts in place and return the batch.
+        """
+        memo_get = self._memo.get
+        remember = self._remember
+        normalize_value = self.normalize_value
+        for record in records:
+            for key, value in record.items():
+                cls = value.__class__
+                if cls is str:
+                    if not value.isascii():
+                        converted = memo_get(value)
+                        record[key] = converted if converted is not None else remember(value)
+                elif cls is list:
+                    record[key] = [
+                        (i if i.isascii() else (memo_get(i) or remember(i))) if i.__class__ is str else i
+                        for i in value
+                    ]
+                elif value is not None and isinstance(value, (str, list)):
+                    record[key] = normalize_value(value)
+        return records
+
+    def normalize_column(self, values):
+        """
+        Normalize a list of cell values (one column of a columnar batch) and return the new list.
+        """
+        memo_get = self._memo.get
+        remember = self._remember
+        normalize_value = self.normalize_value
+        out = []
+        append = out.append
+        for value in values:
+            if value.__class__ is str:
+                if value.isascii():
+                    append(value)
+                else:
+                    converted = memo_get(value)
+                    append(converted if converted is not None else remember(value))
+            elif value is None:
+                append(value)
+            else:
+                append(normalize_value(value))
+        return out
+
+    def cache_info(self):
+        """
+        Current and maximum size of the memo table.
+        """
+        return {'entries': len(self._memo), 'max_entries': self.cache_size}
+
+    def _remember(self, value):
+        """
+        Convert a non-ASCII string and store the result, resetting the table when it is full.
+        """
+        if len(self._memo) >= self.cache_size:
+            self._memo.clear()
+        converted = self._memo[value] = to_ascii(value)
+        return converted
+
+
+# Process-wide normalizer shared by DataHandler instances
+default_normalizer = AsciiNormalizer()
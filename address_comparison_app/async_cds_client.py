@@ -0,0 +1,239 @@
+"""
+Asyncio CDS API client for Moody's Address Comparison WebApp
+Native async counterpart of cds_client (same lookup API), built on httpx.AsyncClient
+so async Django views under ASGI can await slow CDS lookups without holding a worker thread.
+"""
+import asyncio
+import httpx
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Union
+import logging
+from .cds_config import CDSConfig
+from .cds_client import (
+    Token, AuthenticationError, APIError, InvalidIdentifierError, IdentifierUtils, explode_location_data
+)
+from .http_pool import async_client_registry
+from .response_cache import ResponseCache, CachedError, response_key, shared_response_cache
+from .rate_limit import RETRY_STATUSES, RateLimiter, shared_rate_limiter
+from .token_cache import FileTokenCache
+
+class AsyncTokenService:
+    """
+    Handles async token generation, caching, and refresh for CDS API.
+    Shares TokenService's cross-process FileTokenCache, so sync and async lookups reuse one token.
+    """
+    def __init__(self, config: CDSConfig, client: Optional[httpx.AsyncClient] = None, cache: Optional[FileTokenCache] = None):
+        self.config = config
+        self._token: Optional[Token] = None
+        self._lock = asyncio.Lock()
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(timeout=30)
+        self.cache = cache if cache is not None else FileTokenCache.for_config(config)
+        self.logger = logging.getLogger(__name__)
+    async def get_token(self) -> str:
+        """
+        Get a valid token, refreshing if needed.
+        Reuses the shared cross-process cache; only one coroutine/process refreshes at a time.
+        """
+        token = self._token
+        if token is not None and not token.is_expired:
+            return token.value
+        async with self._lock:
+            if self._token is not None and not self._token.is_expired:
+                return self._token.value
+            if self.cache is None:
+                await self._refresh_token()
+                return self._token.value
+            cached = await self.cache.aload()
+            if cached is not None and not cached.is_expired:
+                self._token = cached
+                return cached.value
+            async with self.cache.async_refresh_lock() as locked:
+                # Another process may have refreshed while we waited for the lock
+                cached = await self.cache.aload() if locked else None
+                if cached is not None and not cached.is_expired:
+                    self._token = cached
+                else:
+                    await self._refresh_token()
+                    await self.cache.astore(self._token)
+            return self._token.value
+    async def invalidate(self) -> None:
+        """Drop the current token (e.g. after a 401) locally and in the shared cache."""
+        token, self._token = self._token, None
+        if self.cache is not None and token is not None:
+            await self.cache.aclear(token)
+    async def _refresh_token(self) -> None:
+        """Request a new token from the CDS token service."""
+        try:
+            payload = {"audience": self.config.api_name}
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Basic {self.config.pe_token}',
+                'Cookie': self.config.cookie_gt
+            }
+            response = await self._client.post(self.config.token_service, headers=headers, json=payload)
+            response.raise_for_status()
+            response_data = response.json()
+            if 'token' not in response_data:
+                raise AuthenticationError("Token not found in response")
+            expires_at = datetime.now() + timedelta(hours=1)
+            self._token = Token(response_data['token'], expires_at)
+            self.logger.info("Token refreshed successfully")
+        except httpx.HTTPError as e:
+            self.logger.error(f"Failed to generate token: {e}")
+            raise AuthenticationError(f"Token generation failed: {e}")
+        except (KeyError, ValueError) as e:
+            self.logger.error(f"Invalid token response: {e}")
+            raise AuthenticationError(f"Invalid token response: {e}")
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client if this service created it."""
+        if self._owns_client:
+            await self._client.aclose()
+    async def __aenter__(self): return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb): await self.aclose()
+
+class AsyncCDSService:
+    """Async service for interacting with the CDS API for entity and BVD lookups."""
+    def __init__(self, config: CDSConfig, token_service: AsyncTokenService, client: Optional[httpx.AsyncClient] = None,
+                 cache: Optional[ResponseCache] = None, rate_limiter: Optional[RateLimiter] = None):
+        self.config = config
+        self.token_service = token_service
+        self._owns_client = client is None
+        self._client = client or httpx.AsyncClient(timeout=30)
+        self.cache = cache if cache is not None else shared_response_cache(config)
+        self.rate_limiter = rate_limiter or shared_rate_limiter(config)
+        self.logger = logging.getLogger(__name__)
+    async def lookup_by_entity_id(self, entity_id: int) -> Dict[str, Any]:
+        """Lookup entity data by numeric entity ID."""
+        if not isinstance(entity_id, int) or entity_id <= 0:
+            raise ValueError("Entity ID must be a positive integer")
+        return await self._get_locations({"entityid": entity_id}, f"Entity ID {entity_id}")
+    async def lookup_by_bvd_id(self, bvd_id: str) -> Dict[str, Any]:
+        """Lookup entity data by BVD ID."""
+        if not isinstance(bvd_id, str) or not bvd_id.strip():
+            raise ValueError("BVD ID must be a non-empty string")
+        return await self._get_locations({"bvdid": bvd_id}, f"BVD ID {bvd_id}")
+    async def lookup_value(self, identifier: Union[str, int], refresh: bool = False) -> Dict[str, Any]:
+        """Universal lookup by identifier (entity ID or BVD ID), sharing the sync client's response cache."""
+        identifier_type, value = IdentifierUtils.normalize_identifier(identifier)
+        key = response_key(self.config, identifier_type, value)
+        if self.cache is not None and not refresh:
+            hit, cached = self.cache.get(key)
+            if hit:
+                if isinstance(cached, CachedError):
+                    raise APIError(cached.message, status_code=cached.status_code)
+                return cached
+        try:
+            if identifier_type == "entity_id":
+                result = await self.lookup_by_entity_id(value)
+            elif identifier_type == "bvd_id":
+                result = await self.lookup_by_bvd_id(value)
+            else:
+                raise InvalidIdentifierError(f"Unsupported identifier type: {identifier_type}")
+        except APIError as e:
+            if self.cache is not None and e.status_code == 404:
+                self.cache.set_negative(key, str(e), e.status_code)
+            raise
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+    async def _get_locations(self, params: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """
+        GET the locations endpoint through the shared rate limiter (adaptive concurrency and token bucket).
+        Retries 429/502/503/504 and connection failures with jittered backoff (honoring Retry-After),
+        then maps failures to CDS client errors.
+        """
+        url = f"{self.config.base_url_cds}legalentities/firmographics/locations"
+        retry = self.rate_limiter.retry
+        attempt = 0
+        while True:
+            token = await self.token_service.get_token()
+            headers = {
+                'Authorization': f'Bearer {token}',
+                'Cookie': self.config.cookie_cds,
+                'Accept': 'application/json'
+            }
+            try:
+                async with self.rate_limiter.aslot() as slot:
+                    response = await self._client.get(url, headers=headers, params=params)
+                    slot.throttled = response.status_code in RETRY_STATUSES
+            except httpx.TransportError as e:
+                if not retry.should_retry(attempt, None):
+                    self.logger.error(f"Request failed for {label}: {e}")
+                    raise APIError(f"Request failed: {e}")
+                delay = self.rate_limiter.backoff(attempt)
+                self.logger.warning(f"Request failed for {label} ({e}); retrying in {delay:.2f}s")
+            else:
+                if not retry.should_retry(attempt, response.status_code):
+                    break
+                delay = self.rate_limiter.backoff(attempt, response.headers.get('Retry-After'))
+                self.logger.warning(f"CDS returned {response.status_code} for {label}; retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+        try:
+            response.raise_for_status()
+            result = response.json()
+            self.logger.info(f"Successfully retrieved data for {label}")
+            return result
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 401:
+                await self.token_service.invalidate()
+                raise AuthenticationError("Invalid or expired token")
+            elif e.response.status_code == 404:
+                raise APIError(f"{label} not found", status_code=404)
+            else:
+                raise APIError(f"HTTP error: {e}", status_code=e.response.status_code)
+        except ValueError as e:
+            self.logger.error(f"Invalid response format: {e}")
+            raise APIError(f"Invalid response format: {e}")
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client if this service created it."""
+        if self._owns_client:
+            await self._client.aclose()
+    async def __aenter__(self): return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb): await self.aclose()
+
+class AsyncCDSClient:
+    """
+    Async client for CDS operations with support for both Entity ID and BVD ID.
+    Token and CDS services use the event loop's shared httpx.AsyncClient (see async_client_registry),
+    so connections are pooled across requests. Must be created inside a running event loop.
+    """
+    def __init__(self, config: Optional[CDSConfig] = None, max_concurrency: Optional[int] = None):
+        self.config = config or CDSConfig.from_env()
+        self.max_concurrency = max(1, max_concurrency or self.config.max_workers)
+        self._client = async_client_registry.client_for(self.config)
+        self.token_service = AsyncTokenService(self.config, self._client)
+        self.cds_service = AsyncCDSService(self.config, self.token_service, self._client)
+        self.logger = logging.getLogger(__name__)
+    async def lookup_entity(self, identifier: Union[str, int], refresh: bool = False) -> Dict[str, Any]:
+        """Universal lookup for both entity ID and BVD ID (``refresh`` bypasses the response cache)."""
+        return await self.cds_service.lookup_value(identifier, refresh=refresh)
+    async def lookup_by_entity_id(self, entity_id: int) -> Dict[str, Any]:
+        """Lookup by entity ID only."""
+        return await self.cds_service.lookup_by_entity_id(entity_id)
+    async def lookup_by_bvd_id(self, bvd_id: str) -> Dict[str, Any]:
+        """Lookup by BVD ID only."""
+        return await self.cds_service.lookup_by_bvd_id(bvd_id)
+    async def lookup_entity_as_dataframe(self, identifier: Union[str, int], refresh: bool = False) -> pd.DataFrame:
+        """Lookup and return results as a DataFrame."""
+        result = await self.lookup_entity(identifier, refresh=refresh)
+        return explode_location_data(result)
+    async def lookup_multiple_entities(self, identifiers: List[Union[str, int]]) -> Dict[Union[str, int], Dict[str, Any]]:
+        """Lookup multiple entities concurrently, at most ``max_concurrency`` in flight, in input order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async def lookup(identifier):
+            async with semaphore:
+                try:
+                    return await self.lookup_entity(identifier)
+                except Exception as e:
+                    self.logger.error(f"Failed to lookup identifier {identifier}: {e}")
+                    return {"error": str(e)}
+        results = await asyncio.gather(*(lookup(identifier) for identifier in identifiers))
+        return dict(zip(identifiers, results))
+    async def aclose(self) -> None:
+        """The HTTP client is shared per event loop; it is closed by async_client_registry.aclose()."""
+        pass
+    async def __aenter__(self): return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb): await self.aclose()
@@ -4,11 +4,18 @@ Handles authentication, token management, and entity/BVD lookups.
 """
 import requests
 import pandas as pd
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List, Union
+from dataclasses import dataclass, replace
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
 import logging
 from .cds_config import CDSConfig
+from .token_cache import FileTokenCache
+from .http_pool import session_registry
+from .response_cache import ResponseCache, CachedError, response_key, shared_response_cache
+from .rate_limit import RateLimiter, RETRY_STATUSES, shared_rate_limiter
 
 @dataclass
 class Token:
@@ -28,7 +35,9 @@ class AuthenticationError(CDSClientError):
     pass
 class APIError(CDSClientError):
     """Exception for API errors (HTTP, data, etc)."""
-    pass
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
 class InvalidIdentifierError(CDSClientError):
     """Exception for invalid identifier formats."""
     pass
@@ -58,19 +67,56 @@ class IdentifierUtils:
             return "bvd_id"
         else:
             raise InvalidIdentifierError(f"Invalid identifier format: {identifier}")
+    @staticmethod
+    def normalize_identifier(identifier: Union[str, int]) -> Tuple[str, Union[str, int]]:
+        """Return (identifier type, canonical value), e.g. ' 0042' -> ('entity_id', 42)."""
+        identifier_type = IdentifierUtils.validate_identifier(identifier)
+        if identifier_type == "entity_id":
+            return identifier_type, int(identifier)
+        return identifier_type, str(identifier).strip()
 
 class TokenService:
     """Handles token generation, caching, and refresh for CDS API."""
-    def __init__(self, config: CDSConfig):
+    def __init__(self, config: CDSConfig, cache: Optional[FileTokenCache] = None):
         self.config = config
         self._token: Optional[Token] = None
-        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._session = session_registry.session_for(config)
+        self.cache = cache if cache is not None else FileTokenCache.for_config(config)
         self.logger = logging.getLogger(__name__)
     def get_token(self) -> str:
-        """Get a valid token, refreshing if needed."""
-        if self._token is None or self._token.is_expired:
-            self._refresh_token()
-        return self._token.value
+        """
+        Get a valid token, refreshing if needed.
+        Reuses the shared cross-process cache; only one thread/process refreshes at a time.
+        """
+        token = self._token
+        if token is not None and not token.is_expired:
+            return token.value
+        with self._lock:
+            if self._token is not None and not self._token.is_expired:
+                return self._token.value
+            if self.cache is None:
+                self._refresh_token()
+                return self._token.value
+            cached = self.cache.load()
+            if cached is not None and not cached.is_expired:
+                self._token = cached
+                return cached.value
+            with self.cache.refresh_lock() as locked:
+                # Another process may have refreshed while we waited for the lock
+                cached = self.cache.load() if locked else None
+                if cached is not None and not cached.is_expired:
+                    self._token = cached
+                else:
+                    self._refresh_token()
+                    self.cache.store(self._token)
+            return self._token.value
+    def invalidate(self) -> None:
+        """Drop the current token (e.g. after a 401) locally and in the shared cache."""
+        with self._lock:
+            token, self._token = self._token, None
+            if self.cache is not None and token is not None:
+                self.cache.clear(token)
     def _refresh_token(self) -> None:
         """Request a new token from the CDS token service."""
         try:
@@ -100,194 +146,346 @@ class TokenService:
             self.logger.error(f"Invalid token response: {e}")
             raise AuthenticationError(f"Invalid token response: {e}")
     def __enter__(self): return self
-    def __exit__(self, exc_type, exc_val, exc_tb): self._session.close()
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # The session is shared process-wide; it is closed by session_registry at shutdown
+        pass
 
 class CDSService:
     """Service for interacting with the CDS API for entity and BVD lookups."""
-    def __init__(self, config: CDSConfig, token_service: TokenService):
+    def __init__(self, config: CDSConfig, token_service: TokenService, cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
         self.config = config
         self.token_service = token_service
-        self._session = requests.Session()
+        self._session = session_registry.session_for(config)
+        self.cache = cache if cache is not None else shared_response_cache(config)
+        self.rate_limiter = rate_limiter or shared_rate_limiter(config)
         self.logger = logging.getLogger(__name__)
     def lookup_by_entity_id(self, entity_id: int) -> Dict[str, Any]:
         """Lookup entity data by numeric entity ID."""
         if not isinstance(entity_id, int) or entity_id <= 0:
             raise ValueError("Entity ID must be a positive integer")
-        try:
-            token = self.token_service.get_token()
-            url = f"{self.config.base_url_cds}legalentities/firmographics/locations"
-            params = {"entityid": entity_id}
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Cookie': self.config.cookie_cds,
-                'Accept': 'application/json'
-            }
-            response = self._session.get(url, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            self.logger.info(f"Successfully retrieved data for entity ID: {entity_id}")
-            return result
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 401:
-                raise AuthenticationError("Invalid or expired token")
-            elif response.status_code == 404:
-                raise APIError(f"Entity ID {entity_id} not found")
-            else:
-                raise APIError(f"HTTP error: {e}")
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request failed for entity ID {entity_id}: {e}")
-            raise APIError(f"Request failed: {e}")
-        except ValueError as e:
-            self.logger.error(f"Invalid response format: {e}")
-            raise APIError(f"Invalid response format: {e}")
+        return self._get_locations({"entityid": entity_id}, f"Entity ID {entity_id}")
     def lookup_by_bvd_id(self, bvd_id: str) -> Dict[str, Any]:
         """Lookup entity data by BVD ID."""
         if not isinstance(bvd_id, str) or not bvd_id.strip():
             raise ValueError("BVD ID must be a non-empty string")
-        try:
+        return self._get_locations({"bvdid": bvd_id}, f"BVD ID {bvd_id}")
+    def _get_locations(self, params: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """
+        GET the locations endpoint through the shared rate limiter.
+        Retries 429/502/503/504 and connection failures with jittered backoff (honoring Retry-After),
+        then maps failures to CDS client errors.
+        """
+        url = f"{self.config.base_url_cds}legalentities/firmographics/locations"
+        attempt = 0
+        while True:
             token = self.token_service.get_token()
-            url = f"{self.config.base_url_cds}legalentities/firmographics/locations"
-            params = {"bvdid": bvd_id}
             headers = {
                 'Authorization': f'Bearer {token}',
                 'Cookie': self.config.cookie_cds,
                 'Accept': 'application/json'
             }
-            response = self._session.get(url, headers=headers, params=params, timeout=30)
+            response = None
+            try:
+                with self.rate_limiter.slot() as slot:
+                    response = self._session.get(url, headers=headers, params=params, timeout=30)
+                    slot.throttled = response.status_code in RETRY_STATUSES
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not self.rate_limiter.retry.should_retry(attempt, None):
+                    self.logger.error(f"Request failed for {label}: {e}")
+                    raise APIError(f"Request failed: {e}")
+                delay = self.rate_limiter.backoff(attempt)
+                self.logger.warning(f"Request failed for {label} ({e}); retrying in {delay:.2f}s")
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Request failed for {label}: {e}")
+                raise APIError(f"Request failed: {e}")
+            else:
+                if not self.rate_limiter.retry.should_retry(attempt, response.status_code):
+                    break
+                delay = self.rate_limiter.backoff(attempt, response.headers.get('Retry-After'))
+                self.logger.warning(f"CDS returned {response.status_code} for {label}; retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+        try:
             response.raise_for_status()
             result = response.json()
-            self.logger.info(f"Successfully retrieved data for BVD ID: {bvd_id}")
+            self.logger.info(f"Successfully retrieved data for {label}")
             return result
         except requests.exceptions.HTTPError as e:
             if response.status_code == 401:
+                self.token_service.invalidate()
                 raise AuthenticationError("Invalid or expired token")
             elif response.status_code == 404:
-                raise APIError(f"BVD ID {bvd_id} not found")
+                raise APIError(f"{label} not found", status_code=404)
             else:
-                raise APIError(f"HTTP error: {e}")
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request failed for BVD ID {bvd_id}: {e}")
-            raise APIError(f"Request failed: {e}")
+                raise APIError(f"HTTP error: {e}", status_code=response.status_code)
         except ValueError as e:
             self.logger.error(f"Invalid response format: {e}")
             raise APIError(f"Invalid response format: {e}")
-    def lookup_value(self, identifier: Union[str, int]) -> Dict[str, Any]:
-        """Universal lookup by identifier (entity ID or BVD ID)."""
-        identifier_type = IdentifierUtils.validate_identifier(identifier)
-        if identifier_type == "entity_id":
-            return self.lookup_by_entity_id(int(identifier))
-        elif identifier_type == "bvd_id":
-            return self.lookup_by_bvd_id(str(identifier))
-        else:
-            raise InvalidIdentifierError(f"Unsupported identifier type: {identifier_type}")
+    def lookup_value(self, identifier: Union[str, int], refresh: bool = False) -> Dict[str, Any]:
+        """
+        Universal lookup by identifier (entity ID or BVD ID).
+        Served from the response cache when possible; ``refresh=True`` bypasses it and re-fetches.
+        Cached responses are shared between callers and must be treated as read-only.
+        """
+        identifier_type, value = IdentifierUtils.normalize_identifier(identifier)
+        key = response_key(self.config, identifier_type, value)
+        if self.cache is not None and not refresh:
+            hit, cached = self.cache.get(key)
+            if hit:
+                if isinstance(cached, CachedError):
+                    raise APIError(cached.message, status_code=cached.status_code)
+                return cached
+        try:
+            if identifier_type == "entity_id":
+                result = self.lookup_by_entity_id(value)
+            elif identifier_type == "bvd_id":
+                result = self.lookup_by_bvd_id(value)
+            else:
+                raise InvalidIdentifierError(f"Unsupported identifier type: {identifier_type}")
+        except APIError as e:
+            if self.cache is not None and e.status_code == 404:
+                self.cache.set_negative(key, str(e), e.status_code)
+            raise
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
     def __enter__(self): return self
-    def __exit__(self, exc_type, exc_val, exc_tb): self._session.close()
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # The session is shared process-wide; it is closed by session_registry at shutdown
+        pass
+
+# Output columns of the flattened CDS locations table, in order
+LOCATION_COLUMNS = [
+    'entity_id', 'bvd_id', 'location_category_code', 'location_category_label',
+    'reported_address_lines', 'reported_city', 'reported_post_code', 'reported_country_code',
+    'reported_country_label', 'reported_phone_numbers', 'reported_fax_numbers',
+    'standardized_address_lines', 'standardized_provider', 'standardized_verification_code',
+    'standardized_quality_index', 'standardized_country_name', 'standardized_iso31662',
+    'standardized_iso31663', 'standardized_iso3166n', 'standardized_super_admin_area',
+    'standardized_admin_area', 'standardized_sub_admin_area', 'standardized_locality',
+    'standardized_thoroughfare', 'standardized_building', 'standardized_premise',
+    'standardized_postal_code', 'standardized_postal_code_primary', 'standardized_post_box',
+    'standardized_longitude', 'standardized_latitude'
+]
+
+# Extra columns added to every row of multi-identifier lookups
+BATCH_EXTRA_COLUMNS = ('lookup_identifier', 'lookup_type', 'error')
+BATCH_COLUMNS = LOCATION_COLUMNS + list(BATCH_EXTRA_COLUMNS)
+
+class LocationFrameBuilder:
+    """
+    Columnar builder for flattened CDS location data.
+    Appends straight into per-column lists (no per-address row dicts) and builds one DataFrame at the end.
+    """
+    def __init__(self, extra_columns: Tuple[str, ...] = ()):
+        self.column_names = LOCATION_COLUMNS + [c for c in extra_columns if c not in LOCATION_COLUMNS]
+        self.columns: Dict[str, List[Any]] = {name: [] for name in self.column_names}
+        self.row_count = 0
+    def add_response(self, api_response: Dict[str, Any], **extra: Any) -> int:
+        """Flatten one API response; ``extra`` values (e.g. lookup_identifier) are repeated on each row. Returns rows added."""
+        try:
+            added = self._append_locations(api_response)
+        except Exception:
+            # Keep columns aligned if a malformed response fails part-way through
+            for values in self.columns.values():
+                del values[self.row_count:]
+            raise
+        for name in self.column_names[len(LOCATION_COLUMNS):]:
+            self.columns[name].extend([extra.get(name)] * added)
+        self.row_count += added
+        return added
+    def _append_locations(self, api_response: Dict[str, Any]) -> int:
+        """Append the location columns for every address in one response."""
+        cols = self.columns
+        (entity_ids, bvd_ids, category_codes, category_labels, r_lines, r_city, r_post_code, r_country_code,
+         r_country_label, r_phones, r_faxes, s_lines, s_provider, s_verification, s_quality, s_country_name,
+         s_iso31662, s_iso31663, s_iso3166n, s_super_admin, s_admin, s_sub_admin, s_locality, s_thoroughfare,
+         s_building, s_premise, s_postal_code, s_postal_primary, s_post_box, s_longitude, s_latitude) = (
+            cols[name] for name in LOCATION_COLUMNS)
+        join = ', '.join
+        added = 0
+        for entity in api_response.get('data', []):
+            entity_id = entity.get('entityId')
+            bvd_id = entity.get('bvdId')
+            for location in entity.get('locations', []):
+                categories = location.get('categories', [])
+                category_code = categories[0].get('code') if categories else None
+                category_label = categories[0].get('label') if categories else None
+                for address in location.get('addresses', []):
+                    reported = address.get('reported', {})
+                    standardized = address.get('standardized', {})
+                    country = reported.get('country', {})
+                    entity_ids.append(entity_id)
+                    bvd_ids.append(bvd_id)
+                    category_codes.append(category_code)
+                    category_labels.append(category_label)
+                    r_lines.append(join(reported.get('addressLines', [])))
+                    r_city.append(reported.get('city'))
+                    r_post_code.append(reported.get('postCode'))
+                    r_country_code.append(country.get('code'))
+                    r_country_label.append(country.get('label'))
+                    r_phones.append(join(reported.get('phoneNumbers', [])))
+                    r_faxes.append(join(reported.get('faxNumbers', [])))
+                    s_lines.append(join(standardized.get('addressLines', [])))
+                    s_provider.append(standardized.get('provider'))
+                    s_verification.append(standardized.get('verificationCode'))
+                    s_quality.append(standardized.get('qualityIndex'))
+                    s_country_name.append(standardized.get('countryName'))
+                    s_iso31662.append(standardized.get('iso31662'))
+                    s_iso31663.append(standardized.get('iso31663'))
+                    s_iso3166n.append(standardized.get('iso3166N'))
+                    s_super_admin.append(standardized.get('superAdministrativeArea'))
+                    s_admin.append(standardized.get('administrativeArea'))
+                    s_sub_admin.append(standardized.get('subAdministrativeArea'))
+                    s_locality.append(standardized.get('locality'))
+                    s_thoroughfare.append(standardized.get('thoroughfare'))
+                    s_building.append(standardized.get('building'))
+                    s_premise.append(standardized.get('premise'))
+                    s_postal_code.append(standardized.get('postalCode'))
+                    s_postal_primary.append(standardized.get('postalCodePrimary'))
+                    s_post_box.append(standardized.get('postBox'))
+                    s_longitude.append(standardized.get('longitude'))
+                    s_latitude.append(standardized.get('latitude'))
+                    added += 1
+        return added
+    def add_row(self, **values: Any) -> None:
+        """Append a single row (e.g. an error row); missing columns are None."""
+        for name in self.column_names:
+            self.columns[name].append(values.get(name))
+        self.row_count += 1
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Row dicts in insertion order, without building a DataFrame (for interactive rendering)."""
+        names = self.column_names
+        return [dict(zip(names, values)) for values in zip(*(self.columns[name] for name in names))]
+    def to_dataframe(self, drop_empty_columns: Tuple[str, ...] = ()) -> pd.DataFrame:
+        """Build the DataFrame (empty, with no columns, if no rows were added)."""
+        if not self.row_count:
+            return pd.DataFrame()
+        data = {name: values for name, values in self.columns.items()
+                if name not in drop_empty_columns or any(v is not None for v in values)}
+        return pd.DataFrame(data)
 
 def explode_location_data(api_response: Dict[str, Any]) -> pd.DataFrame:
     """
     Flatten the nested CDS API response into a pandas DataFrame for tabular analysis.
     """
-    all_rows = []
-    for entity in api_response.get('data', []):
-        entity_id = entity.get('entityId')
-        bvd_id = entity.get('bvdId')
-        for location in entity.get('locations', []):
-            categories = location.get('categories', [])
-            category_code = categories[0].get('code') if categories else None
-            category_label = categories[0].get('label') if categories else None
-            for address in location.get('addresses', []):
-                reported = address.get('reported', {})
-                standardized = address.get('standardized', {})
-                row = {
-                    'entity_id': entity_id,
-                    'bvd_id': bvd_id,
-                    'location_category_code': category_code,
-                    'location_category_label': category_label,
-                    'reported_address_lines': ', '.join(reported.get('addressLines', [])),
-                    'reported_city': reported.get('city'),
-                    'reported_post_code': reported.get('postCode'),
-                    'reported_country_code': reported.get('country', {}).get('code'),
-                    'reported_country_label': reported.get('country', {}).get('label'),
-                    'reported_phone_numbers': ', '.join(reported.get('phoneNumbers', [])),
-                    'reported_fax_numbers': ', '.join(reported.get('faxNumbers', [])),
-                    'standardized_address_lines': ', '.join(standardized.get('addressLines', [])),
-                    'standardized_provider': standardized.get('provider'),
-                    'standardized_verification_code': standardized.get('verificationCode'),
-                    'standardized_quality_index': standardized.get('qualityIndex'),
-                    'standardized_country_name': standardized.get('countryName'),
-                    'standardized_iso31662': standardized.get('iso31662'),
-                    'standardized_iso31663': standardized.get('iso31663'),
-                    'standardized_iso3166n': standardized.get('iso3166N'),
-                    'standardized_super_admin_area': standardized.get('superAdministrativeArea'),
-                    'standardized_admin_area': standardized.get('administrativeArea'),
-                    'standardized_sub_admin_area': standardized.get('subAdministrativeArea'),
-                    'standardized_locality': standardized.get('locality'),
-                    'standardized_thoroughfare': standardized.get('thoroughfare'),
-                    'standardized_building': standardized.get('building'),
-                    'standardized_premise': standardized.get('premise'),
-                    'standardized_postal_code': standardized.get('postalCode'),
-                    'standardized_postal_code_primary': standardized.get('postalCodePrimary'),
-                    'standardized_post_box': standardized.get('postBox'),
-                    'standardized_longitude': standardized.get('longitude'),
-                    'standardized_latitude': standardized.get('latitude')
-                }
-                all_rows.append(row)
-    return pd.DataFrame(all_rows)
+    builder = LocationFrameBuilder()
+    builder.add_response(api_response)
+    return builder.to_dataframe()
+
+def location_records(api_response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Flatten one CDS API response into row dicts (the rows of explode_location_data, no DataFrame).
+    """
+    builder = LocationFrameBuilder()
+    builder.add_response(api_response)
+    return builder.to_records()
+
+def explode_many_location_data(api_responses: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Flatten many CDS API responses into a single DataFrame (no per-response frames or concat).
+    """
+    builder = LocationFrameBuilder()
+    for api_response in api_responses:
+        builder.add_response(api_response)
+    return builder.to_dataframe()
+
+def loqate_batch_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep the Loqate-standardized rows (standardized_provider starting with 'L') and the error rows of a batch frame.
+    """
+    if df.empty:
+        return df
+    return df[df['standardized_provider'].astype(str).str.startswith('L', na=False) | (df['lookup_type'] == 'error')]
 
 class CDSClient:
     """
     Main client for CDS operations with support for both Entity ID and BVD ID.
     Handles token management, API calls, and DataFrame conversion.
     """
-    def __init__(self, config: Optional[CDSConfig] = None):
+    def __init__(self, config: Optional[CDSConfig] = None, max_workers: Optional[int] = None):
         self.config = config or CDSConfig.from_env()
+        if max_workers:
+            self.config = replace(self.config, max_workers=max_workers)
+        self.max_workers = max(1, self.config.max_workers)
         self.token_service = TokenService(self.config)
         self.cds_service = CDSService(self.config, self.token_service)
         self.logger = self._setup_logging()
-    def lookup_entity(self, identifier: Union[str, int]) -> Dict[str, Any]:
-        """Universal lookup for both entity ID and BVD ID."""
-        return self.cds_service.lookup_value(identifier)
+    def lookup_entity(self, identifier: Union[str, int], refresh: bool = False) -> Dict[str, Any]:
+        """Universal lookup for both entity ID and BVD ID (``refresh`` bypasses the response cache)."""
+        return self.cds_service.lookup_value(identifier, refresh=refresh)
     def lookup_by_entity_id(self, entity_id: int) -> Dict[str, Any]:
         """Lookup by entity ID only."""
         return self.cds_service.lookup_by_entity_id(entity_id)
     def lookup_by_bvd_id(self, bvd_id: str) -> Dict[str, Any]:
         """Lookup by BVD ID only."""
         return self.cds_service.lookup_by_bvd_id(bvd_id)
-    def lookup_entity_as_dataframe(self, identifier: Union[str, int]) -> pd.DataFrame:
-        """Lookup and return results as a DataFrame."""
-        result = self.lookup_entity(identifier)
-        return explode_location_data(result)
+    def lookup_entity_as_dataframe(self, identifier: Union[str, int], refresh: bool = False) -> pd.DataFrame:
+        """Lookup and return results as a DataFrame (flattened frames are cached alongside responses)."""
+        cache = self.cds_service.cache
+        if cache is None:
+            return explode_location_data(self.lookup_entity(identifier, refresh=refresh))
+        key = ('frame',) + response_key(self.config, *IdentifierUtils.normalize_identifier(identifier))
+        if not refresh:
+            hit, df = cache.get(key)
+            if hit:
+                return df.copy()
+        df = explode_location_data(self.lookup_entity(identifier, refresh=refresh))
+        cache.set(key, df)
+        return df.copy()
     def lookup_multiple_entities(self, identifiers: List[Union[str, int]]) -> Dict[Union[str, int], Dict[str, Any]]:
-        """Lookup multiple entities (mix of entity IDs and BVD IDs)."""
+        """Lookup multiple entities (mix of entity IDs and BVD IDs) concurrently."""
         results = {}
-        for identifier in identifiers:
-            try:
-                results[identifier] = self.lookup_entity(identifier)
-                self.logger.info(f"Successfully processed identifier: {identifier}")
-            except Exception as e:
-                self.logger.error(f"Failed to lookup identifier {identifier}: {e}")
-                results[identifier] = {"error": str(e)}
+        for identifier, result, error in self._lookup_batch(identifiers):
+            results[identifier] = {"error": str(error)} if error is not None else result
         return results
     def lookup_multiple_entities_as_dataframe(self, identifiers: List[Union[str, int]]) -> pd.DataFrame:
-        """Lookup multiple entities and return as a combined DataFrame."""
-        all_dataframes = []
-        for identifier in identifiers:
+        """Lookup multiple entities concurrently and return as a combined DataFrame."""
+        return self._batch_frame_builder(identifiers).to_dataframe(drop_empty_columns=('error',))
+    def iter_multiple_entities_as_dataframes(self, identifiers: List[Union[str, int]], batch_size: int = 50) -> Iterator[pd.DataFrame]:
+        """
+        Lookup identifiers ``batch_size`` at a time, yielding one DataFrame per batch as soon as it completes
+        (all of BATCH_COLUMNS on every frame), so exports never hold more than one batch of results.
+        """
+        for start in range(0, len(identifiers), max(1, batch_size)):
+            builder = self._batch_frame_builder(identifiers[start:start + batch_size])
+            if builder.row_count:
+                yield builder.to_dataframe()
+    def _batch_frame_builder(self, identifiers: List[Union[str, int]]) -> LocationFrameBuilder:
+        """Look up a batch concurrently and flatten it into a builder (one error row per failed identifier)."""
+        builder = LocationFrameBuilder(extra_columns=BATCH_EXTRA_COLUMNS)
+        for identifier, result, error in self._lookup_batch(identifiers):
+            if error is None:
+                try:
+                    identifier_type = IdentifierUtils.validate_identifier(identifier)
+                    builder.add_response(result, lookup_identifier=str(identifier), lookup_type=identifier_type)
+                    continue
+                except Exception as e:
+                    self.logger.error(f"Failed to process identifier {identifier}: {e}")
+                    error = e
+            builder.add_row(lookup_identifier=str(identifier), lookup_type='error', error=str(error))
+        return builder
+    def _lookup_batch(self, identifiers: List[Union[str, int]]) -> List[Tuple[Union[str, int], Optional[Dict[str, Any]], Optional[Exception]]]:
+        """
+        Look up identifiers on a bounded worker pool, at most ``max_workers`` requests in flight.
+        Returns (identifier, result, error) tuples in input order; all workers share this client's TokenService.
+        """
+        if not identifiers:
+            return []
+        def lookup(identifier):
             try:
                 result = self.lookup_entity(identifier)
-                df = explode_location_data(result)
-                identifier_type = IdentifierUtils.validate_identifier(identifier)
-                df['lookup_identifier'] = str(identifier)
-                df['lookup_type'] = identifier_type
-                all_dataframes.append(df)
+                self.logger.info(f"Successfully processed identifier: {identifier}")
+                return identifier, result, None
             except Exception as e:
                 self.logger.error(f"Failed to lookup identifier {identifier}: {e}")
-                error_df = pd.DataFrame([{
-                    'lookup_identifier': str(identifier),
-                    'lookup_type': 'error',
-                    'error': str(e)
-                }])
-                all_dataframes.append(error_df)
-        return pd.concat(all_dataframes, ignore_index=True) if all_dataframes else pd.DataFrame()
+                return identifier, None, e
+        workers = min(self.max_workers, len(identifiers))
+        if workers == 1:
+            return [lookup(identifier) for identifier in identifiers]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cds-lookup") as executor:
+            return list(executor.map(lookup, identifiers))
     @staticmethod
     def _setup_logging() -> logging.Logger:
         """Set up logging for the CDS client."""
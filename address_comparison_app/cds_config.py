@@ -17,6 +17,22 @@ class CDSConfig:
     cookie_gt: str
     cookie_cds: str
     base_url_cds: str
+    max_workers: int = 8
+    token_cache_enabled: bool = True
+    token_cache_dir: str = ''
+    pool_connections: int = 10
+    pool_maxsize: int = 20
+    keepalive: bool = True
+    cache_ttl: float = 900
+    cache_negative_ttl: float = 60
+    cache_max_entries: int = 1024
+    cache_max_bytes: int = 64 * 1024 * 1024
+    rate_limit: float = 0
+    rate_burst: float = 0
+    rate_limit_max_concurrency: int = 64
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30
 
     @classmethod
     def from_env(cls) -> 'CDSConfig':
@@ -26,7 +42,23 @@ class CDSConfig:
             pe_token=os.environ.get('PEToken', ''),
             cookie_gt=os.environ.get('CookieGT', ''),
             cookie_cds=os.environ.get('CookieCDS', ''),
-            base_url_cds=os.environ.get('BasedURLCDS', '')
+            base_url_cds=os.environ.get('BasedURLCDS', ''),
+            max_workers=int(os.environ.get('CDSMaxWorkers', '8')),
+            token_cache_enabled=os.environ.get('CDSTokenCache', '1').lower() not in ('0', 'false', 'off'),
+            token_cache_dir=os.environ.get('CDSTokenCacheDir', ''),
+            pool_connections=int(os.environ.get('CDSPoolConnections', '10')),
+            pool_maxsize=int(os.environ.get('CDSPoolMaxSize', '20')),
+            keepalive=os.environ.get('CDSKeepAlive', '1').lower() not in ('0', 'false', 'off'),
+            cache_ttl=float(os.environ.get('CDSCacheTTL', '900')),
+            cache_negative_ttl=float(os.environ.get('CDSCacheNegativeTTL', '60')),
+            cache_max_entries=int(os.environ.get('CDSCacheMaxEntries', '1024')),
+            cache_max_bytes=int(os.environ.get('CDSCacheMaxBytes', str(64 * 1024 * 1024))),
+            rate_limit=float(os.environ.get('CDSRateLimit', '0')),
+            rate_burst=float(os.environ.get('CDSRateBurst', '0')),
+            rate_limit_max_concurrency=int(os.environ.get('CDSMaxConcurrency', '64')),
+            max_retries=int(os.environ.get('CDSMaxRetries', '3')),
+            backoff_base=float(os.environ.get('CDSBackoffBase', '0.5')),
+            backoff_max=float(os.environ.get('CDSBackoffMax', '30'))
         )
 
 # You can now use CDSConfig.from_env() to get all CDS API settings from .env
@@ -0,0 +1,169 @@
+# comparison.py: Single-pass, DataFrame-free address comparison records for the interactive views.
+from itertools import zip_longest
+
+# Fields shown side by side in the "Address Comparison" section of every template
+COMPARISON_FIELDS = (
+    'reported_address_lines', 'standardized_address_lines',
+    'reported_city', 'standardized_locality',
+    'reported_post_code', 'standardized_postal_code',
+    'reported_country_label', 'standardized_country_name',
+)
+
+# ComparisonAddress is one reported/standardized address pair. Templates read its fields as
+# attributes, exactly like the dict keys they replace.
+class ComparisonAddress:
+    __slots__ = COMPARISON_FIELDS
+
+    def __init__(self, reported_address_lines='', standardized_address_lines='', reported_city='',
+                 standardized_locality='', reported_post_code='', standardized_postal_code='',
+                 reported_country_label='', standardized_country_name=''):
+        self.reported_address_lines = reported_address_lines
+        self.standardized_address_lines = standardized_address_lines
+        self.reported_city = reported_city
+        self.standardized_locality = standardized_locality
+        self.reported_post_code = reported_post_code
+        self.standardized_postal_code = standardized_postal_code
+        self.reported_country_label = reported_country_label
+        self.standardized_country_name = standardized_country_name
+
+    @classmethod
+    def from_mongo_row(cls, row):
+        """
+        Build from a flat MongoDB address row (country fields are left empty).
+        """
+        get = row.get
+        return cls(
+            get('reportedAddress_addressLines', ''), get('standardizedAddress_addressLines', ''),
+            get('reportedAddress_city', ''), get('standardizedAddress_locality', ''),
+            get('reportedAddress_postCode', ''), get('standardizedAddress_postalCode', ''),
+        )
+
+    @classmethod
+    def from_cds_row(cls, row):
+        """
+        Build from a flattened CDS location row (see cds_client.LOCATION_COLUMNS).
+        """
+        get = row.get
+        return cls(*(get(field, '') for field in COMPARISON_FIELDS))
+
+    def as_dict(self):
+        """
+        Plain dict of the comparison fields.
+        """
+        return {field: getattr(self, field) for field in COMPARISON_FIELDS}
+
+
+# ComparisonGroup holds the comparison addresses of one entity (MongoDB _id or CDS identifier),
+# plus its raw rows for templates that list the full address records.
+class ComparisonGroup:
+    __slots__ = ('id', 'addresses', 'rows')
+
+    def __init__(self, id):
+        self.id = id
+        self.addresses = []
+        self.rows = []
+
+
+def is_loqate(provider):
+    """
+    True for Loqate-standardized addresses (provider starting with 'L').
+    """
+    return isinstance(provider, str) and provider.startswith('L')
+
+
+def compare_mongo_rows(rows):
+    """
+    Group flat MongoDB rows by _id in one pass, in first-seen order.
+    Returns a list of ComparisonGroup (rows kept as-is, addresses as ComparisonAddress).
+    """
+    groups = {}
+    for row in rows:
+        _id = row.get('_id', 'N/A')
+        group = groups.get(_id)
+        if group is None:
+            group = groups[_id] = ComparisonGroup(_id)
+        group.rows.append(row)
+        group.addresses.append(ComparisonAddress.from_mongo_row(row))
+    return list(groups.values())
+
+
+def compare_cds_rows(rows, identifier, loqate_only=False):
+    """
+    Build the comparison for the flattened location rows of one CDS lookup.
+    Returns (rows, groups): the (optionally Loqate-filtered) rows and a single group, or none if no rows.
+    """
+    if loqate_only:
+        rows = [row for row in rows if is_loqate(row.get('standardized_provider'))]
+    if not rows:
+        return rows, []
+    group = ComparisonGroup(identifier)
+    group.rows = rows
+    group.addresses = [ComparisonAddress.from_cds_row(row) for row in rows]
+    return rows, [group]
+
+
+# EntityComparison aligns one entity's MongoDB and CDS addresses (position by position) for the
+# "both sources" mode; either side may be empty when the entity is only found in one source.
+class EntityComparison:
+    __slots__ = ('id', 'mongo', 'cds', 'cds_error')
+
+    def __init__(self, id):
+        self.id = id
+        self.mongo = []
+        self.cds = []
+        self.cds_error = None
+
+    @property
+    def pairs(self):
+        """
+        (mongo_address, cds_address) pairs, padded with None on the shorter side.
+        """
+        return list(zip_longest(self.mongo, self.cds))
+
+
+def _join_key(value):
+    """
+    Normalized join key for identifiers and entity keys (entity IDs may be int or str).
+    """
+    return None if value is None else str(value).strip().upper()
+
+
+def join_sources(identifiers, mongo_rows, cds_responses, loqate_only=False):
+    """
+    Hash-join MongoDB rows (keyed by _id) with CDS location rows (keyed by bvd_id and entity_id)
+    into one EntityComparison per requested identifier, in request order.
+    cds_responses maps each identifier to its CDS rows, or to an error message string.
+    """
+    mongo_by_key = {}
+    for row in mongo_rows:
+        mongo_by_key.setdefault(_join_key(row.get('_id')), []).append(row)
+    # Build side: every CDS row under each of its entity keys
+    cds_by_key = {}
+    cds_errors = {}
+    for identifier, rows in cds_responses.items():
+        if isinstance(rows, str):
+            cds_errors[_join_key(identifier)] = rows
+            continue
+        if loqate_only:
+            rows = [row for row in rows if is_loqate(row.get('standardized_provider'))]
+        for row in rows:
+            for key in {_join_key(row.get('bvd_id')), _join_key(row.get('entity_id'))}:
+                if key is not None:
+                    cds_by_key.setdefault(key, []).append(row)
+    comparisons = []
+    for identifier in identifiers:
+        key = _join_key(identifier)
+        entity = EntityComparison(identifier)
+        cds_rows = cds_by_key.get(key, [])
+        entity.cds = [ComparisonAddress.from_cds_row(row) for row in cds_rows]
+        entity.cds_error = cds_errors.get(key)
+        # Probe side: the identifier itself, then the BVD ID CDS resolved it to (if also requested)
+        mongo = mongo_by_key.get(key)
+        if mongo is None:
+            for bvd_id in dict.fromkeys(_join_key(row.get('bvd_id')) for row in cds_rows):
+                if bvd_id in mongo_by_key:
+                    mongo = mongo_by_key[bvd_id]
+                    break
+        entity.mongo = [ComparisonAddress.from_mongo_row(row) for row in mongo or []]
+        comparisons.append(entity)
+    return comparisons
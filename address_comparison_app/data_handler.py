@@ -1,35 +1,408 @@
+import atexit
+import base64
+import binascii
 import os
+import threading
 import pandas as pd
+from bson import json_util
+from bson.errors import InvalidBSON
 from pymongo import MongoClient
 from dotenv import load_dotenv
-import unicodedata
+from .ascii_normalizer import default_normalizer
+from .normalization_backends import select_backend
 
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
 MONGO_URI = os.environ.get('MONGO_URI', '')
 MONGO_DATABASE = os.environ.get('MONGO_DATABASE', '')
 MONGO_COLLECTION = os.environ.get('MONGO_COLLECTION', '')
+# Connection pool and query tuning for the shared, read-only MongoClient
+# (defaults; Django settings of the same names take precedence, see mongo_setting)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_MAX_TIME_MS = int(os.environ.get('MONGO_MAX_TIME_MS', '30000'))
+# Documents per cursor batch / rows per DataFrame chunk in streaming mode
+DEFAULT_BATCH_SIZE = int(os.environ.get('MONGO_BATCH_SIZE', '1000'))
+# Documents per page (and upper bound for a requested page size) in paginated queries
+DEFAULT_PAGE_SIZE = int(os.environ.get('MONGO_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.environ.get('MONGO_MAX_PAGE_SIZE', '500'))
+# Incremental (delta) fetches: last-modified field to track (change stream resume tokens when unset)
+# and the file the watermark is persisted in
+MONGO_DELTA_FIELD = os.environ.get('MONGO_DELTA_FIELD', '')
+MONGO_WATERMARK_PATH = os.environ.get('MONGO_WATERMARK_PATH', 'mongo_delta_watermark.json')
+
+# Flat output column -> source key within localizedAddresses[].reportedAddress / .standardizedAddress
+REPORTED_FIELDS = {
+    'reportedAddress_addressLines': 'addressLines',
+    'reportedAddress_city': 'city',
+    'reportedAddress_phoneNumbers': 'phoneNumbers',
+    'reportedAddress_faxNumbers': 'faxNumbers',
+    'reportedAddress_postCode': 'postCode',
+}
+STANDARDIZED_FIELDS = {
+    'standardizedAddress_addressLines': 'addressLines',
+    'standardizedAddress_provider': 'provider',
+    'standardizedAddress_verificationCode': 'verificationCode',
+    'standardizedAddress_qualityIndex': 'qualityIndex',
+    'standardizedAddress_countryName': 'countryName',
+    'standardizedAddress_ISO31662': 'ISO31662',
+    'standardizedAddress_ISO31663': 'ISO31663',
+    'standardizedAddress_ISO3166N': 'ISO3166N',
+    'standardizedAddress_superAdministrativeArea': 'superAdministrativeArea',
+    'standardizedAddress_administrativeArea': 'administrativeArea',
+    'standardizedAddress_locality': 'locality',
+    'standardizedAddress_dependentLocality': 'dependentLocality',
+    'standardizedAddress_thoroughfare': 'thoroughfare',
+    'standardizedAddress_building': 'building',
+    'standardizedAddress_premise': 'premise',
+    'standardizedAddress_subBuilding': 'subBuilding',
+    'standardizedAddress_longitude': 'longitude',
+    'standardizedAddress_latitude': 'latitude',
+    'standardizedAddress_postalCode': 'postalCode',
+    'standardizedAddress_postalCodePrimary': 'postalCodePrimary',
+    'standardizedAddress_postBox': 'postBox',
+}
+# All columns produced by DataHandler.normalize_addresses, in order
+ADDRESS_COLUMNS = ['_id'] + list(REPORTED_FIELDS) + list(STANDARDIZED_FIELDS)
+LOCALIZED_PATH = 'd.addresses.localizedAddresses'
+
+def resolve_columns(columns=None):
+    """
+    Validate requested output columns (None means all ADDRESS_COLUMNS); '_id' is always included first.
+    """
+    if columns is None:
+        return list(ADDRESS_COLUMNS)
+    unknown = [c for c in columns if c not in ADDRESS_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown address columns: {unknown}")
+    return ['_id'] + [c for c in dict.fromkeys(columns) if c != '_id']
+
+def source_paths(columns=None, loqate_only=False):
+    """
+    Dotted document paths needed to produce the requested columns (plus the provider when filtering on it).
+    """
+    paths = []
+    for column in resolve_columns(columns)[1:]:
+        if column in REPORTED_FIELDS:
+            paths.append(f'{LOCALIZED_PATH}.reportedAddress.{REPORTED_FIELDS[column]}')
+        else:
+            paths.append(f'{LOCALIZED_PATH}.standardizedAddress.{STANDARDIZED_FIELDS[column]}')
+    provider_path = f'{LOCALIZED_PATH}.standardizedAddress.provider'
+    if loqate_only and provider_path not in paths:
+        paths.append(provider_path)
+    return paths
+
+def build_projection(columns=None, loqate_only=False):
+    """
+    Minimal find() projection for the requested output columns.
+    """
+    projection = {'_id': 1}
+    projection.update({path: 1 for path in source_paths(columns, loqate_only)})
+    return projection
+
+def encode_cursor(last_id):
+    """
+    Opaque, URL-safe page token for the last _id of a page (extended JSON keeps ObjectIds intact).
+    """
+    return base64.urlsafe_b64encode(json_util.dumps(last_id).encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    """
+    Decode a page token from encode_cursor back into an _id; raises ValueError if it is malformed.
+    """
+    try:
+        return json_util.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError, InvalidBSON) as e:
+        raise ValueError(f"Invalid page cursor: {token}") from e
+
+def _and_filter(filter, condition):
+    """
+    Combine a (possibly empty) query filter with one more condition.
+    """
+    return {'$and': [filter, condition]} if filter else condition
+
+def _dotted_get(doc, path):
+    """
+    Value at a dotted field path in a document, or None.
+    """
+    for key in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+# FileWatermark persists the position of incremental fetches (a last-modified value or a change
+# stream resume token) as extended JSON, so datetimes and ObjectIds round-trip exactly. The file
+# is replaced atomically: a crash leaves the previous watermark in place.
+class FileWatermark:
+    def __init__(self, path=None):
+        self.path = path or MONGO_WATERMARK_PATH
+
+    def load(self):
+        """
+        The saved watermark state, or {} before the first run.
+        """
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding='utf-8') as f:
+            return json_util.loads(f.read())
+
+    def save(self, state):
+        """
+        Replace the saved watermark state.
+        """
+        partial = f'{self.path}.tmp'
+        with open(partial, 'w', encoding='utf-8') as f:
+            f.write(json_util.dumps(state))
+        os.replace(partial, self.path)
+
+# Delta is the result of DataHandler.fetch_delta: the normalized address rows of the documents
+# inserted or updated since the watermark, the changed and deleted _ids, and the new watermark
+# state, which commit() persists once the caller has stored the rows. tracks_deletions is True
+# when deleted_ids is complete (change stream); a last-modified field cannot see deletions.
+class Delta:
+    __slots__ = ('frame', 'changed_ids', 'deleted_ids', 'watermark', 'state', 'tracks_deletions')
+
+    def __init__(self, frame, changed_ids, deleted_ids, watermark, state, tracks_deletions=False):
+        self.frame = frame
+        self.changed_ids = changed_ids
+        self.deleted_ids = deleted_ids
+        self.watermark = watermark
+        self.state = state
+        self.tracks_deletions = tracks_deletions
+
+    def commit(self):
+        """
+        Advance the persisted watermark past this delta.
+        """
+        self.watermark.save(self.state)
+
+# Process-wide MongoClient instances, keyed by connection settings (pymongo clients are thread-safe)
+def mongo_setting(name, default):
+    """
+    A MongoDB tuning value: the Django setting `name` when Django is configured and defines it,
+    otherwise `default` (the module-level value read from the environment variable of the same name).
+    """
+    try:
+        from django.conf import settings
+    except ImportError:
+        return default
+    if settings.configured:
+        return getattr(settings, name, default)
+    return default
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+def get_shared_client(uri=None, max_pool_size=None, read_preference=None):
+    """
+    Return the process-wide MongoClient for the given URI and pool settings, creating it on first use.
+    Reusing one client avoids connection setup, server discovery and monitor threads on every request.
+    Pool size and read preference default to the MONGO_MAX_POOL_SIZE / MONGO_READ_PREFERENCE settings.
+    """
+    key = (uri or MONGO_URI,
+           int(max_pool_size or mongo_setting('MONGO_MAX_POOL_SIZE', MONGO_MAX_POOL_SIZE)),
+           read_preference or mongo_setting('MONGO_READ_PREFERENCE', MONGO_READ_PREFERENCE))
+    client = _shared_clients.get(key)
+    if client is None:
+        with _shared_clients_lock:
+            client = _shared_clients.get(key)
+            if client is None:
+                client = MongoClient(key[0], maxPoolSize=key[1], readPreference=key[2])
+                _shared_clients[key] = client
+    return client
+
+def close_shared_clients():
+    """
+    Close and forget all shared MongoClient instances (e.g. at worker shutdown).
+    """
+    with _shared_clients_lock:
+        clients = list(_shared_clients.values())
+        _shared_clients.clear()
+    for client in clients:
+        client.close()
+
+atexit.register(close_shared_clients)
 
 # DataHandler is responsible for fetching and normalizing MongoDB address data into a flat, tabular format.
 class DataHandler:
-    def __init__(self, data_source):
+    def __init__(self, data_source, normalizer=None, backend=None):
         """
-        Initialize with a data source (e.g., MongoDBSource).
+        Initialize with a data source (e.g., MongoDBSource), an optional AsciiNormalizer and an optional
+        normalization backend (see normalization_backends; chosen by batch size when not given).
         """
         self.data_source = data_source
+        self.normalizer = normalizer or default_normalizer
+        self.backend = backend
 
-    def fetch_data(self, filter, projection):
+    def fetch_data(self, filter, projection=None, columns=None):
         """
         Fetch data from the data source using the provided filter and projection.
+        Without a projection, the minimal one for the requested output columns is derived.
         """
+        if projection is None:
+            projection = build_projection(columns)
         return self.data_source.fetch_data(filter, projection)
 
-    def normalize_addresses(self, data):
+    def normalize_addresses(self, data, columns=None):
         """
         Normalize nested MongoDB address data into a flat pandas DataFrame.
         Applies ASCII normalization to all string fields for consistent encoding.
+        If columns is given, only those fields are extracted and normalized.
+        Document lists of SPARK_MIN_DOCUMENTS or more run on the Spark backend when pyspark is installed
+        and SPARK_MIN_DOCUMENTS is set (the default, 0, keeps them on pandas).
+        """
+        backend = self.backend or select_backend(len(data) if hasattr(data, '__len__') else 0, self.normalizer)
+        return backend.normalize(data, columns)
+
+    def flatten_addresses(self, data, columns=None):
+        """
+        In-process normalize_addresses (the pandas backend): flatten the documents row by row
+        and ASCII-normalize the rows as one batch.
+        """
+        records = list(self._iter_rows(data, columns))
+        return pd.DataFrame(self.normalizer.normalize_records(records))
+
+    def normalize_addresses_in_chunks(self, data, chunk_size=DEFAULT_BATCH_SIZE, columns=None):
+        """
+        Normalize an iterable of documents lazily, yielding DataFrames of at most chunk_size rows.
+        Only one chunk of row dicts is held in memory at a time.
+        """
+        records = []
+        for row in self._iter_rows(data, columns):
+            records.append(row)
+            if len(records) >= chunk_size:
+                yield pd.DataFrame(self.normalizer.normalize_records(records))
+                records = []
+        if records:
+            yield pd.DataFrame(self.normalizer.normalize_records(records))
+
+    def stream_addresses(self, filter, projection=None, batch_size=DEFAULT_BATCH_SIZE, columns=None):
+        """
+        Stream normalized address rows straight from the data source cursor as DataFrame chunks.
+        Peak memory tracks batch_size instead of the total result size; callers can pd.concat the
+        chunks or write each one out as it arrives. Without a projection, the minimal one for columns is used.
+        """
+        if projection is None:
+            projection = build_projection(columns)
+        documents = self.data_source.iter_data(filter, projection, batch_size=batch_size)
+        return self.normalize_addresses_in_chunks(documents, chunk_size=batch_size, columns=columns)
+
+    def fetch_flat_addresses(self, filter, loqate_only=False, columns=None, sort=False):
+        """
+        Fetch already-flat address rows via server-side aggregation (see build_flat_address_pipeline)
+        and return them as a normalized DataFrame with the requested columns (default: all, as normalize_addresses).
+        With sort, rows come back in _id order.
+        """
+        columns = resolve_columns(columns)
+        records = self.fetch_flat_records(filter, loqate_only, columns, sort=sort)
+        return pd.DataFrame(records, columns=columns if records else None)
+
+    def fetch_flat_records(self, filter, loqate_only=False, columns=None, sort=False):
+        """
+        fetch_flat_addresses without the DataFrame: a list of normalized row dicts (one per localized
+        address, every requested column present) for callers that render or compare rows directly.
+        """
+        columns = resolve_columns(columns)
+        rows = self.data_source.aggregate(build_flat_address_pipeline(filter, loqate_only, columns, sort=sort))
+        return self.normalizer.normalize_records([self._complete_flat_row(row, columns) for row in rows])
+
+    def stream_flat_addresses(self, filter, loqate_only=False, batch_size=DEFAULT_BATCH_SIZE, columns=None):
+        """
+        Streaming variant of fetch_flat_addresses, yielding DataFrames of at most batch_size rows.
         """
+        columns = resolve_columns(columns)
+        rows = self.data_source.aggregate(build_flat_address_pipeline(filter, loqate_only, columns), batch_size=batch_size)
         records = []
+        for row in rows:
+            records.append(self._complete_flat_row(row, columns))
+            if len(records) >= batch_size:
+                yield pd.DataFrame(self.normalizer.normalize_records(records), columns=columns)
+                records = []
+        if records:
+            yield pd.DataFrame(self.normalizer.normalize_records(records), columns=columns)
+
+    def fetch_page(self, filter, page_size=DEFAULT_PAGE_SIZE, cursor=None, loqate_only=False, columns=None):
+        """
+        Keyset-paginated fetch_flat_addresses: one page of page_size documents in _id order after cursor
+        (a token from a previous page). Returns (DataFrame, next_cursor), next_cursor being None on the
+        last page. Only page_size + 1 _ids are read from the _id index, whatever the collection size.
+        """
+        records, next_cursor = self.fetch_page_records(filter, page_size, cursor, loqate_only, columns)
+        return pd.DataFrame(records, columns=resolve_columns(columns)), next_cursor
+
+    def fetch_page_records(self, filter, page_size=DEFAULT_PAGE_SIZE, cursor=None, loqate_only=False, columns=None):
+        """
+        fetch_page returning the page as a list of normalized row dicts (see fetch_flat_records).
+        """
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+        id_filter = filter
+        if loqate_only:
+            # Skip documents without any Loqate-standardized address so pages are not empty
+            provider = {f'{LOCALIZED_PATH}.standardizedAddress.provider': {'$regex': '^L'}}
+            id_filter = {'$and': [filter, provider]} if filter else provider
+        ids = self.data_source.fetch_ids(id_filter, after=after, limit=page_size + 1)
+        next_cursor = encode_cursor(ids[page_size - 1]) if len(ids) > page_size else None
+        ids = ids[:page_size]
+        if not ids:
+            return [], None
+        return self.fetch_flat_records({'_id': {'$in': ids}}, loqate_only=loqate_only, columns=columns, sort=True), next_cursor
+
+    def fetch_delta(self, watermark, filter=None, columns=None, field=None):
+        """
+        Incremental fetch: only the documents inserted or updated since the persisted watermark,
+        normalized with normalize_addresses. Returns a Delta; call its commit() after storing the rows.
+
+        With a last-modified field (default MONGO_DELTA_FIELD) documents with field >= the highest value
+        seen so far are read (boundary documents are re-read rather than missed; index the field).
+        Without one, the collection's change stream (replica set required) is drained from the saved
+        resume token and the changed _ids are fetched; deletions are reported in Delta.deleted_ids.
+        The first run (no watermark yet) reads every matching document.
+        """
+        field = MONGO_DELTA_FIELD if field is None else field
+        filter = filter or {}
+        state = watermark.load()
+        projection = build_projection(columns)
+        deleted_ids = []
+        if field:
+            since = state.get('value') if state.get('field') == field else None
+            if since is not None:
+                filter = _and_filter(filter, {field: {'$gte': since}})
+            documents = list(self.data_source.iter_data(filter, dict(projection, **{field: 1})))
+            values = [v for v in (_dotted_get(doc, field) for doc in documents) if v is not None]
+            new_state = {'field': field, 'value': max(values, default=since)}
+        else:
+            token = state.get('resume_token')
+            if token is None:
+                # First run: take the stream position before the full read so no change is missed
+                _, _, resume_token = self.data_source.watch_changes()
+                documents = list(self.data_source.iter_data(filter, projection))
+            else:
+                changed, deleted_ids, resume_token = self.data_source.watch_changes(token)
+                documents = self.data_source.fetch_data(_and_filter(filter, {'_id': {'$in': changed}}), projection) if changed else []
+            new_state = {'resume_token': resume_token}
+        changed_ids = [doc.get('_id') for doc in documents]
+        frame = self.normalize_addresses(documents, columns)
+        return Delta(frame, changed_ids, deleted_ids, watermark, new_state, tracks_deletions=not field)
+
+    @staticmethod
+    def _complete_flat_row(row, columns=ADDRESS_COLUMNS):
+        """
+        Give an aggregated row every output column ($project omits fields missing in the source).
+        """
+        return {column: row.get(column) for column in columns}
+
+    def _iter_rows(self, data, columns=None):
+        """
+        Yield one flat (not yet ASCII-normalized) row dict per localized address in the documents,
+        restricted to the requested columns. Callers normalize whole batches with self.normalizer.
+        """
+        reported_fields = standardized_fields = None
+        if columns is not None:
+            wanted = set(resolve_columns(columns))
+            reported_fields = {c: k for c, k in REPORTED_FIELDS.items() if c in wanted}
+            standardized_fields = {c: k for c, k in STANDARDIZED_FIELDS.items() if c in wanted}
         for doc in data:
             _id = doc.get('_id')
             addresses = doc.get('d', {}).get('addresses', [])
@@ -40,52 +413,21 @@ class DataHandler:
                     reported = loc.get('reportedAddress', {})
                     standardized = loc.get('standardizedAddress', {})
                     # Extract and flatten reported and standardized address fields
-                    row.update(self._extract_reported_fields(reported))
-                    row.update(self._extract_standardized_fields(standardized))
-                    # Normalize all string fields to ASCII
-                    row = self._normalize_row(row)
-                    records.append(row)
-        return pd.DataFrame(records)
-
-    def _extract_reported_fields(self, reported):
-        """
-        Extract and map reported address fields to flat keys.
-        """
-        return {
-            'reportedAddress_addressLines': reported.get('addressLines'),
-            'reportedAddress_city': reported.get('city'),
-            'reportedAddress_phoneNumbers': reported.get('phoneNumbers'),
-            'reportedAddress_faxNumbers': reported.get('faxNumbers'),
-            'reportedAddress_postCode': reported.get('postCode'),
-        }
-
-    def _extract_standardized_fields(self, standardized):
-        """
-        Extract and map standardized address fields to flat keys.
-        """
-        return {
-            'standardizedAddress_addressLines': standardized.get('addressLines'),
-            'standardizedAddress_provider': standardized.get('provider'),
-            'standardizedAddress_verificationCode': standardized.get('verificationCode'),
-            'standardizedAddress_qualityIndex': standardized.get('qualityIndex'),
-            'standardizedAddress_countryName': standardized.get('countryName'),
-            'standardizedAddress_ISO31662': standardized.get('ISO31662'),
-            'standardizedAddress_ISO31663': standardized.get('ISO31663'),
-            'standardizedAddress_ISO3166N': standardized.get('ISO3166N'),
-            'standardizedAddress_superAdministrativeArea': standardized.get('superAdministrativeArea'),
-            'standardizedAddress_administrativeArea': standardized.get('administrativeArea'),
-            'standardizedAddress_locality': standardized.get('locality'),
-            'standardizedAddress_dependentLocality': standardized.get('dependentLocality'),
-            'standardizedAddress_thoroughfare': standardized.get('thoroughfare'),
-            'standardizedAddress_building': standardized.get('building'),
-            'standardizedAddress_premise': standardized.get('premise'),
-            'standardizedAddress_subBuilding': standardized.get('subBuilding'),
-            'standardizedAddress_longitude': standardized.get('longitude'),
-            'standardizedAddress_latitude': standardized.get('latitude'),
-            'standardizedAddress_postalCode': standardized.get('postalCode'),
-            'standardizedAddress_postalCodePrimary': standardized.get('postalCodePrimary'),
-            'standardizedAddress_postBox': standardized.get('postBox'),
-        }
+                    row.update(self._extract_reported_fields(reported, reported_fields))
+                    row.update(self._extract_standardized_fields(standardized, standardized_fields))
+                    yield row
+
+    def _extract_reported_fields(self, reported, fields=None):
+        """
+        Extract and map reported address fields to flat keys (all of REPORTED_FIELDS by default).
+        """
+        return {column: reported.get(key) for column, key in (fields if fields is not None else REPORTED_FIELDS).items()}
+
+    def _extract_standardized_fields(self, standardized, fields=None):
+        """
+        Extract and map standardized address fields to flat keys (all of STANDARDIZED_FIELDS by default).
+        """
+        return {column: standardized.get(key) for column, key in (fields if fields is not None else STANDARDIZED_FIELDS).items()}
 
     def _normalize_row(self, row):
         """
@@ -93,34 +435,108 @@ class DataHandler:
         Removes accents and special characters for consistent display (e.g., 'ç' -> 'c', 'ã' -> 'a', 'ú' -> 'u').
         Also removes or replaces any non-ASCII character with a close English equivalent.
         """
-        normalized = {}
-        for k, v in row.items():
-            if isinstance(v, str):
-                # Convert to closest ASCII representation
-                ascii_str = unicodedata.normalize('NFKD', v).encode('ascii', 'ignore').decode('ascii')
-                normalized[k] = ascii_str
-            elif isinstance(v, list):
-                norm_list = [unicodedata.normalize('NFKD', i).encode('ascii', 'ignore').decode('ascii') if isinstance(i, str) else i for i in v]
-                normalized[k] = norm_list
-            else:
-                normalized[k] = v
-        return normalized
+        normalize_value = self.normalizer.normalize_value
+        return {k: normalize_value(v) for k, v in row.items()}
+
+def build_flat_address_pipeline(filter, loqate_only=False, columns=None, sort=False):
+    """
+    Aggregation pipeline that flattens d.addresses[].localizedAddresses[] on the server:
+    $match the documents (in _id order if sort), trim them to the fields the requested columns need, $unwind both
+    arrays, optionally keep only Loqate-standardized addresses (provider starting with 'L'),
+    and $project the flat column names (all ADDRESS_COLUMNS by default).
+    """
+    columns = resolve_columns(columns)
+    pipeline = []
+    if filter:
+        pipeline.append({'$match': filter})
+    if sort:
+        pipeline.append({'$sort': {'_id': 1}})
+    pipeline.append({'$project': build_projection(columns, loqate_only)})
+    pipeline.append({'$unwind': '$d.addresses'})
+    pipeline.append({'$unwind': f'${LOCALIZED_PATH}'})
+    if loqate_only:
+        pipeline.append({'$match': {f'{LOCALIZED_PATH}.standardizedAddress.provider': {'$regex': '^L'}}})
+    projection = {'_id': 1}
+    for column, path in zip(columns[1:], source_paths(columns)):
+        projection[column] = f'${path}'
+    pipeline.append({'$project': projection})
+    return pipeline
 
 # MongoDBSource abstracts MongoDB access and provides a fetch_data method for querying documents.
 class MongoDBSource:
-    def __init__(self, uri=None, database=None, collection=None):
+    def __init__(self, uri=None, database=None, collection=None, client=None, max_time_ms=None):
         """
-        Initialize MongoDB client and select database/collection.
+        Select database/collection on the process-wide shared MongoClient (or an explicit client).
+        max_time_ms bounds server-side execution time of each query (0 disables the limit; default MONGO_MAX_TIME_MS).
         """
-        self.client = MongoClient(uri or MONGO_URI)
+        self.client = client or get_shared_client(uri or MONGO_URI)
         self.database = database or MONGO_DATABASE
         self.collection = collection or MONGO_COLLECTION
+        self.max_time_ms = int(mongo_setting('MONGO_MAX_TIME_MS', MONGO_MAX_TIME_MS)) if max_time_ms is None else max_time_ms
 
     def fetch_data(self, filter, projection):
         """
         Fetch documents from MongoDB using the given filter and projection.
-        Returns a list of documents.
+        Returns a list of documents; raises pymongo.errors.ExecutionTimeout if the query exceeds max_time_ms.
         """
         collection = self.client[self.database][self.collection]
-        cursor = collection.find(filter=filter, projection=projection)
+        cursor = collection.find(filter=filter, projection=projection, max_time_ms=self.max_time_ms or None)
         return list(cursor)
+
+    def iter_data(self, filter, projection, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Iterate documents lazily, fetching batch_size documents per round trip.
+        """
+        collection = self.client[self.database][self.collection]
+        cursor = collection.find(filter=filter, projection=projection, max_time_ms=self.max_time_ms or None)
+        try:
+            yield from cursor.batch_size(batch_size)
+        finally:
+            cursor.close()
+
+    def fetch_ids(self, filter, after=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Return up to limit matching _ids greater than after, in ascending order (served by the _id index).
+        """
+        collection = self.client[self.database][self.collection]
+        if after is not None:
+            filter = _and_filter(filter, {'_id': {'$gt': after}})
+        cursor = collection.find(filter=filter, projection={'_id': 1}, max_time_ms=self.max_time_ms or None)
+        return [doc['_id'] for doc in cursor.sort('_id', 1).limit(limit)]
+
+    def watch_changes(self, resume_token=None, max_await_ms=1000):
+        """
+        Drain the collection's change stream after resume_token (from now when None).
+        Returns (changed_ids, deleted_ids, resume_token): _ids inserted/updated/replaced and deleted
+        since the token (last operation wins), and the token to resume from next time.
+        """
+        collection = self.client[self.database][self.collection]
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}}]
+        changed, deleted = {}, {}
+        with collection.watch(pipeline, resume_after=resume_token, max_await_time_ms=max_await_ms) as stream:
+            while True:
+                change = stream.try_next()
+                if change is None:
+                    break
+                _id = change['documentKey']['_id']
+                if change['operationType'] == 'delete':
+                    changed.pop(_id, None)
+                    deleted[_id] = None
+                else:
+                    deleted.pop(_id, None)
+                    changed[_id] = None
+            return list(changed), list(deleted), stream.resume_token
+
+    def aggregate(self, pipeline, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Run an aggregation pipeline and iterate its results lazily, bounded by max_time_ms.
+        """
+        collection = self.client[self.database][self.collection]
+        options = {'batchSize': batch_size}
+        if self.max_time_ms:
+            options['maxTimeMS'] = self.max_time_ms
+        cursor = collection.aggregate(pipeline, **options)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
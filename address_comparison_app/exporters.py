@@ -0,0 +1,218 @@
+# exporters.py: Incremental CSV/Parquet serialization of DataFrame chunks for streaming exports.
+import csv
+import io
+import os
+
+# Rows per Mongo cursor batch / Parquet row group, and identifiers per CDS lookup batch, for exports
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '5000'))
+EXPORT_CDS_BATCH_SIZE = int(os.environ.get('EXPORT_CDS_BATCH_SIZE', '50'))
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Parquet types of the exported address columns (data_handler.ADDRESS_COLUMNS, cds_client.BATCH_COLUMNS);
+# every other column is a string. The schema is fixed up front so no chunk's contents can change it.
+LIST_COLUMNS = frozenset({
+    'reportedAddress_addressLines', 'reportedAddress_phoneNumbers', 'reportedAddress_faxNumbers',
+    'standardizedAddress_addressLines',
+    'reported_address_lines', 'reported_phone_numbers', 'reported_fax_numbers', 'standardized_address_lines',
+})
+FLOAT_COLUMNS = frozenset({
+    'standardizedAddress_longitude', 'standardizedAddress_latitude', 'standardized_longitude', 'standardized_latitude',
+})
+INT_COLUMNS = frozenset({'entity_id'})
+
+
+def import_pyarrow():
+    """
+    Import pyarrow lazily (only Parquet exports need it); raises ImportError if it is not installed.
+    """
+    import pyarrow
+    import pyarrow.parquet
+    return pyarrow, pyarrow.parquet
+
+
+def _csv_value(value):
+    """
+    CSV cell for a DataFrame value: lists (e.g. address lines) are joined, missing values are empty.
+    """
+    if isinstance(value, list):
+        return ', '.join(str(i) for i in value)
+    if value is None or value != value:
+        return ''
+    return value
+
+
+def iter_csv(chunks, columns=None, header=True):
+    """
+    Yield CSV text for an iterable of DataFrame chunks: the header first, then one string per chunk.
+    Only one chunk is serialized at a time, so memory tracks the chunk size rather than the export size.
+    columns fixes the header and column order (default: the first chunk's columns); header=False
+    omits the header line (e.g. when appending to an existing file).
+    """
+    if columns is not None:
+        columns = list(columns)
+        if header:
+            yield _csv_lines([columns])
+    for df in chunks:
+        if columns is None:
+            columns = df.columns.tolist()
+            if header:
+                yield _csv_lines([columns])
+        if df.empty:
+            continue
+        df = df.reindex(columns=columns)
+        yield _csv_lines([_csv_value(v) for v in row] for row in df.itertuples(index=False, name=None))
+
+
+def _csv_lines(rows):
+    """
+    Format rows as CSV text.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+# _ChunkSink is the file object ParquetWriter writes into; iter_parquet drains it after every
+# row group so the bytes can be handed to the response instead of accumulating in memory.
+class _ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        """
+        Return and forget everything written since the last drain.
+        """
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _text(value):
+    """
+    String cell: lists are joined as in CSV, integral floats (ints upcast by pandas) lose the '.0'.
+    """
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(i) for i in value)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _coerce(value, kind):
+    """
+    Convert one cell to the Python value of its Parquet column type (None when missing or unconvertible).
+    """
+    if _is_missing(value):
+        return None
+    if kind == 'list':
+        if hasattr(value, 'tolist'):
+            value = value.tolist()
+        items = value if isinstance(value, (list, tuple)) else [value]
+        return [_text(i) for i in items if not _is_missing(i)]
+    if kind in ('int', 'float'):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        if kind == 'float':
+            return number
+        return int(number) if number.is_integer() else None
+    return _text(value)
+
+
+def _column_kind(name):
+    if name in LIST_COLUMNS:
+        return 'list'
+    if name in FLOAT_COLUMNS:
+        return 'float'
+    if name in INT_COLUMNS:
+        return 'int'
+    return 'string'
+
+
+def parquet_schema(columns):
+    """
+    Arrow schema for the export columns (see LIST_COLUMNS, FLOAT_COLUMNS, INT_COLUMNS; others are strings).
+    """
+    pa, _ = import_pyarrow()
+    types = {'list': pa.list_(pa.string()), 'float': pa.float64(), 'int': pa.int64(), 'string': pa.string()}
+    return pa.schema([(name, types[_column_kind(name)]) for name in columns])
+
+
+def _parquet_table(df, schema):
+    """
+    One chunk as an Arrow table of exactly the given schema, every value coerced to its column type.
+    """
+    pa, _ = import_pyarrow()
+    arrays = []
+    for field in schema:
+        kind = _column_kind(field.name)
+        values = df[field.name].tolist() if field.name in df.columns else [None] * len(df)
+        arrays.append(pa.array([_coerce(v, kind) for v in values], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def iter_parquet(chunks, columns=None):
+    """
+    Yield a Parquet file as bytes, writing each DataFrame chunk as one row group.
+    The schema is fixed by the columns (default: the first non-empty chunk's columns) and their
+    known types (parquet_schema), and every chunk is coerced to it, so a column that is all null
+    in one chunk and filled with lists or numbers in a later one cannot fail mid-stream.
+    """
+    pa, pq = import_pyarrow()
+    sink = _ChunkSink()
+    schema = parquet_schema(columns) if columns is not None else None
+    writer = None
+    try:
+        for df in chunks:
+            if df.empty:
+                continue
+            if schema is None:
+                schema = parquet_schema(df.columns.tolist())
+            if writer is None:
+                writer = pq.ParquetWriter(sink, schema)
+            writer.write_table(_parquet_table(df, schema))
+            data = sink.drain()
+            if data:
+                yield data
+        if writer is None:
+            # No rows: still produce a valid (empty) file with the requested columns
+            writer = pq.ParquetWriter(sink, schema if schema is not None else pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_export(chunks, export_format, columns=None):
+    """
+    Serialize DataFrame chunks in the requested format ('csv' or 'parquet').
+    """
+    if export_format == 'parquet':
+        return iter_parquet(chunks, columns)
+    if export_format == 'csv':
+        return iter_csv(chunks, columns)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -17,7 +17,8 @@ class CDSLookupForm(forms.Form):
 class DataSourceChoiceForm(forms.Form):
     DATA_SOURCE_CHOICES = [
         ("mongo", "MongoDB"),
-        ("cds", "CDS API")
+        ("cds", "CDS API"),
+        ("both", "MongoDB + CDS API")
     ]
     data_source = forms.ChoiceField(
         choices=DATA_SOURCE_CHOICES,
@@ -26,12 +27,44 @@ class DataSourceChoiceForm(forms.Form):
     )
     identifier = forms.CharField(
         label="Entity ID or BVD ID (_id for MongoDB)",
-        max_length=64,
+        max_length=1024,
         required=True,
-        help_text="Enter a MongoDB _id, numeric entity ID, or a BVD ID."
+        help_text="Enter a MongoDB _id, numeric entity ID, or a BVD ID (comma-separated list for both sources)."
     )
     loqate_filter = forms.BooleanField(
         label="LoqateAddressOnly (standardized_provider starts with 'L')",
         required=False,
         initial=False
     )
+
+class ComparisonJobForm(forms.Form):
+    """Form for submitting a background batch comparison job."""
+    source = forms.ChoiceField(
+        choices=[("mongo", "MongoDB"), ("cds", "CDS API")],
+        label="Select Data Source",
+        required=True
+    )
+    identifiers = forms.CharField(
+        label="IDs (comma or newline separated)",
+        widget=forms.Textarea,
+        required=True,
+        help_text="MongoDB _id values, or CDS entity IDs / BVD IDs."
+    )
+    loqate_filter = forms.BooleanField(
+        label="LoqateAddressOnly (standardized_provider starts with 'L')",
+        required=False,
+        initial=False
+    )
+    format = forms.ChoiceField(
+        choices=[("csv", "CSV"), ("parquet", "Parquet")],
+        required=False,
+        initial="csv"
+    )
+
+    def clean_identifiers(self):
+        """Split the ID list on commas and newlines, dropping blanks."""
+        raw = self.cleaned_data['identifiers'].replace('\n', ',')
+        identifiers = [v.strip() for v in raw.split(',') if v.strip()]
+        if not identifiers:
+            raise forms.ValidationError("Enter at least one ID.")
+        return identifiers
@@ -0,0 +1,142 @@
+"""
+Process-wide pooled HTTP sessions for Moody's Address Comparison WebApp
+Keeps long-lived requests.Session objects (one per name) so TCP connections and TLS
+sessions are reused across Django requests instead of being rebuilt per lookup.
+The async CDS client gets the same treatment from AsyncClientRegistry (one httpx.AsyncClient per event loop).
+"""
+import asyncio
+import atexit
+import logging
+import socket
+import threading
+import weakref
+from typing import Dict, Any
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that optionally enables TCP keep-alive probes on pooled sockets."""
+    def __init__(self, keepalive: bool = True, **kwargs):
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive:
+            options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60))
+            kwargs['socket_options'] = options
+        super().init_poolmanager(*args, **kwargs)
+
+class SessionRegistry:
+    """
+    Thread-safe registry of shared, pooled requests.Session objects.
+    Sessions are created on first use and closed by close_all() (registered with atexit).
+    """
+    def __init__(self):
+        self._sessions: Dict[str, requests.Session] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    def get(self, name: str, pool_connections: int = 10, pool_maxsize: int = 10, keepalive: bool = True) -> requests.Session:
+        """Return the shared session for ``name``, creating it with the given pool settings on first use."""
+        session = self._sessions.get(name)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = requests.Session()
+                adapter = KeepAliveAdapter(keepalive=keepalive, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.hooks['response'].append(lambda response, *args, **kwargs: self._count(name))
+                self._sessions[name] = session
+                self._request_counts[name] = 0
+                self.logger.info(f"Created pooled HTTP session '{name}' (pool_maxsize={pool_maxsize})")
+            return session
+    def session_for(self, config) -> requests.Session:
+        """Return the shared CDS session sized from a CDSConfig (at least one connection per batch worker)."""
+        return self.get(
+            'cds',
+            pool_connections=config.pool_connections,
+            pool_maxsize=max(config.pool_maxsize, config.max_workers),
+            keepalive=config.keepalive
+        )
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._request_counts[name] = self._request_counts.get(name, 0) + 1
+    def stats(self) -> Dict[str, Any]:
+        """Per-session request counts and per-host connection pool usage."""
+        result = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+            counts = dict(self._request_counts)
+        for name, session in sessions.items():
+            pools = []
+            adapter = session.get_adapter('https://')
+            manager = adapter.poolmanager
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                pools.append({
+                    'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle_connections': pool.pool.qsize() if pool.pool is not None else 0,
+                })
+            result[name] = {'requests': counts.get(name, 0), 'pools': pools}
+        return result
+    def close(self, name: str) -> None:
+        """Close and forget one shared session."""
+        with self._lock:
+            session = self._sessions.pop(name, None)
+            self._request_counts.pop(name, None)
+        if session is not None:
+            session.close()
+    def close_all(self) -> None:
+        """Close every shared session (call at worker shutdown)."""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+            self._request_counts = {}
+        for session in sessions.values():
+            session.close()
+
+class AsyncClientRegistry:
+    """
+    Shared, pooled httpx.AsyncClient objects, one per event loop (httpx connections cannot
+    cross loops). Under ASGI there is a single loop, so every async request shares one pool;
+    clients of loops that have been closed are dropped and rebuilt on the next request.
+    """
+    def __init__(self):
+        self._clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    def client_for(self, config) -> httpx.AsyncClient:
+        """Return the running loop's shared CDS client, sized for the CDSConfig's concurrency ceiling."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                max_connections = max(config.pool_maxsize, config.rate_limit_max_concurrency)
+                client = httpx.AsyncClient(
+                    timeout=30,
+                    limits=httpx.Limits(max_connections=max_connections,
+                                        max_keepalive_connections=max_connections if config.keepalive else 0)
+                )
+                self._clients[loop] = client
+                self.logger.info(f"Created pooled async HTTP client (max_connections={max_connections})")
+            return client
+    async def aclose(self) -> None:
+        """Close the running loop's shared client (e.g. from an ASGI lifespan shutdown hook)."""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+# Process-wide registries used by the sync (TokenService, CDSService) and async CDS clients
+session_registry = SessionRegistry()
+async_client_registry = AsyncClientRegistry()
+atexit.register(session_registry.close_all)
@@ -0,0 +1,225 @@
+# jobs.py: Local background job queue for large batch comparisons (SQLite job table + thread pool).
+import logging
+import os
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.utils import timezone
+from .cds_client import BATCH_COLUMNS, CDSClient, loqate_batch_rows
+from .data_handler import ADDRESS_COLUMNS, DataHandler, MongoDBSource
+from .exporters import iter_export
+from .models import ComparisonJob
+
+# Worker threads per web process, identifiers per batch (one progress update each), result directory
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', '200'))
+JOB_RESULTS_DIR = os.environ.get('JOB_RESULTS_DIR') or os.path.join(tempfile.gettempdir(), 'address_comparison_jobs')
+# Days finished jobs (and their result files) are kept; 0 keeps them forever
+JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', '7'))
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = False
+
+
+def worker_id():
+    """
+    Identity of this process ("host:pid"), recorded on the jobs it queues and runs.
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def job_executor():
+    """
+    Return the process-wide job worker pool, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix='comparison-job')
+    return _executor
+
+
+def submit_job(identifiers, source, loqate_only=False, export_format='csv'):
+    """
+    Record a queued job and hand it to the worker pool; returns the ComparisonJob immediately.
+    """
+    identifiers = list(dict.fromkeys(str(i).strip() for i in identifiers if str(i).strip()))
+    job = ComparisonJob.objects.create(
+        source=source, identifiers=identifiers, loqate_only=loqate_only,
+        export_format=export_format, total=len(identifiers), worker=worker_id()
+    )
+    job_executor().submit(_job_worker, job.id)
+    return job
+
+
+def _job_worker(job_id):
+    """
+    Pool entry point: run the job, then release this thread's database connection.
+    """
+    try:
+        run_job(job_id)
+        cleanup_finished_jobs()
+    finally:
+        connection.close()
+
+
+def run_job(job_id):
+    """
+    Process a job batch by batch, streaming each batch's rows into the result file and
+    recording progress after every batch. Failures are stored on the job instead of raised.
+    """
+    job = ComparisonJob.objects.get(pk=job_id)
+    ComparisonJob.objects.filter(pk=job.pk).update(status=ComparisonJob.RUNNING, started_at=timezone.now(), worker=worker_id())
+    os.makedirs(JOB_RESULTS_DIR, exist_ok=True)
+    path = os.path.join(JOB_RESULTS_DIR, f'{job.pk}.{job.export_format}')
+    partial = f'{path}.part'
+    try:
+        fetch, columns = batch_fetcher(job.source, job.loqate_only)
+        with open(partial, 'wb') as output:
+            for piece in iter_export(_job_frames(job, fetch), job.export_format, columns):
+                output.write(piece.encode('utf-8') if isinstance(piece, str) else piece)
+        os.replace(partial, path)
+    except Exception as e:
+        logger.exception(f"Comparison job {job.pk} failed")
+        if os.path.exists(partial):
+            os.remove(partial)
+        ComparisonJob.objects.filter(pk=job.pk).update(status=ComparisonJob.FAILED, error=str(e), finished_at=timezone.now())
+        return
+    ComparisonJob.objects.filter(pk=job.pk).update(status=ComparisonJob.DONE, result_path=path, finished_at=timezone.now())
+
+
+def batch_fetcher(source, loqate_only=False):
+    """
+    Return (fetch, columns) for a source: fetch(batch_of_ids) -> DataFrame of flat address rows
+    with the given output columns. Shared by background jobs and the compare_addresses command.
+    """
+    if source == 'mongo':
+        handler = DataHandler(MongoDBSource())
+        def fetch(batch):
+            return handler.fetch_flat_addresses({'_id': {'$in': batch}}, loqate_only=loqate_only, columns=ADDRESS_COLUMNS)
+        return fetch, ADDRESS_COLUMNS
+    if source == 'cds':
+        client = CDSClient()
+        def fetch(batch):
+            df = client.lookup_multiple_entities_as_dataframe(batch)
+            return loqate_batch_rows(df) if loqate_only else df
+        return fetch, BATCH_COLUMNS
+    raise ValueError(f"Unsupported job source: {source}")
+
+
+def _job_frames(job, fetch):
+    """
+    Yield one DataFrame per batch of the job's identifiers, updating processed/rows as batches finish.
+    """
+    identifiers = job.identifiers
+    for start in range(0, len(identifiers), max(1, JOB_BATCH_SIZE)):
+        batch = identifiers[start:start + JOB_BATCH_SIZE]
+        df = fetch(batch)
+        ComparisonJob.objects.filter(pk=job.pk).update(processed=F('processed') + len(batch), rows=F('rows') + len(df))
+        yield df
+
+
+def _process_alive(pid):
+    """
+    True if a process with this pid is running on this host.
+    """
+    if os.name == 'nt':
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows; query the process instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))) and exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_alive(worker):
+    """
+    Whether the process that owns a job (worker_id() format) may still be running it.
+    Workers on other hosts cannot be checked and are assumed alive.
+    """
+    host, _, pid = worker.rpartition(':')
+    if not host or not pid.isdigit():
+        return False
+    if host != socket.gethostname():
+        return True
+    return int(pid) == os.getpid() or _process_alive(int(pid))
+
+
+def recover_stale_jobs():
+    """
+    Mark queued or running jobs whose owning process has exited (e.g. a server restart) as failed,
+    removing their partial result files. The in-process pool lost them, so they would never finish.
+    Returns the number of jobs marked failed.
+    """
+    stale = [job for job in ComparisonJob.objects.filter(status__in=[ComparisonJob.QUEUED, ComparisonJob.RUNNING]).only('pk', 'worker', 'export_format')
+             if not _worker_alive(job.worker)]
+    for job in stale:
+        partial = os.path.join(JOB_RESULTS_DIR, f'{job.pk}.{job.export_format}.part')
+        if os.path.exists(partial):
+            os.remove(partial)
+    if stale:
+        ComparisonJob.objects.filter(pk__in=[job.pk for job in stale], status__in=[ComparisonJob.QUEUED, ComparisonJob.RUNNING]).update(
+            status=ComparisonJob.FAILED, error='Interrupted: the server process running this job exited.', finished_at=timezone.now()
+        )
+        logger.warning(f"Marked {len(stale)} interrupted comparison job(s) as failed")
+    return len(stale)
+
+
+def cleanup_finished_jobs(retention_days=None):
+    """
+    Delete finished (done or failed) jobs older than retention_days (default JOB_RETENTION_DAYS)
+    together with their result files. Returns the number of jobs deleted.
+    """
+    retention_days = JOB_RETENTION_DAYS if retention_days is None else retention_days
+    if retention_days <= 0:
+        return 0
+    expired = ComparisonJob.objects.filter(status__in=[ComparisonJob.DONE, ComparisonJob.FAILED],
+                                           finished_at__lt=timezone.now() - timedelta(days=retention_days))
+    for path in expired.exclude(result_path='').values_list('result_path', flat=True):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove job result {path}: {e}")
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def recover_jobs_once(**kwargs):
+    """
+    request_started receiver (see apps.py): on the first request a process serves, fail the jobs
+    left behind by exited processes and apply the result retention.
+    """
+    global _recovered
+    if _recovered:
+        return
+    with _executor_lock:
+        if _recovered:
+            return
+        _recovered = True
+    try:
+        recover_stale_jobs()
+        cleanup_finished_jobs()
+    except DatabaseError:
+        logger.exception("Comparison job recovery failed (has `manage.py migrate` been run?)")
@@ -0,0 +1,18 @@
+# cleanup_jobs.py: Fail comparison jobs left behind by exited server processes and delete expired results.
+from django.core.management.base import BaseCommand
+from ...jobs import cleanup_finished_jobs, recover_stale_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark queued/running comparison jobs whose server process has exited as failed, and delete "
+        "finished jobs (and their result files) older than the retention period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, help="Retention in days (default: JOB_RETENTION_DAYS; 0 keeps everything)")
+
+    def handle(self, *args, **options):
+        failed = recover_stale_jobs()
+        deleted = cleanup_finished_jobs(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{failed} interrupted job(s) marked failed, {deleted} expired job(s) deleted"))
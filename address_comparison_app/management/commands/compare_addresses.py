@@ -0,0 +1,185 @@
+# compare_addresses.py: Resumable offline bulk comparison of an ID file against MongoDB or the CDS API.
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from ...cds_client import CDSClient
+from ...exporters import import_pyarrow, iter_csv, iter_parquet
+from ...jobs import batch_fetcher
+from ...snapshot_store import snapshot_store
+
+# Identifiers per chunk (one fetch and one checkpoint each) and chunks fetched concurrently
+COMPARE_CHUNK_SIZE = int(os.environ.get('COMPARE_CHUNK_SIZE', '500'))
+COMPARE_WORKERS = int(os.environ.get('COMPARE_WORKERS', '4'))
+
+
+def read_identifiers(path):
+    """
+    Identifiers from a text file, one per line (commas also separate), blanks and duplicates dropped.
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        identifiers = (part.strip() for line in f for part in line.split(','))
+        return list(dict.fromkeys(i for i in identifiers if i))
+
+
+# CSVChunkWriter appends each chunk to a single CSV file. The checkpoint records the file size
+# after every chunk, so a resumed run truncates whatever a crash left half-written.
+class CSVChunkWriter:
+    def __init__(self, path, columns, offset=0):
+        self.columns = columns
+        self.file = open(path, 'r+b' if offset else 'wb')
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        if not offset:
+            self.file.write(''.join(iter_csv([], columns)).encode('utf-8'))
+
+    def write(self, index, df):
+        """
+        Append a chunk and make it durable; returns the checkpoint position (the file size).
+        """
+        for piece in iter_csv([df], self.columns, header=False):
+            self.file.write(piece.encode('utf-8'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+# ParquetChunkWriter writes one part file per non-empty chunk into a directory (readable as one
+# dataset, e.g. pandas.read_parquet(directory)). Parts past the checkpoint are removed on resume.
+class ParquetChunkWriter:
+    def __init__(self, path, columns, completed=0):
+        import_pyarrow()
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith('part-') and (not name.endswith('.parquet') or int(name[5:10]) >= completed):
+                os.remove(os.path.join(path, name))
+
+    def write(self, index, df):
+        """
+        Write a chunk as its own part file (atomically); returns the checkpoint position (unused).
+        """
+        if not df.empty:
+            part = os.path.join(self.path, f'part-{index:05d}.parquet')
+            with open(f'{part}.tmp', 'wb') as f:
+                for piece in iter_parquet([df], self.columns):
+                    f.write(piece)
+            os.replace(f'{part}.tmp', part)
+        return 0
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the addresses of every identifier in a file against MongoDB or the CDS API, "
+        "streaming rows to CSV or Parquet. Progress is checkpointed per chunk; re-running the "
+        "same command resumes after the last completed chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids_file', help="Text file with one identifier per line")
+        parser.add_argument('output', help="CSV file, or a directory of Parquet part files with --format parquet")
+        parser.add_argument('--source', choices=['mongo', 'cds'], default='mongo')
+        parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+        parser.add_argument('--chunk-size', type=int, default=COMPARE_CHUNK_SIZE, help="Identifiers per chunk")
+        parser.add_argument('--workers', type=int, default=COMPARE_WORKERS, help="Chunks fetched concurrently")
+        parser.add_argument('--loqate-only', action='store_true', help="Keep Loqate-standardized addresses only")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint.json)")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+        parser.add_argument('--snapshot', nargs='?', const='', default=None, metavar='PATH',
+                            help="Also store the rows in the local snapshot database (default path: ADDRESS_SNAPSHOT_PATH)")
+
+    def handle(self, *args, **options):
+        snapshot = None
+        if options['snapshot'] is not None:
+            if options['loqate_only']:
+                raise CommandError("--snapshot stores complete rows and cannot be combined with --loqate-only")
+            snapshot = snapshot_store(options['snapshot'] or None)
+            if snapshot is None:
+                raise CommandError("--snapshot needs a path or ADDRESS_SNAPSHOT_PATH")
+        identifiers = read_identifiers(options['ids_file'])
+        chunk_size = max(1, options['chunk_size'])
+        chunks = list(CDSClient.split_list(identifiers, chunk_size))
+        checkpoint_path = options['checkpoint'] or f"{options['output']}.checkpoint.json"
+        settings = {
+            'ids_file': os.path.abspath(options['ids_file']), 'identifiers': len(identifiers),
+            'source': options['source'], 'format': options['format'],
+            'chunk_size': chunk_size, 'loqate_only': options['loqate_only'],
+        }
+        state = {'settings': settings, 'completed': 0, 'position': 0, 'rows': 0}
+        if not options['restart'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                saved = json.load(f)
+            if saved.get('settings') != settings:
+                raise CommandError(f"{checkpoint_path} was written for a different run; use --restart to start over")
+            state = saved
+            self.stdout.write(f"Resuming after chunk {state['completed']}/{len(chunks)} ({state['rows']} rows written)")
+
+        fetch, columns = batch_fetcher(options['source'], options['loqate_only'])
+        if options['format'] == 'parquet':
+            try:
+                writer = ParquetChunkWriter(options['output'], columns, state['completed'])
+            except ImportError:
+                raise CommandError("Parquet output requires pyarrow")
+        else:
+            writer = CSVChunkWriter(options['output'], columns, state['position'])
+        try:
+            self._run(chunks, fetch, writer, state, checkpoint_path, max(1, options['workers']),
+                      snapshot=snapshot, source=options['source'])
+        finally:
+            writer.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {len(identifiers)} identifiers in {len(chunks)} chunks, {state['rows']} rows written to {options['output']}"
+        ))
+
+    def _run(self, chunks, fetch, writer, state, checkpoint_path, workers, snapshot=None, source=None):
+        """
+        Fetch chunks on a thread pool (at most 2 x workers in flight) and write them strictly in
+        order (and to the snapshot, if given), saving the checkpoint after each one. A failed chunk
+        stops the run; everything before it stays checkpointed.
+        """
+        remaining = iter(range(state['completed'], len(chunks)))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compare-addresses')
+        pending = deque()
+        def submit_next():
+            index = next(remaining, None)
+            if index is not None:
+                pending.append((index, executor.submit(fetch, chunks[index])))
+        try:
+            for _ in range(2 * workers):
+                submit_next()
+            while pending:
+                index, future = pending.popleft()
+                try:
+                    df = future.result()
+                except Exception as e:
+                    raise CommandError(
+                        f"Chunk {index + 1}/{len(chunks)} failed: {e}. Re-run the same command to resume."
+                    ) from e
+                state['position'] = writer.write(index, df)
+                if snapshot is not None:
+                    snapshot.put_frame(source, chunks[index], df)
+                state['completed'] = index + 1
+                state['rows'] += len(df)
+                self._save_checkpoint(checkpoint_path, state)
+                self.stdout.write(f"Chunk {index + 1}/{len(chunks)}: {len(df)} rows")
+                submit_next()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _save_checkpoint(path, state):
+        """
+        Replace the checkpoint file atomically.
+        """
+        partial = f'{path}.tmp'
+        with open(partial, 'w') as f:
+            json.dump(state, f)
+        os.replace(partial, path)
@@ -0,0 +1,53 @@
+# refresh_snapshot.py: Apply the MongoDB documents changed since the last run to the local address snapshot.
+from django.core.management.base import BaseCommand, CommandError
+from ...data_handler import DataHandler, FileWatermark, MongoDBSource
+from ...snapshot_store import snapshot_store
+
+# _ids read per query when reconciling deletions in last-modified-field mode
+RECONCILE_PAGE_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Incrementally refresh the MongoDB rows of the local snapshot: only documents inserted, updated "
+        "or deleted since the persisted watermark are read (see DataHandler.fetch_delta). With a "
+        "last-modified field, which cannot see deletions, snapshotted _ids no longer in MongoDB are dropped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot', metavar='PATH', help="Snapshot database (default: ADDRESS_SNAPSHOT_PATH)")
+        parser.add_argument('--watermark', metavar='PATH', help="Watermark file (default: MONGO_WATERMARK_PATH)")
+        parser.add_argument('--field', help="Last-modified field to track (default: MONGO_DELTA_FIELD; "
+                                            "the change stream is used when neither is set)")
+
+    def handle(self, *args, **options):
+        store = snapshot_store(options['snapshot'])
+        if store is None:
+            raise CommandError("No snapshot configured: pass --snapshot or set ADDRESS_SNAPSHOT_PATH")
+        source = MongoDBSource()
+        delta = DataHandler(source).fetch_delta(FileWatermark(options['watermark']), field=options['field'])
+        store.put_mongo_rows(delta.changed_ids, [] if delta.frame.empty else delta.frame.to_dict('records'))
+        store.delete_mongo_ids(delta.deleted_ids)
+        deleted = len(delta.deleted_ids)
+        if not delta.tracks_deletions:
+            deleted += store.retain_mongo_ids(self.live_ids(source))
+        delta.commit()
+        if delta.tracks_deletions:
+            # The change stream reported every change, so unchanged snapshot rows are current
+            store.mark_synced('mongo')
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot refreshed: {len(delta.changed_ids)} changed and {deleted} deleted documents"
+        ))
+
+    @staticmethod
+    def live_ids(source):
+        """
+        Every _id currently in the collection, read page by page through the _id index.
+        """
+        after = None
+        while True:
+            ids = source.fetch_ids({}, after=after, limit=RECONCILE_PAGE_SIZE)
+            yield from ids
+            if len(ids) < RECONCILE_PAGE_SIZE:
+                return
+            after = ids[-1]
@@ -1,5 +1,74 @@
-# models.py: Placeholder for Django ORM models (not used in current MongoDB workflow).
+# models.py: Django ORM models. Address data stays in MongoDB (accessed directly via pymongo);
+# the default SQLite database only tracks background comparison jobs (see jobs.py).
+import uuid
 from django.db import models
 
-# No models are defined because MongoDB is accessed directly via pymongo.
-# If you need to add relational or hybrid models, define them here using Django ORM.
+
+# ComparisonJob records one background batch comparison: its inputs, progress and result file.
+class ComparisonJob(models.Model):
+    SOURCE_CHOICES = [
+        ('mongo', 'MongoDB'),
+        ('cds', 'CDS API'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet'),
+    ]
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    source = models.CharField(max_length=16, choices=SOURCE_CHOICES)
+    identifiers = models.JSONField(default=list)
+    loqate_only = models.BooleanField(default=False)
+    export_format = models.CharField(max_length=16, choices=FORMAT_CHOICES, default='csv')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    result_path = models.CharField(max_length=1024, blank=True)
+    error = models.TextField(blank=True)
+    # Process ("host:pid") that queued/runs the job; jobs of exited processes are failed by jobs.recover_stale_jobs
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.source} job {self.id} ({self.status})"
+
+    @property
+    def progress(self):
+        """
+        Fraction of identifiers processed, in [0, 1].
+        """
+        return self.processed / self.total if self.total else (1.0 if self.status == self.DONE else 0.0)
+
+    def as_dict(self):
+        """
+        JSON-serializable status summary for the progress endpoint.
+        """
+        return {
+            'job_id': str(self.id),
+            'source': self.source,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'rows': self.rows,
+            'progress': round(self.progress, 4),
+            'error': self.error or None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,90 @@
+# normalization_backends.py: Pluggable backends turning MongoDB address documents into the flat,
+# ASCII-normalized rows of DataHandler.normalize_addresses (in-process pandas, or Spark in local mode).
+import importlib.util
+import os
+import threading
+from abc import ABC, abstractmethod
+from .ascii_normalizer import default_normalizer
+
+# Document count from which normalize_addresses switches to Spark (when pyspark is installed);
+# 0 (the default) keeps every batch on pandas, set it from benchmarks/bench_normalization_backends.py to opt in
+SPARK_MIN_DOCUMENTS = int(os.environ.get('SPARK_MIN_DOCUMENTS', '0'))
+# Spark master for the normalization session (all local cores by default)
+SPARK_MASTER = os.environ.get('SPARK_MASTER', 'local[*]')
+
+
+# NormalizationBackend is the interface: normalize(documents, columns) returns the same DataFrame
+# (columns, order, ASCII normalization) whichever backend runs it.
+class NormalizationBackend(ABC):
+    name = None
+
+    @abstractmethod
+    def normalize(self, documents, columns=None):
+        """
+        Flatten and ASCII-normalize a list of MongoDB documents into a DataFrame (see DataHandler.normalize_addresses).
+        """
+
+
+# PandasBackend runs the pure-Python flattening in this process; best for small and medium batches.
+class PandasBackend(NormalizationBackend):
+    name = 'pandas'
+
+    def __init__(self, normalizer=None):
+        self.normalizer = normalizer or default_normalizer
+
+    def normalize(self, documents, columns=None):
+        from .data_handler import DataHandler  # data_handler selects backends from this module
+        return DataHandler(None, self.normalizer).flatten_addresses(documents, columns)
+
+
+# SparkBackend flattens with SparkTransformer on a local[*] session so large batches use every core.
+# The session is created on first use and shared by all SparkBackend instances.
+class SparkBackend(NormalizationBackend):
+    name = 'spark'
+    _session = None
+    _session_lock = threading.Lock()
+
+    def __init__(self, spark=None, master=None):
+        self._spark = spark
+        self.master = master or SPARK_MASTER
+
+    @property
+    def spark(self):
+        """
+        The SparkSession to run on (the shared local session unless one was given).
+        """
+        if self._spark is None:
+            with SparkBackend._session_lock:
+                if SparkBackend._session is None:
+                    from pyspark.sql import SparkSession
+                    SparkBackend._session = (SparkSession.builder.master(self.master)
+                                             .appName('address-normalization').getOrCreate())
+            self._spark = SparkBackend._session
+        return self._spark
+
+    def normalize(self, documents, columns=None):
+        from .spark_transformer import SparkTransformer
+        transformer = SparkTransformer(self.spark)
+        prepared, coerced = transformer.prepare_documents(documents)
+        df = transformer.create_dataframe(prepared, transformer.define_schema())
+        pdf = transformer.to_pandas(transformer.normalize_ascii(transformer.transform_dataframe(df, columns)))
+        return transformer.restore_types(transformer.restore_ids(pdf, documents), documents, coerced)
+
+
+def spark_available():
+    """
+    True if pyspark can be imported.
+    """
+    return importlib.util.find_spec('pyspark') is not None
+
+
+def select_backend(document_count, normalizer=None, threshold=None):
+    """
+    The backend for a batch of document_count documents: Spark from threshold (default
+    SPARK_MIN_DOCUMENTS) documents up when pyspark is installed, pandas otherwise (and always
+    pandas when the threshold is 0).
+    """
+    threshold = SPARK_MIN_DOCUMENTS if threshold is None else threshold
+    if threshold > 0 and document_count >= threshold and spark_available():
+        return SparkBackend()
+    return PandasBackend(normalizer)
@@ -0,0 +1,228 @@
+"""
+Client-side rate limiting and retry policy for CDS API calls
+Token-bucket request pacing, AIMD adaptive concurrency and jittered exponential
+backoff that honors Retry-After, shared by every CDS lookup in a process.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+# HTTP statuses that signal overload/transient failure and are retried
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """Thread-safe token bucket; a rate of 0 disables pacing."""
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self._paused_until - now)
+            if self.rate <= 0:
+                return wait
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds`` (e.g. after a Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: +1/limit per success (additive increase),
+    halved on throttling responses (multiplicative decrease).
+    """
+    def __init__(self, initial: int, minimum: int = 1, maximum: Optional[int] = None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum or initial)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        # (loop, future) of coroutines waiting in acquire_async, woken by release
+        self._async_waiters = deque()
+    def acquire(self) -> None:
+        """Block until fewer than ``limit`` requests are in flight."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free, without blocking."""
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+    async def acquire_async(self) -> None:
+        """
+        Wait (without blocking the event loop) until fewer than ``limit`` requests are in flight.
+        Waiters sleep on a future that release() resolves, thread-safely, when a slot frees up.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except BaseException:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                    else:
+                        self._wake_async_waiters()  # pass on the wake-up this waiter was given
+                raise
+    def release(self, throttled: bool = False) -> None:
+        """Release a slot and adapt the limit to the outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            self._wake_async_waiters()
+    def _wake_async_waiters(self) -> None:
+        """Wake one async waiter per free slot (call with the lock held)."""
+        for _ in range(min(len(self._async_waiters), int(self.limit) - self.in_flight)):
+            loop, waiter = self._async_waiters.popleft()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve, waiter)
+
+def _resolve(future: 'asyncio.Future') -> None:
+    if not future.done():
+        future.set_result(None)
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter"), overridden by Retry-After when present."""
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+    def should_retry(self, attempt: int, status_code: Optional[int]) -> bool:
+        """Retry connection failures (status None) and RETRY_STATUSES while attempts remain."""
+        return attempt < self.max_retries and (status_code is None or status_code in RETRY_STATUSES)
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before retry number ``attempt + 1``."""
+        requested = parse_retry_after(retry_after)
+        if requested is not None:
+            return min(requested, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+class RequestSlot:
+    """Outcome marker for one rate-limited request."""
+    __slots__ = ('throttled',)
+    def __init__(self):
+        self.throttled = False
+
+class RateLimiter:
+    """Token bucket + adaptive concurrency + retry policy used around each CDS request."""
+    def __init__(self, bucket: TokenBucket, concurrency: AdaptiveConcurrencyLimiter, retry: RetryPolicy):
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.retry = retry
+    @classmethod
+    def from_config(cls, config) -> 'RateLimiter':
+        """
+        Build a limiter from CDSConfig settings. The concurrency ceiling is rate_limit_max_concurrency,
+        not the batch thread pool size, so async lookups can keep many requests in flight.
+        """
+        return cls(
+            TokenBucket(config.rate_limit, config.rate_burst or None),
+            AdaptiveConcurrencyLimiter(config.rate_limit_max_concurrency, maximum=config.rate_limit_max_concurrency),
+            RetryPolicy(config.max_retries, config.backoff_base, config.backoff_max)
+        )
+    @contextmanager
+    def slot(self):
+        """
+        Wait for a request slot (concurrency limit, then token bucket). Set ``slot.throttled``
+        when the response was a throttling/overload signal so the concurrency limit backs off.
+        """
+        self.concurrency.acquire()
+        slot = RequestSlot()
+        try:
+            self.bucket.acquire()
+            yield slot
+        finally:
+            self.concurrency.release(slot.throttled)
+    @asynccontextmanager
+    async def aslot(self):
+        """Async slot(): the same concurrency limit and token bucket, awaited instead of blocking."""
+        await self.concurrency.acquire_async()
+        slot = RequestSlot()
+        try:
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield slot
+        finally:
+            self.concurrency.release(slot.throttled)
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Compute the retry delay; a Retry-After also pauses every other caller for that long."""
+        delay = self.retry.delay(attempt, retry_after)
+        if retry_after is not None:
+            self.bucket.pause(delay)
+        return delay
+
+_shared_limiters: Dict[Tuple, RateLimiter] = {}
+_shared_lock = threading.Lock()
+
+def limiter_key(config) -> Tuple:
+    """The CDS endpoint and every CDSConfig setting RateLimiter.from_config reads."""
+    return (config.base_url_cds, config.rate_limit, config.rate_burst, config.rate_limit_max_concurrency,
+            config.max_retries, config.backoff_base, config.backoff_max)
+
+def shared_rate_limiter(config) -> RateLimiter:
+    """
+    Return the process-wide rate limiter for a configuration. Clients with the same endpoint and
+    limits share one limiter (and its adaptive state); different settings get their own.
+    """
+    key = limiter_key(config)
+    limiter = _shared_limiters.get(key)
+    if limiter is None:
+        with _shared_lock:
+            limiter = _shared_limiters.get(key)
+            if limiter is None:
+                limiter = _shared_limiters[key] = RateLimiter.from_config(config)
+    return limiter
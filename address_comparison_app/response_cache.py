@@ -0,0 +1,140 @@
+"""
+In-memory CDS response cache for Moody's Address Comparison WebApp
+Bounded TTL + LRU cache (by entry count and approximate byte size) shared by all
+lookups in a process, with short-lived negative entries for "not found" identifiers.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import pandas as pd
+
+class CachedError:
+    """Marker stored for negative (error) cache entries."""
+    __slots__ = ('message', 'status_code')
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.message = message
+        self.status_code = status_code
+
+class ResponseCache:
+    """
+    Thread-safe TTL + LRU cache. Entries expire after their TTL and the least recently
+    used entries are evicted once ``max_entries`` or ``max_bytes`` is exceeded.
+    """
+    def __init__(self, ttl: float = 900, negative_ttl: float = 60, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    @classmethod
+    def from_config(cls, config) -> Optional['ResponseCache']:
+        """Build a cache from CDSConfig settings, or None if caching is disabled (TTL of 0)."""
+        if config.cache_ttl <= 0:
+            return None
+        return cls(
+            ttl=config.cache_ttl,
+            negative_ttl=config.cache_negative_ttl,
+            max_entries=config.cache_max_entries,
+            max_bytes=config.cache_max_bytes
+        )
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, value); expired entries count as misses."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value, size = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting least recently used entries to stay within bounds."""
+        size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    def set_negative(self, key: Hashable, message: str, status_code: Optional[int] = None) -> None:
+        """Remember a failed lookup for the (short) negative TTL."""
+        self.set(key, CachedError(message, status_code), ttl=self.negative_ttl)
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        """Approximate the memory held by a cached value."""
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, CachedError):
+            return len(value.message) + 64
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return 1024
+
+def response_key(config, identifier_type: str, value: Any) -> Tuple[Any, ...]:
+    """
+    Cache key of one CDS lookup. Includes the CDS base URL and API audience so services
+    configured against different environments never read each other's responses.
+    """
+    return ('response', config.base_url_cds, config.api_name, identifier_type, value)
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+def shared_response_cache(config) -> Optional[ResponseCache]:
+    """Return the process-wide response cache, created from the first config that asks for it."""
+    global _shared_cache
+    if config.cache_ttl <= 0:
+        return None
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = ResponseCache.from_config(config)
+    return _shared_cache
@@ -0,0 +1,268 @@
+# similarity.py: Vectorized reported-vs-standardized address similarity scoring.
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Characters compared per value by the edit-distance kernel (longer values are truncated)
+MAX_EDIT_LENGTH = 64
+# Pairs per numpy batch in the edit-distance kernel (bounds the temporary (rows x length) arrays)
+EDIT_BATCH_SIZE = 16384
+
+# Compared field -> (reported column, standardized column) for each frame layout:
+# explode_location_data (CDS) first, then DataHandler.normalize_addresses (MongoDB)
+FIELD_COLUMNS = {
+    'address_lines': (('reported_address_lines', 'standardized_address_lines'),
+                      ('reportedAddress_addressLines', 'standardizedAddress_addressLines')),
+    'city': (('reported_city', 'standardized_locality'),
+             ('reportedAddress_city', 'standardizedAddress_locality')),
+    'post_code': (('reported_post_code', 'standardized_postal_code'),
+                  ('reportedAddress_postCode', 'standardizedAddress_postalCode')),
+    'country': (('reported_country_label', 'standardized_country_name'),),
+}
+
+# Weight of each component in overall_score (renormalized over the components available per row)
+DEFAULT_WEIGHTS = {
+    'address_lines_similarity': 0.2,
+    'address_lines_token_overlap': 0.2,
+    'city_similarity': 0.25,
+    'post_code_match': 0.25,
+    'country_similarity': 0.1,
+}
+
+# Runs of anything but letters and digits (any script), collapsed to one space
+_NON_ALNUM = re.compile(r'[\W_]+')
+
+
+def _clean_text(value):
+    """
+    Casefolded text with accents removed and punctuation collapsed to single spaces, so 'Zürich' and
+    'ZURICH' compare equal (CDS rows are not ASCII-normalized); letters of other scripts are kept.
+    None for missing values, including values that clean to nothing (e.g. CDS rows without address
+    lines), so they are not scored as matches.
+    """
+    if isinstance(value, list):
+        value = ' '.join(str(i) for i in value if i is not None)
+    elif not isinstance(value, str):
+        return None
+    folded = unicodedata.normalize('NFKD', value.casefold())
+    if not folded.isascii():
+        folded = ''.join(c for c in folded if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', folded).strip() or None
+
+
+def _compact_code(value):
+    """
+    Post code without spaces or punctuation, upper-cased; None for missing values.
+    """
+    text = _clean_text(value)
+    return None if text is None else text.replace(' ', '').upper()
+
+
+def _factorize(values, clean):
+    """
+    Encode a column as integer codes into its distinct cleaned values (code -1 for missing values).
+    Hashing runs in pandas; clean is called once per distinct value.
+    """
+    values = np.asarray(values, dtype=object) if not isinstance(values, np.ndarray) else values
+    try:
+        codes, uniques = pd.factorize(values)
+    except TypeError:
+        # Lists (e.g. MongoDB address lines) are unhashable: factorize them as tuples
+        codes, uniques = pd.factorize(pd.Series([tuple(v) if isinstance(v, list) else v for v in values], dtype=object))
+    cleaned = [clean(list(v) if isinstance(v, tuple) else v) for v in uniques]
+    missing = [i for i, v in enumerate(cleaned) if v is None]
+    if missing:
+        codes = np.where(np.isin(codes, missing), -1, codes)
+    return codes, cleaned
+
+
+def _pair_kernel(factorized_a, factorized_b, kernel):
+    """
+    Apply kernel(list_a, list_b) -> scores to each distinct (reported, standardized) pair once
+    and scatter the scores back to every row; rows with a missing side score NaN.
+    """
+    codes_a, values_a = factorized_a
+    codes_b, values_b = factorized_b
+    scores = np.full(len(codes_a), np.nan)
+    present = (codes_a >= 0) & (codes_b >= 0)
+    if not present.any():
+        return scores
+    stride = max(1, len(values_b))
+    keys = codes_a[present].astype(np.int64) * stride + codes_b[present]
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    pairs_a = [values_a[k] for k in (unique_keys // stride).tolist()]
+    pairs_b = [values_b[k] for k in (unique_keys % stride).tolist()]
+    scores[present] = kernel(pairs_a, pairs_b)[inverse]
+    return scores
+
+
+def _encode(strings, width):
+    """
+    Fixed-width (rows x width) uint32 code point matrix for a list of strings, zero padded.
+    """
+    return np.array(strings, dtype=f'<U{width}').view(np.uint32).reshape(len(strings), width)
+
+
+def _levenshtein_batch(a, b):
+    """
+    Edit distances between two equal-length lists of strings (already truncated).
+    One dynamic-programming row is computed for all pairs at once; the insertion recurrence
+    d[j] = min(d[j], d[j-1] + 1) is resolved with a running minimum over d[j] - j.
+    """
+    n = len(a)
+    len_a = np.fromiter((len(s) for s in a), dtype=np.int64, count=n)
+    len_b = np.fromiter((len(s) for s in b), dtype=np.int64, count=n)
+    width_a = max(1, int(len_a.max()))
+    width_b = max(1, int(len_b.max()))
+    codes_a = _encode(a, width_a)
+    codes_b = _encode(b, width_b)
+    distances = len_b.copy()
+    offsets = np.arange(width_b + 1, dtype=np.int16)
+    previous = np.broadcast_to(offsets, (n, width_b + 1)).copy()
+    current = np.empty_like(previous)
+    rows = np.arange(n)
+    for i in range(1, width_a + 1):
+        cost = (codes_b != codes_a[:, i - 1:i]).view(np.int8)
+        current[:, 0] = i
+        np.add(previous[:, :-1], cost, out=current[:, 1:])
+        np.minimum(current[:, 1:], previous[:, 1:] + 1, out=current[:, 1:])
+        current -= offsets
+        np.minimum.accumulate(current, axis=1, out=current)
+        current += offsets
+        done = len_a == i
+        if done.any():
+            distances[done] = current[rows[done], len_b[done]]
+        previous, current = current, previous
+    return distances
+
+
+def _edit_kernel(a, b, max_length=MAX_EDIT_LENGTH, batch_size=EDIT_BATCH_SIZE):
+    """
+    Normalized edit similarity of cleaned string pairs, batched by length.
+    """
+    a = [x[:max_length] for x in a]
+    b = [y[:max_length] for y in b]
+    len_a = np.fromiter(map(len, a), dtype=np.int64, count=len(a))
+    len_b = np.fromiter(map(len, b), dtype=np.int64, count=len(b))
+    longest = np.maximum(len_a, len_b)
+    scores = np.ones(len(a))
+    order = np.argsort(len_a + len_b, kind='stable')
+    for start in range(0, len(order), batch_size):
+        index = order[start:start + batch_size]
+        distances = _levenshtein_batch([a[i] for i in index], [b[i] for i in index])
+        scores[index] = np.where(longest[index] > 0, 1.0 - distances / np.maximum(longest[index], 1), 1.0)
+    return scores
+
+
+def _token_kernel(a, b):
+    """
+    Jaccard overlap of the word sets of cleaned string pairs.
+    """
+    scores = np.empty(len(a))
+    for i, (x, y) in enumerate(zip(a, b)):
+        x = set(x.split())
+        y = set(y.split())
+        union = len(x | y)
+        scores[i] = len(x & y) / union if union else 1.0
+    return scores
+
+
+def _match_kernel(a, b):
+    """
+    1.0 for equal cleaned values, else 0.0.
+    """
+    return np.fromiter((x == y for x, y in zip(a, b)), dtype=float, count=len(a))
+
+
+def edit_similarity(reported, standardized):
+    """
+    1 - normalized Levenshtein distance of the cleaned values, in [0, 1] (NaN if either side is missing).
+    Values are compared on their first MAX_EDIT_LENGTH characters. Each distinct pair is scored once,
+    in numpy batches grouped by length, so repeated values (cities, countries) cost nothing extra.
+    """
+    return _pair_kernel(_factorize(reported, _clean_text), _factorize(standardized, _clean_text), _edit_kernel)
+
+
+def token_set_similarity(reported, standardized):
+    """
+    Jaccard overlap of the word sets of the cleaned values (NaN if either side is missing).
+    """
+    return _pair_kernel(_factorize(reported, _clean_text), _factorize(standardized, _clean_text), _token_kernel)
+
+
+def exact_match(reported, standardized, clean=_compact_code):
+    """
+    1.0 where the cleaned values are equal, 0.0 where they differ, NaN if either side is missing.
+    """
+    return _pair_kernel(_factorize(reported, clean), _factorize(standardized, clean), _match_kernel)
+
+
+def _field_columns(df, field):
+    """
+    The (reported, standardized) column pair of a compared field present in df, or None.
+    """
+    for reported, standardized in FIELD_COLUMNS[field]:
+        if reported in df.columns and standardized in df.columns:
+            return reported, standardized
+    return None
+
+
+def score_addresses(df, weights=None):
+    """
+    Return a copy of an address DataFrame (from explode_location_data or normalize_addresses) with
+    per-field scores and a weighted overall_score, all in [0, 1] or NaN when not comparable:
+    address_lines_similarity, address_lines_token_overlap, city_similarity, post_code_match,
+    country_similarity (CDS only). Components missing for a row are left out of its overall score.
+    """
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    scored = df.copy()
+    factorized = {}
+    def column(name, clean=_clean_text):
+        if (name, clean) not in factorized:
+            factorized[name, clean] = _factorize(df[name].to_numpy(dtype=object), clean)
+        return factorized[name, clean]
+    components = {}
+    lines = _field_columns(df, 'address_lines')
+    if lines:
+        components['address_lines_similarity'] = _pair_kernel(column(lines[0]), column(lines[1]), _edit_kernel)
+        components['address_lines_token_overlap'] = _pair_kernel(column(lines[0]), column(lines[1]), _token_kernel)
+    for field in ('city', 'country'):
+        columns = _field_columns(df, field)
+        if columns:
+            components[f'{field}_similarity'] = _pair_kernel(column(columns[0]), column(columns[1]), _edit_kernel)
+    post_code = _field_columns(df, 'post_code')
+    if post_code:
+        components['post_code_match'] = _pair_kernel(
+            column(post_code[0], _compact_code), column(post_code[1], _compact_code), _match_kernel)
+    weighted = np.zeros(len(df))
+    total_weight = np.zeros(len(df))
+    for name, values in components.items():
+        scored[name] = values
+        weight = weights.get(name, 0.0)
+        if weight:
+            available = ~np.isnan(values)
+            weighted += np.where(available, values * weight, 0.0)
+            total_weight += np.where(available, weight, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scored['overall_score'] = np.where(total_weight > 0, weighted / np.maximum(total_weight, 1e-12), np.nan)
+    return scored
+
+
+def sort_by_score(scored, column='overall_score', ascending=True):
+    """
+    Sort scored rows (worst matches first by default; unscored rows last).
+    """
+    return scored.sort_values(column, ascending=ascending, na_position='last', kind='stable')
+
+
+def filter_by_score(scored, min_score=None, max_score=None, column='overall_score'):
+    """
+    Keep rows whose score lies within [min_score, max_score] (either bound optional).
+    """
+    mask = scored[column].notna()
+    if min_score is not None:
+        mask &= scored[column] >= min_score
+    if max_score is not None:
+        mask &= scored[column] <= max_score
+    return scored[mask]
@@ -0,0 +1,322 @@
+# snapshot_store.py: Local indexed SQLite snapshot of normalized MongoDB and flattened CDS address rows.
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from .cds_client import LOCATION_COLUMNS
+from .comparison import is_loqate
+from .data_handler import ADDRESS_COLUMNS
+
+# Snapshot database file; lookups use the live sources when unset
+ADDRESS_SNAPSHOT_PATH = os.environ.get('ADDRESS_SNAPSHOT_PATH', '')
+# Seconds a snapshotted entity is served for; older ones are looked up live again (0: no limit)
+ADDRESS_SNAPSHOT_MAX_AGE = float(os.environ.get('ADDRESS_SNAPSHOT_MAX_AGE', '86400'))
+
+MONGO_TABLE = 'mongo_addresses'
+CDS_TABLE = 'cds_addresses'
+TABLE_COLUMNS = {MONGO_TABLE: ADDRESS_COLUMNS, CDS_TABLE: LOCATION_COLUMNS}
+# Post code and country columns of each table, searched by SnapshotStore.search
+SEARCH_COLUMNS = {
+    MONGO_TABLE: {'post_code': ['reportedAddress_postCode', 'standardizedAddress_postalCode'],
+                  'country': ['standardizedAddress_countryName']},
+    CDS_TABLE: {'post_code': ['reported_post_code', 'standardized_postal_code'],
+                'country': ['reported_country_code', 'reported_country_label', 'standardized_country_name']},
+}
+# Secondary indexes: identifier columns, then the post code and country columns
+SNAPSHOT_INDEXES = {
+    table: identifiers + [c for names in SEARCH_COLUMNS[table].values() for c in names]
+    for table, identifiers in ((MONGO_TABLE, ['_id']), (CDS_TABLE, ['entity_id', 'bvd_id']))
+}
+# Identifier columns are stored as text so int and str entity IDs look up alike
+TEXT_COLUMNS = {'_id', 'entity_id', 'bvd_id'}
+# Text columns read back as integers, as in live frames (explode_location_data's entity_id is int64)
+INT_COLUMNS = {'entity_id'}
+# Columns holding lists (MongoDB address lines, phone and fax numbers), stored as JSON text
+JSON_COLUMNS = {'reportedAddress_addressLines', 'reportedAddress_phoneNumbers', 'reportedAddress_faxNumbers',
+                'standardizedAddress_addressLines'}
+# Bound parameters per IN (...) query (below SQLite's historical limit of 999)
+SQL_BATCH_SIZE = 500
+
+
+def _sql_value(value):
+    """
+    SQLite parameter for a row value: lists as JSON, NaN as NULL, numpy scalars as Python values.
+    """
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(list(value) if isinstance(value, tuple) else value)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+        return None if isinstance(value, float) and math.isnan(value) else value
+    return value
+
+
+def _text_key(value):
+    """
+    Identifier as stored text; integral floats (int IDs upcast by pandas next to missing values) lose their '.0'.
+    """
+    value = _sql_value(value)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return None if value is None else str(value)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _read_value(column, value):
+    """
+    Python value of a stored cell: JSON lists decoded, integer identifiers restored.
+    """
+    if column in JSON_COLUMNS and isinstance(value, str):
+        return json.loads(value)
+    if column in INT_COLUMNS and isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+# SnapshotStore keeps one table per source with the same columns as the live rows
+# (DataHandler.normalize_addresses / explode_location_data), plus a table of the entity keys
+# that have been snapshotted and when, so an entity with no addresses is a hit rather than a miss
+# and entities older than max_age are misses. Connections are per thread; the database uses WAL
+# so views can read while a build writes.
+class SnapshotStore:
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = ADDRESS_SNAPSHOT_MAX_AGE if max_age is None else max_age
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connection(self):
+        """
+        This thread's connection, opened on first use.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """
+        Close this thread's connection.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _create_schema(self):
+        conn = self._connection()
+        with conn:
+            for table, columns in TABLE_COLUMNS.items():
+                definitions = ', '.join(f'{_quote(c)} TEXT' if c in TEXT_COLUMNS else _quote(c) for c in columns)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({definitions})')
+                for column in SNAPSHOT_INDEXES[table]:
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {_quote(f"ix_{table}_{column}")} ON {table} ({_quote(column)})')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS snapshot_entities '
+                '(source TEXT NOT NULL, key TEXT NOT NULL, refreshed_at REAL, PRIMARY KEY (source, key))'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS snapshot_sources (source TEXT PRIMARY KEY, synced_at REAL)')
+
+    def _insert(self, conn, table, rows):
+        columns = TABLE_COLUMNS[table]
+        placeholders = ', '.join('?' * len(columns))
+        conn.executemany(
+            f'INSERT INTO {table} ({", ".join(map(_quote, columns))}) VALUES ({placeholders})',
+            ([_text_key(row.get(c)) if c in TEXT_COLUMNS else _sql_value(row.get(c)) for c in columns] for row in rows)
+        )
+
+    def _mark_known(self, conn, source, keys):
+        now = time.time()
+        conn.executemany(
+            'INSERT OR REPLACE INTO snapshot_entities (source, key, refreshed_at) VALUES (?, ?, ?)',
+            ((source, str(key), now) for key in keys)
+        )
+
+    def put_mongo_rows(self, ids, rows):
+        """
+        Replace the snapshot of the given MongoDB _ids with their flat address rows (all ADDRESS_COLUMNS,
+        not Loqate-filtered). Every _id is recorded as snapshotted, including those without rows.
+        """
+        ids = [str(i) for i in ids]
+        conn = self._connection()
+        with conn:
+            for start in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[start:start + SQL_BATCH_SIZE]
+                conn.execute(f'DELETE FROM {MONGO_TABLE} WHERE "_id" IN ({", ".join("?" * len(batch))})', batch)
+            self._insert(conn, MONGO_TABLE, rows)
+            self._mark_known(conn, 'mongo', ids)
+
+    def mark_synced(self, source, synced_at=None):
+        """
+        Record that every snapshotted entity of a source was current at synced_at (default: now),
+        e.g. after refresh_snapshot applied all changes since the last run. Unchanged entities then
+        count as fresh without being rewritten.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO snapshot_sources (source, synced_at) VALUES (?, ?)',
+                         (source, time.time() if synced_at is None else synced_at))
+
+    def delete_mongo_ids(self, ids):
+        """
+        Drop MongoDB _ids (e.g. deleted documents) from the snapshot; later lookups query MongoDB again.
+        """
+        ids = [str(i) for i in ids]
+        conn = self._connection()
+        with conn:
+            for start in range(0, len(ids), SQL_BATCH_SIZE):
+                batch = ids[start:start + SQL_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                conn.execute(f'DELETE FROM {MONGO_TABLE} WHERE "_id" IN ({placeholders})', batch)
+                conn.execute(f"DELETE FROM snapshot_entities WHERE source = 'mongo' AND key IN ({placeholders})", batch)
+
+    def retain_mongo_ids(self, live_ids):
+        """
+        Drop every snapshotted MongoDB _id not in live_ids (the string form of the _ids currently in the
+        collection), for refreshes that cannot observe deletions. Returns the number of _ids dropped.
+        """
+        live_ids = {str(i) for i in live_ids}
+        conn = self._connection()
+        known = [row[0] for row in conn.execute("SELECT key FROM snapshot_entities WHERE source = 'mongo'")]
+        stale = [key for key in known if key not in live_ids]
+        self.delete_mongo_ids(stale)
+        return len(stale)
+
+    def put_cds_rows(self, identifier, rows):
+        """
+        Replace the snapshot of one CDS lookup with its flattened location rows. The identifier and
+        the entity/BVD IDs of the rows are all recorded as snapshotted keys.
+        """
+        keys = {_text_key(identifier)}
+        for row in rows:
+            keys.update(_text_key(row.get(c)) for c in ('entity_id', 'bvd_id'))
+        keys.discard(None)
+        conn = self._connection()
+        with conn:
+            for key in keys:
+                conn.execute(f'DELETE FROM {CDS_TABLE} WHERE entity_id = ? OR bvd_id = ?', (key, key))
+            self._insert(conn, CDS_TABLE, rows)
+            self._mark_known(conn, 'cds', keys)
+
+    def put_frame(self, source, identifiers, df):
+        """
+        Snapshot one batch frame as produced by jobs.batch_fetcher (MongoDB flat rows, or CDS batch
+        rows with lookup_identifier/lookup_type); CDS identifiers whose lookup failed are skipped.
+        """
+        rows = [] if df.empty else df.to_dict('records')
+        if source == 'mongo':
+            self.put_mongo_rows(identifiers, rows)
+            return
+        by_identifier = {str(i): [] for i in identifiers}
+        for row in rows:
+            identifier = str(row.get('lookup_identifier'))
+            if row.get('lookup_type') == 'error':
+                by_identifier.pop(identifier, None)
+            elif identifier in by_identifier:
+                by_identifier[identifier].append(row)
+        for identifier, identifier_rows in by_identifier.items():
+            self.put_cds_rows(identifier, identifier_rows)
+
+    def _known(self, source, keys):
+        """
+        The keys snapshotted within max_age seconds (of their own write, or of the source's last sync).
+        """
+        conn = self._connection()
+        cutoff = None
+        if self.max_age > 0:
+            cutoff = time.time() - self.max_age
+            synced = conn.execute('SELECT synced_at FROM snapshot_sources WHERE source = ?', (source,)).fetchone()
+            if synced is not None and synced[0] >= cutoff:
+                cutoff = None
+        known = set()
+        for start in range(0, len(keys), SQL_BATCH_SIZE):
+            batch = keys[start:start + SQL_BATCH_SIZE]
+            query = f'SELECT key FROM snapshot_entities WHERE source = ? AND key IN ({", ".join("?" * len(batch))})'
+            params = [source] + batch
+            if cutoff is not None:
+                query += ' AND refreshed_at >= ?'
+                params.append(cutoff)
+            known.update(row[0] for row in conn.execute(query, params))
+        return known
+
+    def _records(self, cursor, columns):
+        return [{column: _read_value(column, row[column]) for column in columns} for row in cursor]
+
+    def mongo_rows(self, ids, columns=None, loqate_only=False):
+        """
+        Snapshotted flat rows for MongoDB _ids, restricted to columns (default: all ADDRESS_COLUMNS).
+        Returns (rows, missing_ids); missing ids were never snapshotted (or are older than max_age)
+        and need a live query.
+        """
+        ids = [str(i) for i in ids]
+        columns = list(columns or ADDRESS_COLUMNS)
+        known = self._known('mongo', ids)
+        selected = ', '.join(map(_quote, columns))
+        hits = [i for i in ids if i in known]
+        conn = self._connection()
+        rows = []
+        for start in range(0, len(hits), SQL_BATCH_SIZE):
+            batch = hits[start:start + SQL_BATCH_SIZE]
+            cursor = conn.execute(
+                f'SELECT {selected}, "standardizedAddress_provider" AS _provider FROM {MONGO_TABLE} '
+                f'WHERE "_id" IN ({", ".join("?" * len(batch))}) ORDER BY rowid', batch
+            )
+            if loqate_only:
+                cursor = [row for row in cursor if is_loqate(row['_provider'])]
+            rows.extend(self._records(cursor, columns))
+        return rows, [i for i in ids if i not in known]
+
+    def cds_rows(self, identifier):
+        """
+        Snapshotted location rows of a CDS identifier (entity ID or BVD ID), or None on a miss
+        (not snapshotted, or older than max_age).
+        """
+        key = str(identifier)
+        if not self._known('cds', [key]):
+            return None
+        cursor = self._connection().execute(
+            f'SELECT * FROM {CDS_TABLE} WHERE entity_id = ? OR bvd_id = ? ORDER BY rowid', (key, key)
+        )
+        return self._records(cursor, LOCATION_COLUMNS)
+
+    def search(self, source, post_code=None, country=None, limit=1000):
+        """
+        Snapshotted rows by reported or standardized post code and/or country (indexed exact matches).
+        """
+        table = MONGO_TABLE if source == 'mongo' else CDS_TABLE
+        clauses, params = [], []
+        for field, value in (('post_code', post_code), ('country', country)):
+            if value is not None:
+                names = SEARCH_COLUMNS[table][field]
+                clauses.append('(' + ' OR '.join(f'{_quote(n)} = ?' for n in names) + ')')
+                params.extend([value] * len(names))
+        where = ' AND '.join(clauses) or '1'
+        cursor = self._connection().execute(f'SELECT * FROM {table} WHERE {where} ORDER BY rowid LIMIT ?', params + [limit])
+        return self._records(cursor, TABLE_COLUMNS[table])
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def snapshot_store(path=None):
+    """
+    The shared SnapshotStore for path (default: ADDRESS_SNAPSHOT_PATH), or None when no snapshot is configured.
+    """
+    path = path or ADDRESS_SNAPSHOT_PATH
+    if not path:
+        return None
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SnapshotStore(path)
+        return _stores[path]
@@ -1,17 +1,77 @@
-# spark_transformer.py: (Legacy) Spark-based address normalization for large-scale data processing.
-# Not used in current workflow, but kept for reference or future scalability needs.
+# spark_transformer.py: Spark-based address flattening and ASCII normalization for large-scale data processing.
+# Used by normalization_backends.SparkBackend; output columns match DataHandler.normalize_addresses.
+import pandas as pd
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, explode
+from pyspark.sql.functions import col, explode, pandas_udf
 from pyspark.sql.types import (
     StructType, StructField, StringType, ArrayType, DoubleType
 )
+from .ascii_normalizer import AsciiNormalizer
+from .data_handler import REPORTED_FIELDS, STANDARDIZED_FIELDS, resolve_columns
+
+# Memoized normalizer of each Python worker process, reused across the Arrow batches it receives
+_worker_normalizer = AsciiNormalizer()
+
+
+def _ascii_strings(values: pd.Series) -> pd.Series:
+    """
+    Normalize one Arrow batch of a string column (nulls stay null).
+    """
+    return pd.Series(_worker_normalizer.normalize_column(values.tolist()), index=values.index, dtype=object)
+
+
+def _ascii_string_arrays(values: pd.Series) -> pd.Series:
+    """
+    Normalize one Arrow batch of an array<string> column (arrays arrive as numpy arrays).
+    """
+    normalize = _worker_normalizer.normalize_column
+    return pd.Series([None if v is None else normalize(list(v)) for v in values], index=values.index, dtype=object)
+
+
+def _coerce(value, data_type, coerced, path):
+    """
+    A document value converted to a Spark schema type: nested dicts and lists are walked, scalars in
+    array fields become one-element lists, numbers in string fields become strings and other numbers
+    or strings in double fields become floats. Values that cannot be represented (and NaN) become None.
+    The dotted path of every field whose value had to change is added to coerced.
+    """
+    if value is None:
+        return None
+    if isinstance(data_type, StructType):
+        if not isinstance(value, dict):
+            return None
+        return {field.name: _coerce(value.get(field.name), field.dataType, coerced, f'{path}.{field.name}')
+                for field in data_type.fields}
+    if isinstance(value, float) and value != value:
+        coerced.add(path)
+        return None
+    if isinstance(data_type, ArrayType):
+        if not isinstance(value, (list, tuple)):
+            coerced.add(path)
+            value = [value]
+        return [_coerce(item, data_type.elementType, coerced, path) for item in value]
+    if isinstance(data_type, DoubleType):
+        if value.__class__ is float:
+            return value
+        coerced.add(path)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, str):
+        return value
+    coerced.add(path)
+    return str(value)
+
 
 class SparkTransformer:
-    def __init__(self, spark):
+    def __init__(self, spark, arrow=True):
         """
-        Initialize with a SparkSession.
+        Initialize with a SparkSession; arrow enables Arrow-based conversion to pandas on the session.
         """
         self.spark = spark
+        if arrow:
+            spark.conf.set('spark.sql.execution.arrow.pyspark.enabled', 'true')
 
     def create_dataframe(self, data, schema):
         """
@@ -19,18 +79,24 @@ class SparkTransformer:
         """
         return self.spark.createDataFrame(data, schema=schema)
 
-    def transform_dataframe(self, df):
+    def transform_dataframe(self, df, columns=None):
         """
         Explode and flatten nested address data for tabular analysis.
         """
         df_exploded = df.withColumn("addresses", explode(col("d.addresses")))
         df_exploded = df_exploded.withColumn("localizedAddresses", explode(col("addresses.localizedAddresses")))
-        return self.select_and_flatten(df_exploded)
+        return self.select_and_flatten(df_exploded, columns)
 
-    def select_and_flatten(self, df):
+    def select_and_flatten(self, df, columns=None):
         """
-        Select and alias all relevant address fields for output.
+        Select and alias the address fields for output: the requested columns of
+        DataHandler.normalize_addresses in the same order (all of them by default).
         """
+        if columns is not None:
+            paths = {'_id': '_id'}
+            paths.update({c: f'localizedAddresses.reportedAddress.{k}' for c, k in REPORTED_FIELDS.items()})
+            paths.update({c: f'localizedAddresses.standardizedAddress.{k}' for c, k in STANDARDIZED_FIELDS.items()})
+            return df.select(*(col(paths[c]).alias(c) for c in resolve_columns(columns)))
         return df.select(
             col("_id"),
             col("localizedAddresses.reportedAddress.addressLines").alias("reportedAddress_addressLines"),
@@ -61,6 +127,80 @@ class SparkTransformer:
             col("localizedAddresses.standardizedAddress.postBox").alias("standardizedAddress_postBox")
         )
 
+    def normalize_ascii(self, df):
+        """
+        Apply the NFKD -> ASCII normalization of DataHandler.normalize_addresses to every string and
+        array<string> column (pure-ASCII values are returned unchanged). Vectorized pandas UDFs receive
+        whole Arrow batches, so values are not pickled row by row.
+        """
+        ascii_str = pandas_udf(_ascii_strings, StringType())
+        ascii_list = pandas_udf(_ascii_string_arrays, ArrayType(StringType()))
+        selected = []
+        for field in df.schema.fields:
+            if isinstance(field.dataType, StringType):
+                selected.append(ascii_str(col(field.name)).alias(field.name))
+            elif isinstance(field.dataType, ArrayType) and isinstance(field.dataType.elementType, StringType):
+                selected.append(ascii_list(col(field.name)).alias(field.name))
+            else:
+                selected.append(col(field.name))
+        return df.select(*selected)
+
+    @staticmethod
+    def prepare_documents(documents):
+        """
+        MongoDB documents coerced to the types of define_schema, so mixed-type fields (e.g. a numeric
+        qualityIndex or a string longitude) do not fail createDataFrame. Each _id is replaced by the
+        document's position in the list, which restore_ids maps back to the original (e.g. ObjectId) value.
+        Returns the documents and the output columns whose values were coerced (for restore_types).
+        """
+        d_type = SparkTransformer.define_schema()['d'].dataType
+        coerced = set()
+        prepared = [{'_id': str(i), 'd': _coerce(doc.get('d'), d_type, coerced, 'd')} for i, doc in enumerate(documents)]
+        # 'd.addresses.localizedAddresses.reportedAddress.city' -> 'reportedAddress_city'
+        return prepared, {'_'.join(path.split('.')[-2:]) for path in coerced}
+
+    @staticmethod
+    def restore_types(pdf, documents, columns):
+        """
+        Put back the original values (ASCII-normalized) of the columns prepare_documents had to coerce, so
+        the output matches the pandas backend value for value and dtype for dtype. Only batches with
+        mixed-type fields pay for it: the documents are walked once more in Python for those columns.
+        """
+        columns = [c for c in pdf.columns if c in columns]
+        if not columns or pdf.empty:
+            return pdf
+        from .data_handler import DataHandler
+        records = _worker_normalizer.normalize_records(list(DataHandler(None)._iter_rows(documents, ['_id'] + columns)))
+        for column in columns:
+            pdf[column] = [record.get(column) for record in records]
+        return pdf
+
+    @staticmethod
+    def restore_ids(pdf, documents):
+        """
+        Put the rows of a DataFrame built from prepare_documents(documents) back in document order and
+        replace the positional _id values with the documents' original _id (ASCII-normalized like the pandas path).
+        """
+        positions = pdf['_id'].astype(int)
+        order = positions.argsort(kind='stable')
+        pdf = pdf.iloc[order].reset_index(drop=True)
+        pdf['_id'] = _worker_normalizer.normalize_column([documents[i].get('_id') for i in positions.iloc[order]])
+        return pdf
+
+    @staticmethod
+    def to_pandas(df):
+        """
+        Collect a flat Spark DataFrame as pandas (through Arrow when enabled) with the dtypes of the
+        pandas path: array columns as Python lists, and all-null columns as object columns of None.
+        """
+        pdf = df.toPandas()
+        for field in df.schema.fields:
+            if isinstance(field.dataType, ArrayType):
+                pdf[field.name] = [None if v is None else list(v) for v in pdf[field.name]]
+            if len(pdf) and pdf[field.name].isna().all():
+                pdf[field.name] = pd.Series([None] * len(pdf), index=pdf.index, dtype=object)
+        return pdf
+
     @staticmethod
     def define_schema():
         """
@@ -1,9 +1,28 @@
 from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+from datetime import datetime, timedelta
 import unittest
-from unittest.mock import MagicMock, patch
-from .data_handler import DataHandler, MongoDBSource
-from django.test import RequestFactory, TestCase
-from . import views
+import pandas as pd
+from bson import ObjectId
+from unittest.mock import ANY, MagicMock, patch
+from .data_handler import DataHandler, Delta, FileWatermark, MongoDBSource, close_shared_clients, build_flat_address_pipeline, build_projection, decode_cursor
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from . import jobs, views
+from .models import ComparisonJob
+from .snapshot_store import SnapshotStore
+from .normalization_backends import NormalizationBackend, PandasBackend, SparkBackend, select_backend, spark_available
+from .ascii_normalizer import AsciiNormalizer, to_ascii
+from .exporters import iter_csv, iter_parquet
+from .comparison import compare_cds_rows, compare_mongo_rows, join_sources
+from .similarity import edit_similarity, filter_by_score, score_addresses, sort_by_score
 
 class DataHandlerTests(unittest.TestCase):
     def setUp(self):
@@ -32,7 +51,172 @@ class DataHandlerTests(unittest.TestCase):
         df = self.handler.normalize_addresses([])
         self.assertTrue(df.empty)
 
+    def test_stream_addresses_chunks(self):
+        docs = [{'_id': str(i), 'd': {'addresses': [{'localizedAddresses': [
+            {'reportedAddress': {'city': 'Málaga'}, 'standardizedAddress': {'provider': 'L'}}
+        ]}]}} for i in range(5)]
+        self.mock_source.iter_data.return_value = iter(docs)
+        chunks = list(self.handler.stream_addresses({}, {}, batch_size=2))
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+        self.mock_source.iter_data.assert_called_once_with({}, {}, batch_size=2)
+        combined = pd.concat(chunks, ignore_index=True)
+        self.assertTrue(combined.equals(self.handler.normalize_addresses(docs)))
+
+    def test_fetch_page_keyset_cursor(self):
+        self.mock_source.fetch_ids.return_value = ['a', 'b', 'c']
+        self.mock_source.aggregate.return_value = iter([{'_id': 'a'}, {'_id': 'b'}])
+        df, next_cursor = self.handler.fetch_page({}, page_size=2)
+        self.assertEqual(df['_id'].tolist(), ['a', 'b'])
+        self.assertEqual(decode_cursor(next_cursor), 'b')
+        pipeline = self.mock_source.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[:2], [{'$match': {'_id': {'$in': ['a', 'b']}}}, {'$sort': {'_id': 1}}])
+        self.mock_source.fetch_ids.return_value = ['c']
+        df, next_cursor = self.handler.fetch_page({}, page_size=2, cursor=next_cursor)
+        self.mock_source.fetch_ids.assert_called_with({}, after='b', limit=3)
+        self.assertIsNone(next_cursor)
+
+class DeltaFetchTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.watermark = FileWatermark(os.path.join(self.tmp, 'watermark.json'))
+        self.source = MagicMock()
+        self.handler = DataHandler(self.source)
+
+    def doc(self, _id, modified):
+        return {'_id': _id, 'updatedAt': modified, 'd': {'addresses': [{'localizedAddresses': [{'reportedAddress': {'city': 'Town'}}]}]}}
+
+    def test_last_modified_field_watermark(self):
+        first, second = datetime(2024, 1, 1), datetime(2024, 1, 2)
+        self.source.iter_data.return_value = [self.doc('A', first), self.doc('B', second)]
+        delta = self.handler.fetch_delta(self.watermark, columns=['_id', 'reportedAddress_city'], field='updatedAt')
+        self.assertEqual(self.source.iter_data.call_args[0][0], {})
+        self.assertEqual((delta.changed_ids, len(delta.frame)), (['A', 'B'], 2))
+        delta.commit()
+        self.source.iter_data.return_value = []
+        delta = self.handler.fetch_delta(self.watermark, field='updatedAt')
+        self.assertEqual(self.source.iter_data.call_args[0][0], {'updatedAt': {'$gte': second}})
+        self.assertEqual(delta.state, {'field': 'updatedAt', 'value': second})
+        self.assertFalse(delta.tracks_deletions)
+
+    def test_change_stream_resume_token(self):
+        self.watermark.save({'resume_token': {'_data': 'T1'}})
+        self.source.watch_changes.return_value = (['A'], ['B'], {'_data': 'T2'})
+        self.source.fetch_data.return_value = [self.doc('A', None)]
+        delta = self.handler.fetch_delta(self.watermark, field='')
+        self.source.watch_changes.assert_called_once_with({'_data': 'T1'})
+        self.assertEqual(self.source.fetch_data.call_args[0][0], {'_id': {'$in': ['A']}})
+        self.assertEqual((delta.changed_ids, delta.deleted_ids), (['A'], ['B']))
+        self.assertTrue(delta.tracks_deletions)
+        delta.commit()
+        self.assertEqual(self.watermark.load(), {'resume_token': {'_data': 'T2'}})
+
+class NormalizationBackendTests(unittest.TestCase):
+    documents = [
+        {'_id': 'A', 'd': {'addresses': [{'localizedAddresses': [
+            {'reportedAddress': {'addressLines': ['Calle de Alcalá 1'], 'city': 'Málaga'},
+             'standardizedAddress': {'provider': 'Loqate', 'locality': 'Malaga', 'longitude': -4.42}},
+        ]}]}},
+        {'_id': 'B', 'd': {'addresses': []}},
+    ]
+
+    def test_backend_selected_by_document_count(self):
+        with patch('address_comparison_app.normalization_backends.spark_available', return_value=True):
+            self.assertIsInstance(select_backend(10, threshold=10), SparkBackend)
+            self.assertIsInstance(select_backend(9, threshold=10), PandasBackend)
+        with patch('address_comparison_app.normalization_backends.spark_available', return_value=False):
+            self.assertIsInstance(select_backend(10, threshold=10), PandasBackend)
+
+    def test_backend_interface_is_abstract(self):
+        with self.assertRaises(TypeError):
+            NormalizationBackend()
+
+    def test_spark_is_opt_in(self):
+        with patch('address_comparison_app.normalization_backends.spark_available', return_value=True), \
+                patch('address_comparison_app.normalization_backends.SPARK_MIN_DOCUMENTS', 0):
+            self.assertIsInstance(select_backend(10_000_000), PandasBackend)
+
+    def test_handler_delegates_to_backend(self):
+        backend = MagicMock()
+        DataHandler(None, backend=backend).normalize_addresses(self.documents, ['_id'])
+        backend.normalize.assert_called_once_with(self.documents, ['_id'])
+        df = PandasBackend().normalize(self.documents, ['_id', 'reportedAddress_city'])
+        self.assertEqual(df.to_dict('records'), [{'_id': 'A', 'reportedAddress_city': 'Malaga'}])
+
+    @unittest.skipUnless(spark_available(), 'pyspark is not installed')
+    def test_spark_matches_pandas(self):
+        expected = PandasBackend().normalize(self.documents)
+        result = SparkBackend(master='local[2]').normalize(self.documents)
+        self.assertEqual(result.columns.tolist(), expected.columns.tolist())
+        self.assertEqual(result.to_dict('records'), expected.to_dict('records'))
+
+    @unittest.skipUnless(spark_available(), 'pyspark is not installed')
+    def test_spark_matches_pandas_on_mixed_types(self):
+        first, second = ObjectId(), ObjectId()
+        documents = [
+            {'_id': second, 'd': {'addresses': [{'localizedAddresses': [
+                {'reportedAddress': {'city': 'Zürich', 'postCode': 8001, 'phoneNumbers': '+41 44 000'},
+                 'standardizedAddress': {'qualityIndex': 3, 'longitude': '8.54', 'latitude': 47.37}},
+                {'reportedAddress': {'city': 'Bern'}, 'standardizedAddress': {'qualityIndex': 'A1', 'longitude': 7}},
+            ]}]}},
+            {'_id': first, 'd': {'addresses': [{'localizedAddresses': [
+                {'reportedAddress': {'city': 'Genève'}, 'standardizedAddress': {'longitude': 6.14}},
+            ]}]}},
+        ]
+        expected = PandasBackend().normalize(documents)
+        result = SparkBackend(master='local[2]').normalize(documents)
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(result['_id'].tolist(), [second, second, first])
+
+class FlatAddressPipelineTests(unittest.TestCase):
+    def test_pipeline_pushes_down_loqate_filter(self):
+        pipeline = build_flat_address_pipeline({'_id': 'A'}, loqate_only=True)
+        self.assertEqual(pipeline[0], {'$match': {'_id': 'A'}})
+        self.assertEqual([list(stage)[0] for stage in pipeline], ['$match', '$project', '$unwind', '$unwind', '$match', '$project'])
+        self.assertEqual(pipeline[-1]['$project']['reportedAddress_city'], '$d.addresses.localizedAddresses.reportedAddress.city')
+
+    def test_flat_rows_match_python_flattening(self):
+        source = MagicMock()
+        source.aggregate.return_value = iter([{'_id': '1', 'reportedAddress_city': 'Málaga', 'standardizedAddress_provider': 'L'}])
+        df = DataHandler(source).fetch_flat_addresses({}, loqate_only=True)
+        doc = {'_id': '1', 'd': {'addresses': [{'localizedAddresses': [
+            {'reportedAddress': {'city': 'Málaga'}, 'standardizedAddress': {'provider': 'L'}}
+        ]}]}}
+        self.assertTrue(df.equals(DataHandler(source).normalize_addresses([doc])))
+
+    def test_columns_pushed_down(self):
+        columns = ['_id', 'reportedAddress_city', 'standardizedAddress_postalCode']
+        self.assertEqual(build_projection(columns), {
+            '_id': 1,
+            'd.addresses.localizedAddresses.reportedAddress.city': 1,
+            'd.addresses.localizedAddresses.standardizedAddress.postalCode': 1,
+        })
+        pipeline = build_flat_address_pipeline({}, loqate_only=True, columns=columns)
+        self.assertIn('d.addresses.localizedAddresses.standardizedAddress.provider', pipeline[0]['$project'])
+        self.assertEqual(list(pipeline[-1]['$project']), columns)
+        doc = {'_id': '1', 'd': {'addresses': [{'localizedAddresses': [
+            {'reportedAddress': {'city': 'Málaga', 'postCode': 'X'}, 'standardizedAddress': {'provider': 'L'}}
+        ]}]}}
+        df = DataHandler(MagicMock()).normalize_addresses([doc], columns=columns)
+        self.assertEqual(df.columns.tolist(), columns)
+        self.assertEqual(df.loc[0, 'reportedAddress_city'], 'Malaga')
+        with self.assertRaises(ValueError):
+            build_projection(['reportedAddress_nope'])
+
+class AsciiNormalizerTests(unittest.TestCase):
+    def test_matches_reference_conversion(self):
+        normalizer = AsciiNormalizer(cache_size=2)
+        records = [{'a': 'São Paulo', 'b': ['Łódź', 1, 'Main St'], 'c': None, 'd': 3.5} for _ in range(3)]
+        records.append({'a': 'Zürich', 'b': [], 'c': 'Málaga', 'd': 'plain'})
+        expected = [{k: [to_ascii(i) if isinstance(i, str) else i for i in v] if isinstance(v, list)
+                     else to_ascii(v) if isinstance(v, str) else v for k, v in r.items()} for r in records]
+        self.assertEqual(normalizer.normalize_records(records), expected)
+        self.assertLessEqual(normalizer.cache_info()['entries'], 2)
+
 class MongoDBSourceTests(unittest.TestCase):
+    def tearDown(self):
+        close_shared_clients()
+
     @patch('address_comparison_app.data_handler.MongoClient')
     def test_fetch_data(self, mock_client):
         mock_collection = MagicMock()
@@ -42,6 +226,154 @@ class MongoDBSourceTests(unittest.TestCase):
         docs = source.fetch_data({}, {})
         self.assertEqual(docs, [{'_id': '1'}])
 
+    @patch('address_comparison_app.data_handler.MongoClient')
+    def test_shared_client_and_max_time(self, mock_client):
+        first = MongoDBSource('uri', 'db', 'coll', max_time_ms=500)
+        second = MongoDBSource('uri', 'db', 'coll')
+        self.assertIs(first.client, second.client)
+        mock_client.assert_called_once_with('uri', maxPoolSize=50, readPreference='secondaryPreferred')
+        mock_collection = mock_client.return_value.__getitem__.return_value.__getitem__.return_value
+        first.fetch_data({'_id': 'x'}, {})
+        mock_collection.find.assert_called_with(filter={'_id': 'x'}, projection={}, max_time_ms=500)
+
+    @patch('address_comparison_app.data_handler.MongoClient')
+    def test_pool_settings_from_django_settings(self, mock_client):
+        with override_settings(MONGO_MAX_POOL_SIZE=7, MONGO_READ_PREFERENCE='primary', MONGO_MAX_TIME_MS=250):
+            source = MongoDBSource('uri', 'db', 'coll')
+        mock_client.assert_called_once_with('uri', maxPoolSize=7, readPreference='primary')
+        self.assertEqual(source.max_time_ms, 250)
+
+    @patch('address_comparison_app.data_handler.MongoClient')
+    def test_fetch_ids_keyset(self, mock_client):
+        mock_collection = mock_client.return_value.__getitem__.return_value.__getitem__.return_value
+        mock_collection.find.return_value.sort.return_value.limit.return_value = [{'_id': 'c'}]
+        ids = MongoDBSource('uri', 'db', 'coll').fetch_ids({'x': 1}, after='b', limit=3)
+        self.assertEqual(ids, ['c'])
+        mock_collection.find.assert_called_once_with(
+            filter={'$and': [{'x': 1}, {'_id': {'$gt': 'b'}}]}, projection={'_id': 1}, max_time_ms=30000
+        )
+        mock_collection.find.return_value.sort.assert_called_once_with('_id', 1)
+        mock_collection.find.return_value.sort.return_value.limit.assert_called_once_with(3)
+
+class ComparisonTests(unittest.TestCase):
+    def test_compare_mongo_rows_groups_in_one_pass(self):
+        rows = [
+            {'_id': 'a', 'reportedAddress_city': 'X', 'standardizedAddress_locality': 'x'},
+            {'_id': 'b', 'reportedAddress_city': 'Y'},
+            {'_id': 'a', 'reportedAddress_city': 'Z'},
+        ]
+        groups = compare_mongo_rows(rows)
+        self.assertEqual([g.id for g in groups], ['a', 'b'])
+        self.assertEqual(groups[0].rows, [rows[0], rows[2]])
+        self.assertEqual(groups[0].addresses[0].as_dict()['standardized_locality'], 'x')
+        self.assertEqual(groups[0].addresses[1].reported_city, 'Z')
+        self.assertEqual(groups[1].addresses[0].reported_country_label, '')
+
+    def test_compare_cds_rows_loqate_filter(self):
+        rows = [{'standardized_provider': 'Loqate', 'reported_city': 'A'}, {'standardized_provider': None, 'reported_city': 'B'}]
+        result, groups = compare_cds_rows(rows, '123', loqate_only=True)
+        self.assertEqual(result, rows[:1])
+        self.assertEqual(groups[0].id, '123')
+        self.assertEqual([a.reported_city for a in groups[0].addresses], ['A'])
+        self.assertEqual(compare_cds_rows([], '123'), ([], []))
+
+    def test_join_sources_hash_joins_on_entity_keys(self):
+        mongo_rows = [{'_id': 'GB123', 'reportedAddress_city': 'London'}, {'_id': 'GB123', 'reportedAddress_city': 'Leeds'}]
+        cds_rows = {
+            'gb123': [{'bvd_id': 'GB123', 'entity_id': 7, 'reported_city': 'London', 'standardized_provider': 'Loqate'}],
+            '7': [{'bvd_id': 'GB123', 'entity_id': 7, 'reported_city': 'Paris', 'standardized_provider': None}],
+            'X1': 'X1 not found',
+        }
+        entities = join_sources(['gb123', '7', 'X1'], mongo_rows, cds_rows, loqate_only=True)
+        self.assertEqual([e.id for e in entities], ['gb123', '7', 'X1'])
+        self.assertEqual([(m.reported_city, c and c.reported_city) for m, c in entities[0].pairs], [('London', 'London'), ('Leeds', None)])
+        self.assertEqual(entities[1].cds[0].reported_city, 'London')
+        self.assertEqual(len(entities[1].mongo), 2)
+        self.assertEqual((entities[2].mongo, entities[2].cds, entities[2].cds_error), ([], [], 'X1 not found'))
+
+class SimilarityTests(unittest.TestCase):
+    def test_edit_similarity_matches_levenshtein(self):
+        scores = edit_similarity(['kitten', 'Main St.', None, '', ['1 Main', 'St']], ['sitting', 'main st', 'x', '', '1 main st'])
+        self.assertAlmostEqual(scores[0], 1 - 3 / 7)
+        self.assertEqual(scores[1], 1.0)
+        self.assertTrue(pd.isna(scores[2]))
+        self.assertTrue(pd.isna(scores[3]))
+        self.assertEqual(scores[4], 1.0)
+
+    def test_empty_values_are_not_scored_as_matches(self):
+        df = pd.DataFrame({
+            'reported_address_lines': [[], ''], 'standardized_address_lines': [[], ' - '],
+            'reported_city': ['Paris', 'Paris'], 'standardized_locality': ['Lyon', 'Paris'],
+        })
+        scored = score_addresses(df)
+        self.assertTrue(scored[['address_lines_similarity', 'address_lines_token_overlap']].isna().all().all())
+        self.assertEqual(scored['overall_score'].tolist(), [scored.loc[0, 'city_similarity'], 1.0])
+        self.assertLess(scored.loc[0, 'overall_score'], 0.5)
+
+    def test_accented_values_match_their_ascii_form(self):
+        df = pd.DataFrame({
+            'reported_address_lines': ['Bahnhofstraße 1', 'Calle de Alcalá 12'],
+            'standardized_address_lines': ['BAHNHOFSTRASSE 1', 'Calle de Alcala 12'],
+            'reported_city': ['Zürich', 'Москва'], 'standardized_locality': ['ZURICH', 'Москва'],
+        })
+        scored = score_addresses(df)
+        self.assertEqual(scored['city_similarity'].tolist(), [1.0, 1.0])
+        self.assertEqual(scored['address_lines_similarity'].tolist(), [1.0, 1.0])
+        self.assertEqual(scored['overall_score'].tolist(), [1.0, 1.0])
+
+    def test_score_sort_and_filter(self):
+        df = pd.DataFrame({
+            'reported_address_lines': ['1 Main St', '9 Elm Road'], 'standardized_address_lines': ['1 Main St', '1 Oak Ave'],
+            'reported_city': ['Town', 'Town'], 'standardized_locality': ['TOWN', 'City'],
+            'reported_post_code': ['AB1 2CD', 'AB1 2CD'], 'standardized_postal_code': ['ab12cd', 'ZZ9 9ZZ'],
+            'reported_country_label': ['Spain', None], 'standardized_country_name': ['Spain', 'Spain'],
+        })
+        scored = score_addresses(df)
+        self.assertEqual(scored.loc[0, 'overall_score'], 1.0)
+        self.assertEqual(scored.loc[1, 'post_code_match'], 0.0)
+        self.assertTrue(pd.isna(scored.loc[1, 'country_similarity']))
+        self.assertEqual(sort_by_score(scored).index.tolist(), [1, 0])
+        self.assertEqual(filter_by_score(scored, min_score=0.9).index.tolist(), [0])
+
+class ExporterTests(unittest.TestCase):
+    def test_iter_csv_streams_chunks(self):
+        chunks = iter([pd.DataFrame({'a': ['x', None], 'b': [['l1', 'l2'], 'y']}), pd.DataFrame({'b': ['z']})])
+        parts = list(iter_csv(chunks, columns=['a', 'b']))
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(''.join(parts).splitlines(), ['a,b', 'x,"l1, l2"', ',y', ',z'])
+
+    def test_iter_parquet_row_groups(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow is not installed')
+        import io
+        chunks = [pd.DataFrame({'a': [None, None]}), pd.DataFrame({'a': ['x']})]
+        data = b''.join(iter_parquet(iter(chunks), columns=['a']))
+        parquet_file = pq.ParquetFile(io.BytesIO(data))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        self.assertEqual(parquet_file.read().column('a').to_pylist(), [None, None, 'x'])
+
+    def test_iter_parquet_fixed_schema_for_late_typed_columns(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow is not installed')
+        import io
+        columns = ['entity_id', 'reported_phone_numbers', 'standardized_latitude', 'lookup_identifier']
+        chunks = [
+            pd.DataFrame({'entity_id': [None], 'reported_phone_numbers': [None], 'lookup_identifier': ['x'], 'error': ['boom']}),
+            pd.DataFrame({'entity_id': [12, None], 'reported_phone_numbers': [['+1 2'], None],
+                          'standardized_latitude': [1.5, '2'], 'lookup_identifier': [12, 13.0]}),
+        ]
+        data = b''.join(iter_parquet(iter(chunks), columns=columns))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(str(table.schema.field('entity_id').type), 'int64')
+        self.assertEqual(table.to_pydict(), {
+            'entity_id': [None, 12, None], 'reported_phone_numbers': [None, ['+1 2'], None],
+            'standardized_latitude': [None, 1.5, 2.0], 'lookup_identifier': ['x', '12', '13'],
+        })
+
 class GetItemFilterTests(unittest.TestCase):
     def test_get_item(self):
         from address_comparison_app.templatetags.custom_filters import get_item
@@ -49,6 +381,79 @@ class GetItemFilterTests(unittest.TestCase):
         self.assertEqual(get_item(d, 'a'), 1)
         self.assertEqual(get_item(d, 'b'), '')
 
+class SnapshotStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.store = SnapshotStore(os.path.join(self.tmp, 'snapshot.sqlite3'))
+        self.addCleanup(self.store.close)
+
+    def test_mongo_rows_hits_and_misses(self):
+        self.store.put_mongo_rows(['A', 'B'], [
+            {'_id': 'A', 'reportedAddress_addressLines': ['1 Main St'], 'standardizedAddress_provider': 'Loqate', 'reportedAddress_postCode': 'AB1'},
+            {'_id': 'A', 'reportedAddress_addressLines': ['2 Side St'], 'standardizedAddress_provider': 'Other'},
+        ])
+        rows, missing = self.store.mongo_rows(['A', 'B', 'C'], columns=['_id', 'reportedAddress_addressLines'], loqate_only=True)
+        self.assertEqual(rows, [{'_id': 'A', 'reportedAddress_addressLines': ['1 Main St']}])
+        self.assertEqual(missing, ['C'])
+        self.assertEqual(len(self.store.search('mongo', post_code='AB1')), 1)
+
+    def test_cds_frame_by_entity_and_bvd_id(self):
+        df = pd.DataFrame([
+            {'entity_id': 123, 'bvd_id': 'GB1', 'reported_city': 'Town', 'reported_country_code': 'GB', 'lookup_identifier': '123', 'lookup_type': 'entity_id'},
+            {'lookup_identifier': 'GB9', 'lookup_type': 'error', 'error': 'timeout'},
+        ])
+        self.store.put_frame('cds', ['123', 'GB9'], df)
+        self.assertEqual(self.store.cds_rows('GB1')[0]['reported_city'], 'Town')
+        self.assertEqual(self.store.cds_rows(123)[0]['entity_id'], 123)
+        self.assertIsNone(self.store.cds_rows('GB9'))
+        self.assertEqual(len(self.store.search('cds', country='GB')), 1)
+
+    def test_entities_older_than_max_age_are_misses(self):
+        self.store.max_age = 60
+        self.store.put_mongo_rows(['A'], [{'_id': 'A', 'reportedAddress_city': 'Town'}])
+        with patch('address_comparison_app.snapshot_store.time.time', return_value=time.time() + 120):
+            self.assertEqual(self.store.mongo_rows(['A'])[1], ['A'])
+            self.store.mark_synced('mongo')
+            self.assertEqual(self.store.mongo_rows(['A'])[1], [])
+
+    @patch('address_comparison_app.management.commands.refresh_snapshot.MongoDBSource')
+    @patch('address_comparison_app.management.commands.refresh_snapshot.DataHandler')
+    def test_refresh_drops_deleted_documents_in_field_mode(self, MockHandler, MockSource):
+        self.store.put_mongo_rows(['A', 'B'], [{'_id': 'A', 'reportedAddress_city': 'Town'}])
+        watermark = MagicMock()
+        MockHandler.return_value.fetch_delta.return_value = Delta(pd.DataFrame(), [], [], watermark, {'field': 'updatedAt'})
+        MockSource.return_value.fetch_ids.return_value = ['A']
+        with patch('address_comparison_app.management.commands.refresh_snapshot.snapshot_store', return_value=self.store):
+            call_command('refresh_snapshot', field='updatedAt', stdout=io.StringIO())
+        self.assertEqual(self.store.mongo_rows(['A', 'B'])[1], ['B'])
+        watermark.save.assert_called_once()
+        synced = self.store._connection().execute("SELECT synced_at FROM snapshot_sources WHERE source = 'mongo'").fetchone()
+        self.assertIsNone(synced)
+
+    @patch('address_comparison_app.management.commands.refresh_snapshot.MongoDBSource')
+    @patch('address_comparison_app.management.commands.refresh_snapshot.DataHandler')
+    def test_refresh_marks_synced_in_change_stream_mode(self, MockHandler, MockSource):
+        self.store.put_mongo_rows(['A', 'B'], [])
+        delta = Delta(pd.DataFrame(), [], ['B'], MagicMock(), {'resume_token': 'T'}, tracks_deletions=True)
+        MockHandler.return_value.fetch_delta.return_value = delta
+        with patch('address_comparison_app.management.commands.refresh_snapshot.snapshot_store', return_value=self.store):
+            call_command('refresh_snapshot', stdout=io.StringIO())
+        MockSource.return_value.fetch_ids.assert_not_called()
+        self.assertEqual(self.store.mongo_rows(['A', 'B'])[1], ['B'])
+        synced = self.store._connection().execute("SELECT synced_at FROM snapshot_sources WHERE source = 'mongo'").fetchone()
+        self.assertIsNotNone(synced)
+
+    @patch('address_comparison_app.views.MongoDBSource')
+    @patch('address_comparison_app.views.DataHandler')
+    def test_views_query_live_source_for_misses_only(self, MockHandler, MockSource):
+        self.store.put_mongo_rows(['A'], [{'_id': 'A', 'reportedAddress_city': 'Snap Town'}])
+        MockHandler.return_value.fetch_flat_records.return_value = [{'_id': 'B', 'reportedAddress_city': 'Live Town'}]
+        with patch('address_comparison_app.views.snapshot_store', return_value=self.store):
+            rows = views._mongo_comparison_rows(['A', 'B'], False)
+        self.assertEqual([row['reportedAddress_city'] for row in rows], ['Snap Town', 'Live Town'])
+        self.assertEqual(MockHandler.return_value.fetch_flat_records.call_args[0][0], {'_id': {'$in': ['B']}})
+
 class ViewTests(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
@@ -57,15 +462,149 @@ class ViewTests(TestCase):
     @patch('address_comparison_app.views.MongoDBSource')
     def test_mongo_query_view_post(self, MockSource, MockHandler):
         mock_handler = MockHandler.return_value
-        mock_handler.fetch_data.return_value = []
-        mock_handler.normalize_addresses.return_value = MagicMock(to_dict=lambda orient: [])
+        mock_handler.fetch_page_records.return_value = ([{'_id': '123', 'reportedAddress_city': 'Town'}], None)
         request = self.factory.post('/address-comparison/mongo/', {'ids': '123', 'loqate_filter': 'on'})
         response = views.mongo_query_view(request)
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'Results', response.content)
+        self.assertIn(b'Town', response.content)
+        mock_handler.fetch_page_records.assert_called_once_with(
+            {'_id': {'$in': ['123']}}, page_size=views.DEFAULT_PAGE_SIZE, cursor=None, loqate_only=True, columns=ANY
+        )
+
+    @patch('address_comparison_app.views.DataHandler')
+    @patch('address_comparison_app.views.MongoDBSource')
+    def test_mongo_export_view_streams_csv(self, MockSource, MockHandler):
+        MockHandler.return_value.stream_flat_addresses.return_value = iter([pd.DataFrame([{'_id': '123', 'reportedAddress_city': 'Town'}])])
+        request = self.factory.get('/address-comparison/mongo/export/', {'ids': '123', 'format': 'csv'})
+        response = views.mongo_export_view(request)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['_id', 'reportedAddress_addressLines', 'reportedAddress_city'])
+        self.assertTrue(lines[1].startswith('123,,Town'))
+        self.assertEqual(views.mongo_export_view(self.factory.get('/', {'format': 'xml'})).status_code, 400)
+
+    @patch('address_comparison_app.views._mongo_comparison_rows')
+    @patch('address_comparison_app.views.CDSClient')
+    def test_unified_lookup_both_sources(self, MockClient, mock_mongo_rows):
+        mock_mongo_rows.return_value = [{'_id': 'GB1', 'reportedAddress_city': 'Mongo Town'}]
+        MockClient.return_value.__enter__.return_value.lookup_multiple_entities.return_value = {
+            'GB1': {'data': [{'bvdId': 'GB1', 'locations': [{'addresses': [{'reported': {'city': 'Cds Town'}}]}]}]},
+            'GB2': {'error': 'GB2 not found'},
+        }
+        request = self.factory.post('/address-comparison/unified-lookup/', {'data_source': 'both', 'identifier': 'GB1, GB2'})
+        response = views.unified_lookup_view(request)
+        self.assertEqual(response.status_code, 200)
+        for text in (b'Mongo Town', b'Cds Town', b'GB2 not found'):
+            self.assertIn(text, response.content)
+        mock_mongo_rows.assert_called_once_with(['GB1', 'GB2'], False)
 
     def test_health_check(self):
         request = self.factory.get('/address-comparison/')
         response = views.health_check(request)
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'OK', response.content)
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+
+    @patch('address_comparison_app.views.AsyncCDSClient')
+    async def test_unified_lookup_async_view_cds(self, MockClient):
+        client = MockClient.return_value.__aenter__.return_value
+        client.lookup_entity.return_value = {'data': [{'entityId': 123, 'locations': [{'addresses': [
+            {'reported': {'addressLines': ['1 Main St']}, 'standardized': {'provider': 'Loqate', 'locality': 'Town'}}
+        ]}]}]}
+        request = self.factory.post('/address-comparison/unified-lookup/async/', {'data_source': 'cds', 'identifier': '123', 'loqate_filter': 'on'})
+        response = await views.unified_lookup_async_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'1 Main St', response.content)
+
+class ComparisonJobTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.results_dir = tempfile.mkdtemp()
+        patcher = patch('address_comparison_app.jobs.JOB_RESULTS_DIR', self.results_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.results_dir, True)
+
+    @patch('address_comparison_app.jobs.job_executor')
+    @patch('address_comparison_app.jobs.CDSClient')
+    def test_submit_poll_and_download(self, MockClient, mock_executor):
+        MockClient.return_value.lookup_multiple_entities_as_dataframe.side_effect = lambda batch: pd.DataFrame(
+            [{'entity_id': i, 'lookup_identifier': i, 'lookup_type': 'entity_id', 'standardized_provider': 'Loqate'} for i in batch]
+        )
+        request = self.factory.post('/address-comparison/jobs/', {'source': 'cds', 'identifiers': '1, 2\n3'})
+        response = views.job_submit_view(request)
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.content)['job_id']
+        mock_executor.return_value.submit.assert_called_once()
+        self.assertEqual(views.job_download_view(self.factory.get('/'), job_id).status_code, 409)
+
+        with patch('address_comparison_app.jobs.JOB_BATCH_SIZE', 2):
+            jobs.run_job(job_id)
+        status = json.loads(views.job_status_view(self.factory.get('/'), job_id).content)
+        self.assertEqual((status['status'], status['processed'], status['rows'], status['progress']), ('done', 3, 3, 1.0))
+        response = views.job_download_view(self.factory.get('/'), job_id)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(MockClient.return_value.lookup_multiple_entities_as_dataframe.call_count, 2)
+
+    def test_failed_job_records_error(self):
+        job = ComparisonJob.objects.create(source='mongo', identifiers=['a'], total=1)
+        with patch('address_comparison_app.jobs.MongoDBSource'), patch('address_comparison_app.jobs.DataHandler') as MockHandler:
+            MockHandler.return_value.fetch_flat_addresses.side_effect = RuntimeError('mongo down')
+            jobs.run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ComparisonJob.FAILED, 'mongo down'))
+        self.assertEqual(os.listdir(self.results_dir), [])
+
+    def test_recover_stale_jobs_and_retention(self):
+        alive = ComparisonJob.objects.create(source='cds', identifiers=['a'], total=1, worker=jobs.worker_id())
+        stale = ComparisonJob.objects.create(source='cds', identifiers=['b'], total=1, status=ComparisonJob.RUNNING,
+                                             worker=f'{socket.gethostname()}:999999999')
+        with open(os.path.join(self.results_dir, f'{stale.pk}.csv.part'), 'w') as f:
+            f.write('partial')
+        result = os.path.join(self.results_dir, 'old.csv')
+        with open(result, 'w') as f:
+            f.write('done')
+        old = ComparisonJob.objects.create(source='cds', identifiers=['c'], total=1, status=ComparisonJob.DONE, result_path=result,
+                                           finished_at=timezone.now() - timedelta(days=30))
+        out = io.StringIO()
+        call_command('cleanup_jobs', '--days', '7', stdout=out)
+        self.assertIn('1 interrupted job(s) marked failed, 1 expired job(s) deleted', out.getvalue())
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((stale.status, alive.status), (ComparisonJob.FAILED, ComparisonJob.QUEUED))
+        self.assertFalse(ComparisonJob.objects.filter(pk=old.pk).exists())
+        self.assertEqual(os.listdir(self.results_dir), [])
+
+class CompareAddressesCommandTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.ids_file = os.path.join(self.tmp, 'ids.txt')
+        with open(self.ids_file, 'w') as f:
+            f.write('a\nb, c\n\nd\ne\n')
+        self.output = os.path.join(self.tmp, 'out.csv')
+
+    def test_failed_run_resumes_from_checkpoint(self):
+        calls, failures = [], []
+        def fetch(batch):
+            calls.append(list(batch))
+            if batch == ['c', 'd'] and not failures:
+                failures.append(batch)
+                raise RuntimeError('timeout')
+            return pd.DataFrame([{'_id': i, 'reportedAddress_city': 'Town'} for i in batch])
+        with patch('address_comparison_app.management.commands.compare_addresses.batch_fetcher', return_value=(fetch, ['_id', 'reportedAddress_city'])):
+            with self.assertRaises(CommandError):
+                call_command('compare_addresses', self.ids_file, self.output, '--chunk-size', '2', '--workers', '1', stdout=io.StringIO())
+            with open(f'{self.output}.checkpoint.json') as f:
+                self.assertEqual(json.load(f)['completed'], 1)
+            calls.clear()
+            call_command('compare_addresses', self.ids_file, self.output, '--chunk-size', '2', '--workers', '2', stdout=io.StringIO())
+        self.assertEqual(calls, [['c', 'd'], ['e']])
+        with open(self.output) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines, ['_id,reportedAddress_city'] + [f'{i},Town' for i in 'abcde'])
@@ -2,9 +2,40 @@
 Unit tests for the CDSClient class and CDS API integration.
 """
 
+import asyncio
 import unittest
-from address_comparison_app.cds_client import CDSClient, CDSClientError
+from unittest.mock import MagicMock, patch
+from address_comparison_app.cds_client import (
+    CDSClient, CDSClientError, APIError, AuthenticationError, TokenService, Token, CDSService,
+    LOCATION_COLUMNS, explode_location_data, explode_many_location_data, location_records
+)
+from address_comparison_app.response_cache import ResponseCache
+from address_comparison_app.rate_limit import (
+    RateLimiter, TokenBucket, AdaptiveConcurrencyLimiter, RetryPolicy, parse_retry_after
+)
+from address_comparison_app.cds_config import CDSConfig
+from address_comparison_app.http_pool import SessionRegistry
+from address_comparison_app.async_cds_client import AsyncTokenService, AsyncCDSService
+import httpx
+import pandas as pd
 import os
+import tempfile
+from datetime import datetime, timedelta
+
+def make_config(**overrides):
+    """Build a CDSConfig with dummy endpoints for offline tests."""
+    values = dict(token_service='https://token.test/', api_name='api', pe_token='pe',
+                  cookie_gt='gt', cookie_cds='cds', base_url_cds='https://cds.test/',
+                  token_cache_enabled=False, cache_ttl=0)
+    values.update(overrides)
+    return CDSConfig(**values)
+
+def make_response(entity_id):
+    """Build a minimal CDS API response with a single address."""
+    return {'data': [{'entityId': entity_id, 'bvdId': f'BVD{entity_id}', 'locations': [
+        {'categories': [{'code': 'HQ', 'label': 'Headquarters'}],
+         'addresses': [{'reported': {'addressLines': ['1 Main St'], 'city': 'Town'}, 'standardized': {}}]}
+    ]}]}
 
 class TestCDSClient(unittest.TestCase):
     """Test suite for CDSClient lookups and error handling."""
@@ -36,5 +67,362 @@ class TestCDSClient(unittest.TestCase):
         with self.assertRaises(CDSClientError):
             self.client.lookup_entity_as_dataframe("invalid_id!!")
 
+class TestExplodeLocationData(unittest.TestCase):
+    """Test suite for the columnar CDS location flattening."""
+    def test_single_response_columns_and_values(self):
+        """One row per address with the documented columns in order."""
+        df = explode_location_data(make_response(9))
+        self.assertEqual(list(df.columns), LOCATION_COLUMNS)
+        self.assertEqual(df.loc[0, 'reported_address_lines'], '1 Main St')
+        self.assertEqual(df.loc[0, 'location_category_label'], 'Headquarters')
+        self.assertIsNone(df.loc[0, 'standardized_provider'])
+
+    def test_many_responses_build_one_frame(self):
+        """Many responses flatten into a single frame; empty input gives an empty frame."""
+        df = explode_many_location_data([make_response(1), {'data': []}, make_response(2)])
+        self.assertEqual(df['entity_id'].tolist(), [1, 2])
+        self.assertTrue(explode_many_location_data([]).empty)
+
+    def test_location_records_match_frame_rows(self):
+        """Row dicts carry the same values as the DataFrame rows."""
+        response = make_response(9)
+        self.assertEqual(location_records(response), explode_location_data(response).to_dict(orient='records'))
+
+class TestCDSClientBatch(unittest.TestCase):
+    """Test suite for concurrent batch lookups (offline, HTTP mocked)."""
+    def setUp(self):
+        self.client = CDSClient(make_config(), max_workers=4)
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+
+    def fake_lookup(self, identifier):
+        if str(identifier) == '404':
+            raise APIError("Entity ID 404 not found")
+        self.client.token_service.get_token()
+        return make_response(int(identifier))
+
+    def test_results_keep_input_order(self):
+        """Batch results come back in input order with per-identifier errors."""
+        with patch.object(self.client, 'lookup_entity', side_effect=self.fake_lookup), \
+                patch.object(self.client.token_service, '_refresh_token') as refresh:
+            refresh.side_effect = lambda: setattr(self.client.token_service, '_token', MagicMock(value='t', is_expired=False))
+            results = self.client.lookup_multiple_entities([3, 404, 1, 2])
+        self.assertEqual(list(results), [3, 404, 1, 2])
+        self.assertIn('error', results[404])
+        self.assertEqual(results[1]['data'][0]['entityId'], 1)
+        self.assertEqual(refresh.call_count, 1)
+
+    def test_dataframe_keeps_error_rows(self):
+        """The DataFrame variant emits one error row per failed identifier."""
+        with patch.object(self.client, 'lookup_entity', side_effect=self.fake_lookup), \
+                patch.object(self.client.token_service, 'get_token', return_value='t'):
+            df = self.client.lookup_multiple_entities_as_dataframe([5, 404, 'bad!!'])
+        self.assertEqual(df['lookup_identifier'].tolist(), ['5', '404', 'bad!!'])
+        self.assertEqual(df['lookup_type'].tolist(), ['entity_id', 'error', 'error'])
+        self.assertEqual(df.loc[0, 'entity_id'], 5)
+        self.assertTrue(pd.isna(df.loc[0, 'error']))
+
+class TestSharedTokenCache(unittest.TestCase):
+    """Test suite for the cross-process token cache."""
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = make_config(token_cache_enabled=True, token_cache_dir=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_service(self):
+        service = TokenService(self.config)
+        def refresh():
+            service._token = Token(f'token-{id(service)}', datetime.now() + timedelta(hours=1))
+        service._refresh_token = MagicMock(side_effect=refresh)
+        return service
+
+    def test_second_service_reuses_cached_token(self):
+        """A fresh TokenService (e.g. another worker) reuses the stored token without refreshing."""
+        first, second = self.make_service(), self.make_service()
+        token = first.get_token()
+        self.assertEqual(second.get_token(), token)
+        first._refresh_token.assert_called_once()
+        second._refresh_token.assert_not_called()
+
+    def test_invalidate_forces_refresh(self):
+        """After invalidation the next service refreshes instead of reusing the rejected token."""
+        first = self.make_service()
+        first.get_token()
+        first.invalidate()
+        second = self.make_service()
+        second.get_token()
+        second._refresh_token.assert_called_once()
+
+    @unittest.skipUnless(hasattr(os, 'symlink') and os.name == 'posix', 'needs POSIX symlinks')
+    def test_store_does_not_follow_planted_symlink(self):
+        """The temporary file has an unpredictable name, so a symlink at the old fixed name is left alone."""
+        from address_comparison_app.token_cache import FileTokenCache
+        path = os.path.join(self.tmpdir.name, 'token.json')
+        victim = os.path.join(self.tmpdir.name, 'victim')
+        with open(victim, 'w') as f:
+            f.write('keep')
+        os.symlink(victim, f'{path}.{os.getpid()}.tmp')
+        cache = FileTokenCache(path)
+        cache.store(Token('abc', datetime.now() + timedelta(hours=1)))
+        with open(victim) as f:
+            self.assertEqual(f.read(), 'keep')
+        self.assertEqual(cache.load().value, 'abc')
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), sorted(['token.json', 'victim', f'token.json.{os.getpid()}.tmp']))
+
+class TestSessionRegistry(unittest.TestCase):
+    """Test suite for the process-wide pooled session registry."""
+    def setUp(self):
+        self.registry = SessionRegistry()
+
+    def tearDown(self):
+        self.registry.close_all()
+
+    def test_session_is_shared_and_sized(self):
+        """Every service for a config gets the same session, sized to the batch worker count."""
+        config = make_config(max_workers=32, pool_maxsize=20)
+        session = self.registry.session_for(config)
+        self.assertIs(self.registry.session_for(config), session)
+        self.assertEqual(session.get_adapter('https://cds.test/')._pool_maxsize, 32)
+        self.assertEqual(self.registry.stats()['cds']['requests'], 0)
+
+    def test_close_all_forgets_sessions(self):
+        """After close_all the next lookup gets a fresh session."""
+        session = self.registry.get('cds')
+        self.registry.close_all()
+        self.assertIsNot(self.registry.get('cds'), session)
+
+class TestResponseCache(unittest.TestCase):
+    """Test suite for the TTL + LRU response cache and its use by CDSService."""
+    def test_lru_eviction_by_entry_count(self):
+        """The least recently used entry is evicted first."""
+        cache = ResponseCache(max_entries=2)
+        cache.set('a', {'v': 1})
+        cache.set('b', {'v': 2})
+        cache.get('a')
+        cache.set('c', {'v': 3})
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, {'v': 1}))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired_entries_miss(self):
+        """Entries past their TTL are misses."""
+        cache = ResponseCache(ttl=0)
+        cache.set('a', {'v': 1})
+        self.assertEqual(cache.get('a'), (False, None))
+
+    def test_service_caches_hits_and_not_found(self):
+        """Repeat lookups skip the network; 404s are negatively cached; refresh bypasses the cache."""
+        config = make_config()
+        token_service = TokenService(config)
+        service = CDSService(config, token_service, cache=ResponseCache())
+        calls = []
+        def fetch(entity_id):
+            calls.append(entity_id)
+            if entity_id == 404:
+                raise APIError("Entity ID 404 not found", status_code=404)
+            return make_response(entity_id)
+        with patch.object(service, 'lookup_by_entity_id', side_effect=fetch):
+            self.assertIs(service.lookup_value(' 7'), service.lookup_value(7))
+            for _ in range(2):
+                with self.assertRaises(APIError):
+                    service.lookup_value(404)
+            service.lookup_value(7, refresh=True)
+        self.assertEqual(calls, [7, 404, 7])
+        self.assertEqual(service.cache.stats()['hits'], 2)
+
+    def test_services_for_different_environments_do_not_share_entries(self):
+        """The cache key includes the CDS base URL, so one shared cache never mixes environments."""
+        cache = ResponseCache()
+        services = [CDSService(make_config(base_url_cds=url), TokenService(make_config()), cache=cache)
+                    for url in ('https://cds.test/', 'https://cds-uat.test/')]
+        for service, entity_id in zip(services, (1, 2)):
+            with patch.object(service, 'lookup_by_entity_id', return_value=make_response(entity_id)):
+                service.lookup_value(7)
+        self.assertEqual([s.lookup_value(7)['data'][0]['entityId'] for s in services], [1, 2])
+
+    def test_clients_for_different_environments_do_not_share_frames(self):
+        """Cached DataFrames are keyed like responses, so a UAT client never gets a production frame."""
+        cache = ResponseCache()
+        clients = []
+        for url in ('https://cds.test/', 'https://cds-uat.test/'):
+            client = CDSClient(make_config(base_url_cds=url))
+            client.cds_service.cache = cache
+            clients.append(client)
+        for client, entity_id in zip(clients, (1, 2)):
+            with patch.object(client.cds_service, 'lookup_by_entity_id', return_value=make_response(entity_id)):
+                client.lookup_entity_as_dataframe(7)
+        self.assertEqual([c.lookup_entity_as_dataframe(7)['entity_id'].tolist()[0] for c in clients], [1, 2])
+
+class TestRateLimiting(unittest.TestCase):
+    """Test suite for client-side rate limiting and retries."""
+    def test_parse_retry_after(self):
+        """Retry-After accepts delta-seconds and HTTP dates."""
+        self.assertEqual(parse_retry_after('7'), 7.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_token_bucket_paces_after_burst(self):
+        """Once the burst is spent, callers wait 1/rate seconds per request."""
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual([bucket.reserve() > 0 for _ in range(3)], [False, False, True])
+
+    def test_aimd_halves_on_throttle(self):
+        """Throttling halves the concurrency limit; successes grow it back additively."""
+        limiter = AdaptiveConcurrencyLimiter(8)
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(limiter.limit, 4)
+        limiter.acquire()
+        limiter.release()
+        self.assertEqual(limiter.limit, 4.25)
+
+    def test_shared_limiter_is_keyed_by_configuration(self):
+        """Clients with the same settings share a limiter; different limits get their own."""
+        from address_comparison_app.rate_limit import shared_rate_limiter
+        first = shared_rate_limiter(make_config(rate_limit_max_concurrency=3))
+        self.assertIs(shared_rate_limiter(make_config(rate_limit_max_concurrency=3)), first)
+        second = shared_rate_limiter(make_config(rate_limit_max_concurrency=12))
+        self.assertIsNot(second, first)
+        self.assertEqual((first.concurrency.maximum, second.concurrency.maximum), (3, 12))
+
+    def test_concurrency_ceiling_is_not_the_thread_pool_size(self):
+        """The limiter allows rate_limit_max_concurrency requests in flight whatever max_workers is."""
+        limiter = RateLimiter.from_config(make_config(max_workers=2, rate_limit_max_concurrency=40))
+        self.assertEqual((limiter.concurrency.limit, limiter.concurrency.maximum), (40, 40))
+
+    def test_async_waiters_are_woken_by_release(self):
+        """Coroutines waiting for a slot sleep until release() hands one over (no polling)."""
+        limiter = AdaptiveConcurrencyLimiter(2)
+        order = []
+
+        async def worker(name):
+            await limiter.acquire_async()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        async def run():
+            await asyncio.wait_for(asyncio.gather(*(worker(i) for i in range(6))), timeout=5)
+        asyncio.run(run())
+        self.assertEqual(sorted(order), list(range(6)))
+        self.assertEqual((limiter.in_flight, len(limiter._async_waiters)), (0, 0))
+
+    def test_service_retries_429_honoring_retry_after(self):
+        """A 429 with Retry-After is retried after the requested delay."""
+        config = make_config()
+        limiter = RateLimiter(TokenBucket(0), AdaptiveConcurrencyLimiter(4), RetryPolicy(max_retries=2))
+        service = CDSService(config, TokenService(config), rate_limiter=limiter)
+        throttled = MagicMock(status_code=429, headers={'Retry-After': '2'})
+        ok = MagicMock(status_code=200, headers={})
+        ok.json.return_value = make_response(3)
+        with patch.object(service.token_service, 'get_token', return_value='t'), \
+                patch.object(service._session, 'get', side_effect=[throttled, ok]) as get, \
+                patch('address_comparison_app.cds_client.time.sleep') as sleep:
+            result = service.lookup_by_entity_id(3)
+        self.assertEqual(result['data'][0]['entityId'], 3)
+        self.assertEqual(get.call_count, 2)
+        sleep.assert_any_call(2.0)
+        self.assertEqual(limiter.concurrency.limit, 2.5)
+
+class TestAsyncCDSService(unittest.IsolatedAsyncioTestCase):
+    """Test suite for the asyncio CDS service against a mocked transport."""
+    async def asyncSetUp(self):
+        self.calls = []
+        def handler(request):
+            self.calls.append(request.url.path)
+            if request.url.path == '/token':
+                return httpx.Response(200, json={'token': 'abc'})
+            if request.url.params.get('bvdid') == 'MISSING':
+                return httpx.Response(404)
+            return httpx.Response(200, json=make_response(int(request.url.params['entityid'])))
+        config = make_config(token_service='https://cds.test/token')
+        self.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        self.service = AsyncCDSService(config, AsyncTokenService(config, self.http), self.http)
+
+    async def asyncTearDown(self):
+        await self.http.aclose()
+
+    async def test_lookup_value_reuses_token(self):
+        """Concurrent lookups share one token refresh."""
+        import asyncio
+        results = await asyncio.gather(*(self.service.lookup_value(i) for i in (1, 2, 3)))
+        self.assertEqual([r['data'][0]['entityId'] for r in results], [1, 2, 3])
+        self.assertEqual(self.calls.count('/token'), 1)
+
+    async def test_not_found_raises_api_error(self):
+        """A 404 is mapped to APIError like the sync client."""
+        with self.assertRaises(APIError):
+            await self.service.lookup_value('MISSING')
+
+    async def test_services_share_file_token_cache_and_invalidate_on_401(self):
+        """Async services reuse the cross-process token cache; a 401 clears it."""
+        from address_comparison_app.token_cache import FileTokenCache
+        cache = FileTokenCache(os.path.join(tempfile.mkdtemp(), 'token.json'))
+        config = make_config(token_service='https://cds.test/token')
+        for entity_id in (1, 2):
+            service = AsyncCDSService(config, AsyncTokenService(config, self.http, cache), self.http)
+            await service.lookup_value(entity_id)
+        self.assertEqual(self.calls.count('/token'), 1)
+        unauthorized = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(401)))
+        self.addAsyncCleanup(unauthorized.aclose)
+        service = AsyncCDSService(config, AsyncTokenService(config, self.http, cache), unauthorized)
+        with self.assertRaises(AuthenticationError):
+            await service.lookup_value(3)
+        self.assertIsNone(cache.load())
+
+    async def test_token_cache_file_io_runs_off_the_event_loop(self):
+        """Token cache reads and writes run on worker threads, never on the event loop thread."""
+        import threading
+        from address_comparison_app.token_cache import FileTokenCache
+        cache = FileTokenCache(os.path.join(tempfile.mkdtemp(), 'token.json'))
+        threads = []
+        load, store = cache.load, cache.store
+        cache.load = lambda: threads.append(threading.current_thread()) or load()
+        cache.store = lambda token: threads.append(threading.current_thread()) or store(token)
+        config = make_config(token_service='https://cds.test/token')
+        await AsyncTokenService(config, self.http, cache).get_token()
+        self.assertGreaterEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    async def test_clients_share_pooled_http_client(self):
+        """AsyncCDSClient instances on one event loop share a single httpx.AsyncClient."""
+        from address_comparison_app.async_cds_client import AsyncCDSClient
+        async with AsyncCDSClient(make_config()) as first, AsyncCDSClient(make_config()) as second:
+            self.assertIs(first._client, second._client)
+        self.assertFalse(first._client.is_closed)
+
+class TestStubCDSServer(unittest.TestCase):
+    """Test suite for CDSService against the local stand-in server used by the load tests."""
+    def setUp(self):
+        from benchmarks.cds_stub_server import StubCDSServer
+        self.server = StubCDSServer(addresses=3, retry_after=0, seed=1).start()
+        self.config = make_config(token_service=f'{self.server.url}/token', base_url_cds=f'{self.server.url}/')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def service(self, **stub_overrides):
+        for name, value in stub_overrides.items():
+            setattr(self.server, name, value)
+        limiter = RateLimiter(TokenBucket(0), AdaptiveConcurrencyLimiter(4), RetryPolicy(max_retries=2))
+        return CDSService(self.config, TokenService(self.config), rate_limiter=limiter)
+
+    def test_lookup_returns_requested_entity(self):
+        """The stand-in answers with one entity matching the requested identifier."""
+        result = self.service().lookup_value('BVD123')
+        self.assertEqual(result['data'][0]['bvdId'], 'BVD123')
+        self.assertEqual(len(location_records(result)), 3)
+
+    def test_injected_429s_are_retried_then_raised(self):
+        """With every lookup throttled, the client retries max_retries times before raising."""
+        with patch('address_comparison_app.cds_client.time.sleep'), self.assertRaises(APIError) as raised:
+            self.service(rate_429=1.0).lookup_value(123)
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(self.server.stats(), {'200': 1, '429': 3})
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,123 @@
+"""
+Cross-process CDS token cache for Moody's Address Comparison WebApp
+Stores the bearer token in a local JSON file guarded by a file lock, so every
+worker process on the host reuses one token and only one of them refreshes it.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+from filelock import FileLock, Timeout
+
+if TYPE_CHECKING:
+    from .cds_client import Token
+    from .cds_config import CDSConfig
+
+class FileTokenCache:
+    """Shared token store backed by a JSON file and a sibling ``.lock`` file."""
+    def __init__(self, path: str, lock_timeout: float = 60):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._lock = FileLock(f"{path}.lock", timeout=lock_timeout)
+        self.logger = logging.getLogger(__name__)
+    @classmethod
+    def for_config(cls, config: 'CDSConfig') -> Optional['FileTokenCache']:
+        """Build the cache for a config, or None if the shared cache is disabled."""
+        if not config.token_cache_enabled:
+            return None
+        # One file per token endpoint/audience/credential so configs never share tokens
+        key = f"{config.token_service}|{config.api_name}|{config.pe_token}"
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        directory = config.token_cache_dir or tempfile.gettempdir()
+        return cls(os.path.join(directory, f"cds_token_{digest}.json"))
+    def load(self) -> Optional['Token']:
+        """Return the cached token, or None if missing or unreadable."""
+        from .cds_client import Token
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return Token(data['value'], datetime.fromisoformat(data['expires_at']))
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable token cache {self.path}: {e}")
+            return None
+    def store(self, token: 'Token') -> None:
+        """
+        Atomically write the token (owner-only permissions). The temporary file is created with
+        mkstemp (O_EXCL, random name), so a pre-planted file or symlink in a shared directory is never followed.
+        """
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix='.tmp',
+                                            dir=os.path.dirname(self.path) or None)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'value': token.value, 'expires_at': token.expires_at.isoformat()}, f)
+            os.replace(tmp_path, self.path)
+            tmp_path = None
+        except OSError as e:
+            self.logger.warning(f"Failed to write token cache {self.path}: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    async def aload(self) -> Optional['Token']:
+        """load() on a worker thread, so the event loop never waits on file I/O."""
+        return await asyncio.to_thread(self.load)
+    async def astore(self, token: 'Token') -> None:
+        """store() on a worker thread."""
+        await asyncio.to_thread(self.store, token)
+    async def aclear(self, token: Optional['Token'] = None) -> None:
+        """clear() on a worker thread."""
+        await asyncio.to_thread(self.clear, token)
+    def clear(self, token: Optional['Token'] = None) -> None:
+        """Remove the cached token; if ``token`` is given, only when it is still the cached one."""
+        try:
+            if token is not None:
+                cached = self.load()
+                if cached is None or cached.value != token.value:
+                    return
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Failed to clear token cache {self.path}: {e}")
+    @contextmanager
+    def refresh_lock(self):
+        """Hold the cross-process refresh lock. Yields False if it could not be acquired in time."""
+        try:
+            self._lock.acquire()
+        except Timeout:
+            self.logger.warning(f"Timed out waiting for token cache lock {self._lock.lock_file}")
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._lock.release()
+    @asynccontextmanager
+    async def async_refresh_lock(self, poll_interval: float = 0.05):
+        """Async refresh_lock: polls the file lock instead of blocking the event loop while another process refreshes."""
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                self._lock.acquire(timeout=0)
+                break
+            except Timeout:
+                if time.monotonic() >= deadline:
+                    self.logger.warning(f"Timed out waiting for token cache lock {self._lock.lock_file}")
+                    yield False
+                    return
+                await asyncio.sleep(poll_interval)
+        try:
+            yield True
+        finally:
+            self._lock.release()
@@ -1,10 +1,24 @@
 # urls.py: URL routing for the hello app, following Django best practices.
 from django.urls import path
-from .views import health_check, mongo_query_view, cds_lookup_view, unified_lookup_view
+from .views import (
+    health_check, mongo_query_view, cds_lookup_view, unified_lookup_view,
+    cds_lookup_async_view, unified_lookup_async_view, mongo_export_view, cds_export_view,
+    job_submit_view, job_status_view, job_download_view,
+)
 
 urlpatterns = [
     path('', health_check, name='health_check'),  # Health check or landing page
     path('mongo/', mongo_query_view, name='mongo_query'),
     path('cds-lookup/', cds_lookup_view, name='cds_lookup'),
     path('unified-lookup/', unified_lookup_view, name='unified_lookup'),
+    # Async variants for ASGI deployments (CDS lookups do not hold a worker thread)
+    path('cds-lookup/async/', cds_lookup_async_view, name='cds_lookup_async'),
+    path('unified-lookup/async/', unified_lookup_async_view, name='unified_lookup_async'),
+    # Streaming CSV/Parquet exports (?format=csv|parquet)
+    path('mongo/export/', mongo_export_view, name='mongo_export'),
+    path('cds-lookup/export/', cds_export_view, name='cds_export'),
+    # Background batch comparison jobs
+    path('jobs/', job_submit_view, name='job_submit'),
+    path('jobs/<uuid:job_id>/', job_status_view, name='job_status'),
+    path('jobs/<uuid:job_id>/download/', job_download_view, name='job_download'),
 ]
@@ -1,17 +1,22 @@
 # views.py: Django views for MongoDB querying and display, following OOP and clean code principles.
-from django.shortcuts import render
-from django.http import HttpResponse
-from .data_handler import DataHandler, MongoDBSource
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from .data_handler import ADDRESS_COLUMNS, DEFAULT_PAGE_SIZE, DataHandler, MongoDBSource
 from .cds_config import CDSConfig
-from .cds_client import CDSClient, CDSClientError
-from .forms import CDSLookupForm, DataSourceChoiceForm
+from .cds_client import BATCH_COLUMNS, LOCATION_COLUMNS, CDSClient, CDSClientError, location_records, loqate_batch_rows
+from .async_cds_client import AsyncCDSClient
+from .comparison import compare_cds_rows, compare_mongo_rows, join_sources
+from .exporters import EXPORT_BATCH_SIZE, EXPORT_CDS_BATCH_SIZE, EXPORT_CONTENT_TYPES, import_pyarrow, iter_export
+from .forms import CDSLookupForm, ComparisonJobForm, DataSourceChoiceForm
+from .jobs import submit_job
+from .models import ComparisonJob
+from .snapshot_store import snapshot_store
 import os
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List, Union
-import logging
 
 # Configuration for MongoDB connection (loaded from environment variables for security)
 MONGO_CONFIG = {
@@ -20,205 +25,16 @@ MONGO_CONFIG = {
     'collection': os.environ.get('MONGO_COLLECTION', '')
 }
 
-@dataclass
-class Token:
-    value: str
-    expires_at: datetime
-    @property
-    def is_expired(self) -> bool:
-        return datetime.now() >= (self.expires_at - timedelta(minutes=5))
-
-class CDSClientError(Exception): pass
-class AuthenticationError(CDSClientError): pass
-class APIError(CDSClientError): pass
-class InvalidIdentifierError(CDSClientError): pass
-
-class IdentifierUtils:
-    @staticmethod
-    def is_bvd_id(identifier: Union[str, int]) -> bool:
-        if isinstance(identifier, int): return False
-        if not isinstance(identifier, str): return False
-        return bool(any(c.isalpha() or c in ['*', '#', '&'] for c in str(identifier)))
-    @staticmethod
-    def is_entity_id(identifier: Union[str, int]) -> bool:
-        try:
-            int(identifier)
-            return True
-        except (ValueError, TypeError):
-            return False
-    @staticmethod
-    def validate_identifier(identifier: Union[str, int]) -> str:
-        if IdentifierUtils.is_entity_id(identifier):
-            return "entity_id"
-        elif IdentifierUtils.is_bvd_id(identifier):
-            return "bvd_id"
-        else:
-            raise InvalidIdentifierError(f"Invalid identifier format: {identifier}")
-
-class TokenService:
-    def __init__(self, config: CDSConfig):
-        self.config = config
-        self._token: Optional[Token] = None
-        self._session = requests.Session()
-        self.logger = logging.getLogger(__name__)
-    def get_token(self) -> str:
-        if self._token is None or self._token.is_expired:
-            self._refresh_token()
-        return self._token.value
-    def _refresh_token(self) -> None:
-        try:
-            payload = {"audience": self.config.api_name}
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Basic {self.config.pe_token}',
-                'Cookie': self.config.cookie_gt
-            }
-            response = self._session.post(
-                self.config.token_service,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            response_data = response.json()
-            if 'token' not in response_data:
-                raise AuthenticationError("Token not found in response")
-            expires_at = datetime.now() + timedelta(hours=1)
-            self._token = Token(response_data['token'], expires_at)
-            self.logger.info("Token refreshed successfully")
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Failed to generate token: {e}")
-            raise AuthenticationError(f"Token generation failed: {e}")
-        except (KeyError, ValueError) as e:
-            self.logger.error(f"Invalid token response: {e}")
-            raise AuthenticationError(f"Invalid token response: {e}")
-    def __enter__(self): return self
-    def __exit__(self, exc_type, exc_val, exc_tb): self._session.close()
-
-class CDSService:
-    def __init__(self, config: CDSConfig, token_service: TokenService):
-        self.config = config
-        self.token_service = token_service
-        self._session = requests.Session()
-        self.logger = logging.getLogger(__name__)
-    def lookup_by_entity_id(self, entity_id: int) -> Dict[str, Any]:
-        if not isinstance(entity_id, int) or entity_id <= 0:
-            raise ValueError("Entity ID must be a positive integer")
-        try:
-            token = self.token_service.get_token()
-            url = f"{self.config.base_url_cds}legalentities/firmographics/locations"
-            params = {"entityid": entity_id}
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Cookie': self.config.cookie_cds,
-                'Accept': 'application/json'
-            }
-            response = self._session.get(url, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            self.logger.info(f"Successfully retrieved data for entity ID: {entity_id}")
-            return result
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 401:
-                raise AuthenticationError("Invalid or expired token")
-            elif response.status_code == 404:
-                raise APIError(f"Entity ID {entity_id} not found")
-            else:
-                raise APIError(f"HTTP error: {e}")
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request failed for entity ID {entity_id}: {e}")
-            raise APIError(f"Request failed: {e}")
-        except ValueError as e:
-            self.logger.error(f"Invalid response format: {e}")
-            raise APIError(f"Invalid response format: {e}")
-    def lookup_by_bvd_id(self, bvd_id: str) -> Dict[str, Any]:
-        if not isinstance(bvd_id, str) or not bvd_id.strip():
-            raise ValueError("BVD ID must be a non-empty string")
-        try:
-            token = self.token_service.get_token()
-            url = f"{self.config.base_url_cds}legalentities/firmographics/locations"
-            params = {"bvdid": bvd_id}
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Cookie': self.config.cookie_cds,
-                'Accept': 'application/json'
-            }
-            response = self._session.get(url, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            self.logger.info(f"Successfully retrieved data for BVD ID: {bvd_id}")
-            return result
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 401:
-                raise AuthenticationError("Invalid or expired token")
-            elif response.status_code == 404:
-                raise APIError(f"BVD ID {bvd_id} not found")
-            else:
-                raise APIError(f"HTTP error: {e}")
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request failed for BVD ID {bvd_id}: {e}")
-            raise APIError(f"Request failed: {e}")
-        except ValueError as e:
-            self.logger.error(f"Invalid response format: {e}")
-            raise APIError(f"Invalid response format: {e}")
-    def lookup_value(self, identifier: Union[str, int]) -> Dict[str, Any]:
-        identifier_type = IdentifierUtils.validate_identifier(identifier)
-        if identifier_type == "entity_id":
-            return self.lookup_by_entity_id(int(identifier))
-        elif identifier_type == "bvd_id":
-            return self.lookup_by_bvd_id(str(identifier))
-        else:
-            raise InvalidIdentifierError(f"Unsupported identifier type: {identifier_type}")
-    def __enter__(self): return self
-    def __exit__(self, exc_type, exc_val, exc_tb): self._session.close()
-
-def explode_location_data(api_response: Dict[str, Any]) -> pd.DataFrame:
-    all_rows = []
-    for entity in api_response.get('data', []):
-        entity_id = entity.get('entityId')
-        bvd_id = entity.get('bvdId')
-        for location in entity.get('locations', []):
-            categories = location.get('categories', [])
-            category_code = categories[0].get('code') if categories else None
-            category_label = categories[0].get('label') if categories else None
-            for address in location.get('addresses', []):
-                reported = address.get('reported', {})
-                standardized = address.get('standardized', {})
-                row = {
-                    'entity_id': entity_id,
-                    'bvd_id': bvd_id,
-                    'location_category_code': category_code,
-                    'location_category_label': category_label,
-                    'reported_address_lines': ', '.join(reported.get('addressLines', [])),
-                    'reported_city': reported.get('city'),
-                    'reported_post_code': reported.get('postCode'),
-                    'reported_country_code': reported.get('country', {}).get('code'),
-                    'reported_country_label': reported.get('country', {}).get('label'),
-                    'reported_phone_numbers': ', '.join(reported.get('phoneNumbers', [])),
-                    'reported_fax_numbers': ', '.join(reported.get('faxNumbers', [])),
-                    'standardized_address_lines': ', '.join(standardized.get('addressLines', [])),
-                    'standardized_provider': standardized.get('provider'),
-                    'standardized_verification_code': standardized.get('verificationCode'),
-                    'standardized_quality_index': standardized.get('qualityIndex'),
-                    'standardized_country_name': standardized.get('countryName'),
-                    'standardized_iso31662': standardized.get('iso31662'),
-                    'standardized_iso31663': standardized.get('iso31663'),
-                    'standardized_iso3166n': standardized.get('iso3166N'),
-                    'standardized_super_admin_area': standardized.get('superAdministrativeArea'),
-                    'standardized_admin_area': standardized.get('administrativeArea'),
-                    'standardized_sub_admin_area': standardized.get('subAdministrativeArea'),
-                    'standardized_locality': standardized.get('locality'),
-                    'standardized_thoroughfare': standardized.get('thoroughfare'),
-                    'standardized_building': standardized.get('building'),
-                    'standardized_premise': standardized.get('premise'),
-                    'standardized_postal_code': standardized.get('postalCode'),
-                    'standardized_postal_code_primary': standardized.get('postalCodePrimary'),
-                    'standardized_post_box': standardized.get('postBox'),
-                    'standardized_longitude': standardized.get('longitude'),
-                    'standardized_latitude': standardized.get('latitude')
-                }
-                all_rows.append(row)
-    return pd.DataFrame(all_rows)
+# Only the columns needed for Mongo address comparison are projected, extracted and normalized
+MONGO_COMPARISON_COLUMNS = [
+    '_id',
+    'reportedAddress_addressLines',
+    'reportedAddress_city',
+    'reportedAddress_postCode',
+    'standardizedAddress_addressLines',
+    'standardizedAddress_locality',
+    'standardizedAddress_postalCode'
+]
 
 def health_check(request):
     """
@@ -230,13 +46,13 @@ def mongo_query_view(request):
     """
     Main view for querying MongoDB and displaying normalized address data in a table.
     Adds a checkbox filter for standardizedAddress_provider (LoqateAddress: only rows with 'L').
+    Results are keyset-paginated on _id ('page_size' documents per page; 'cursor' selects the next page).
     """
-    context = {'result': None, 'error': None}
+    context = {'result': None, 'error': None, 'grouped_result': [], 'address_comparison': []}
     uri = MONGO_CONFIG['uri']
     database = MONGO_CONFIG['database']
     collection = MONGO_CONFIG['collection']
     filter_dict = {}
-    projection_dict = {}
     columns = [
         '_id',
         'reportedAddress_addressLines', 'reportedAddress_city', 'reportedAddress_phoneNumbers', 'reportedAddress_faxNumbers', 'reportedAddress_postCode',
@@ -248,74 +64,40 @@ def mongo_query_view(request):
         'standardizedAddress_postalCodePrimary', 'standardizedAddress_postBox'
     ]
     loqate_checked = False
+    ids = ''
+    page_size = DEFAULT_PAGE_SIZE
+    next_cursor = None
     if request.method == 'POST':
         ids = request.POST.get('ids', '')
         values = [v.strip() for v in ids.split(',') if v.strip()]
         loqate_checked = request.POST.get('loqate_filter') == 'on'
         if values:
             filter_dict = {'_id': {'$in': values}}
-        projection_dict = {
-            'd.addresses.localizedAddresses.standardizedAddress': 1,
-            'd.addresses.localizedAddresses.reportedAddress': 1
-        }
         try:
-            # Use OOP data access and normalization
+            page_size = int(request.POST.get('page_size') or DEFAULT_PAGE_SIZE)
+            # Use OOP data access and normalization; addresses are unwound, flattened and
+            # (if checked) LoqateAddress-filtered by MongoDB itself, one page of _ids at a time
             source = MongoDBSource(uri, database, collection)
             handler = DataHandler(source)
-            data = handler.fetch_data(filter_dict, projection_dict)
-            df = handler.normalize_addresses(data)
-            # Apply LoqateAddress filter if checked
-            if loqate_checked:
-                df = df[df['standardizedAddress_provider'].astype(str).str.startswith('L', na=False)]
-            # Ensure all columns exist in the DataFrame
-            for col in columns:
-                if col not in df.columns:
-                    df[col] = ''
-            # Always show all columns in the UI
-            df = df[columns]
-            result = df.to_dict(orient='records')
+            result, next_cursor = handler.fetch_page_records(
+                filter_dict, page_size=page_size, cursor=request.POST.get('cursor') or None,
+                loqate_only=loqate_checked, columns=columns
+            )
             context['result'] = result
-            # Group by _id for address comparison
-            grouped_result = []
-            if result:
-                from collections import defaultdict
-                group_map = defaultdict(list)
-                for row in result:
-                    group_map[row.get('_id', 'N/A')].append(row)
-                for _id, addresses in group_map.items():
-                    grouped_result.append({'id': _id, 'addresses': addresses})
-            context['grouped_result'] = grouped_result
+            # One pass groups rows by _id for both the per-_id listing and the address comparison
+            groups = compare_mongo_rows(result)
+            context['grouped_result'] = groups
+            context['address_comparison'] = groups
         except Exception as e:
             context['error'] = str(e)
     context.update({
         'columns': columns,
         'selected_columns': columns,
-        'loqate_checked': loqate_checked
+        'loqate_checked': loqate_checked,
+        'ids': ids,
+        'page_size': page_size,
+        'next_cursor': next_cursor
     })
-    # Address Comparison for MongoDB: group by _id and extract comparison fields
-    address_comparison = []
-    if context.get('result'):
-        from collections import defaultdict
-        group_map = defaultdict(list)
-        for row in context['result']:
-            group_map[row.get('_id', 'N/A')].append(row)
-        for _id, addresses in group_map.items():
-            comparison_rows = []
-            for addr in addresses:
-                comparison_rows.append({
-                    # Map Mongo fields to the CDS-style keys for template compatibility
-                    'reported_address_lines': addr.get('reportedAddress_addressLines', ''),
-                    'standardized_address_lines': addr.get('standardizedAddress_addressLines', ''),
-                    'reported_city': addr.get('reportedAddress_city', ''),
-                    'standardized_locality': addr.get('standardizedAddress_locality', ''),
-                    'reported_post_code': addr.get('reportedAddress_postCode', ''),
-                    'standardized_postal_code': addr.get('standardizedAddress_postalCode', ''),
-                    # Mongo does not have country fields in this context, but add empty for template compatibility
-                    'reported_country_label': '',
-                    'standardized_country_name': ''
-                })
-            address_comparison.append({'id': _id, 'addresses': comparison_rows})
-    context['address_comparison'] = address_comparison
     return render(request, 'address_comparison_app/mongo_query.html', context)
 
 def cds_lookup_view(request):
@@ -339,15 +121,116 @@ def cds_lookup_view(request):
         form = CDSLookupForm()
     return render(request, 'address_comparison_app/cds_lookup.html', {'form': form, 'result': result, 'error': error})
 
+def _mongo_unified_lookup(identifier, loqate_checked):
+    """
+    MongoDB branch of the unified lookup: fetch one _id and build the table and comparison rows.
+    Returns (columns, result, address_comparison).
+    """
+    uri = MONGO_CONFIG['uri']
+    database = MONGO_CONFIG['database']
+    collection = MONGO_CONFIG['collection']
+    columns = list(MONGO_COMPARISON_COLUMNS)
+    store = snapshot_store()
+    if store is not None:
+        result, missing = store.mongo_rows([identifier], columns, loqate_only=loqate_checked)
+        if not missing:
+            return columns, result, compare_mongo_rows(result)
+    source = MongoDBSource(uri, database, collection)
+    handler = DataHandler(source)
+    filter_dict = {'_id': identifier}
+    result = handler.fetch_flat_records(filter_dict, loqate_only=loqate_checked, columns=columns)
+    return columns, result, compare_mongo_rows(result)
+
+def _cds_unified_result(rows, identifier, loqate_checked):
+    """
+    CDS branch of the unified lookup: filter the flattened location rows and build the comparison rows.
+    Returns (columns, result, address_comparison).
+    """
+    result, address_comparison = compare_cds_rows(rows, identifier, loqate_only=loqate_checked)
+    columns = list(LOCATION_COLUMNS) if rows else []
+    return columns, result, address_comparison
+
+def _split_identifiers(identifier):
+    """
+    Comma-separated identifiers, stripped and de-duplicated in input order.
+    """
+    return list(dict.fromkeys(v.strip() for v in identifier.split(',') if v.strip()))
+
+def _mongo_comparison_rows(identifiers, loqate_checked):
+    """
+    Flat MongoDB comparison rows for a list of _ids: snapshotted _ids are read locally, the rest
+    with one aggregation.
+    """
+    rows = []
+    store = snapshot_store()
+    if store is not None:
+        rows, identifiers = store.mongo_rows(identifiers, MONGO_COMPARISON_COLUMNS, loqate_only=loqate_checked)
+        if not identifiers:
+            return rows
+    handler = DataHandler(MongoDBSource(MONGO_CONFIG['uri'], MONGO_CONFIG['database'], MONGO_CONFIG['collection']))
+    return rows + handler.fetch_flat_records({'_id': {'$in': identifiers}}, loqate_only=loqate_checked, columns=MONGO_COMPARISON_COLUMNS)
+
+def _snapshot_cds_rows(identifiers):
+    """
+    CDS location rows of the identifiers found in the local snapshot, and the identifiers still to look up live.
+    """
+    store = snapshot_store()
+    hits = {}
+    if store is not None:
+        for identifier in identifiers:
+            rows = store.cds_rows(identifier)
+            if rows is not None:
+                hits[identifier] = rows
+    return hits, [i for i in identifiers if i not in hits]
+
+def _cds_rows_by_identifier(responses):
+    """
+    Flatten lookup_multiple_entities results: identifier -> location rows, or the error message.
+    """
+    return {
+        identifier: response['error'] if 'error' in response else location_records(response)
+        for identifier, response in responses.items()
+    }
+
+def _both_sources_lookup(identifiers, loqate_checked):
+    """
+    "Both sources" mode: MongoDB runs on a worker thread while this thread fans out the CDS lookups,
+    so the latency is that of the slower source; the results are hash-joined per entity.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='mongo-lookup') as executor:
+        mongo_future = executor.submit(_mongo_comparison_rows, identifiers, loqate_checked)
+        cds_rows, missing = _snapshot_cds_rows(identifiers)
+        if missing:
+            with CDSClient() as client:
+                cds_rows.update(_cds_rows_by_identifier(client.lookup_multiple_entities(missing)))
+        mongo_rows = mongo_future.result()
+    return join_sources(identifiers, mongo_rows, cds_rows, loqate_only=loqate_checked)
+
+async def _both_sources_lookup_async(identifiers, loqate_checked):
+    """
+    Async "both sources" mode: the MongoDB query (in a thread) and the CDS lookups are awaited together.
+    """
+    cds_rows, missing = _snapshot_cds_rows(identifiers)
+    async with AsyncCDSClient() as client:
+        mongo_rows, responses = await asyncio.gather(
+            sync_to_async(_mongo_comparison_rows)(identifiers, loqate_checked),
+            client.lookup_multiple_entities(missing)
+        )
+    cds_rows.update(_cds_rows_by_identifier(responses))
+    return join_sources(identifiers, mongo_rows, cds_rows, loqate_only=loqate_checked)
+
 def unified_lookup_view(request):
     """
-    Unified view for selecting data source (MongoDB or CDS API) and extracting data.
-    Includes LoqateAddressOnly checkbox filter for standardized_provider.
+    Unified view for selecting data source (MongoDB, CDS API, or both) and extracting data.
+    Includes LoqateAddressOnly checkbox filter for standardized_provider. In "both" mode the
+    identifier may be a comma-separated list and each entity gets one cross-source comparison.
     """
     result = None
     error = None
     columns = []
     loqate_checked = False
+    address_comparison = []
+    entity_comparison = []
     if request.method == 'POST':
         form = DataSourceChoiceForm(request.POST)
         if form.is_valid():
@@ -356,92 +239,188 @@ def unified_lookup_view(request):
             loqate_checked = form.cleaned_data.get('loqate_filter', False)
             try:
                 if data_source == 'mongo':
-                    from .data_handler import DataHandler, MongoDBSource
-                    uri = MONGO_CONFIG['uri']
-                    database = MONGO_CONFIG['database']
-                    collection = MONGO_CONFIG['collection']
-                    source = MongoDBSource(uri, database, collection)
-                    handler = DataHandler(source)
-                    filter_dict = {'_id': identifier}
-                    projection_dict = {
-                        'd.addresses.localizedAddresses.standardizedAddress': 1,
-                        'd.addresses.localizedAddresses.reportedAddress': 1
-                    }
-                    data = handler.fetch_data(filter_dict, projection_dict)
-                    df = handler.normalize_addresses(data)
-                    if loqate_checked:
-                        df = df[df['standardizedAddress_provider'].astype(str).str.startswith('L', na=False)]
-                    # Only keep the columns needed for Mongo address comparison
-                    columns = [
-                        '_id',
-                        'reportedAddress_addressLines',
-                        'reportedAddress_city',
-                        'reportedAddress_postCode',
-                        'standardizedAddress_addressLines',
-                        'standardizedAddress_locality',
-                        'standardizedAddress_postalCode'
-                    ]
-                    for col in columns:
-                        if col not in df.columns:
-                            df[col] = ''
-                    df = df[columns]
-                    result = df.to_dict(orient='records')
-                    # Address Comparison for MongoDB
-                    from collections import defaultdict
-                    group_map = defaultdict(list)
-                    for row in result:
-                        group_map[row.get('_id', 'N/A')].append(row)
-                    address_comparison = []
-                    for _id, addresses in group_map.items():
-                        comparison_rows = []
-                        for addr in addresses:
-                            comparison_rows.append({
-                                # Map Mongo fields to the CDS-style keys for template compatibility
-                                'reported_address_lines': addr.get('reportedAddress_addressLines', ''),
-                                'standardized_address_lines': addr.get('standardizedAddress_addressLines', ''),
-                                'reported_city': addr.get('reportedAddress_city', ''),
-                                'standardized_locality': addr.get('standardizedAddress_locality', ''),
-                                'reported_post_code': addr.get('reportedAddress_postCode', ''),
-                                'standardized_postal_code': addr.get('standardizedAddress_postalCode', ''),
-                                # Mongo does not have country fields in this context, but add empty for template compatibility
-                                'reported_country_label': '',
-                                'standardized_country_name': ''
-                            })
-                        address_comparison.append({'id': _id, 'addresses': comparison_rows})
+                    columns, result, address_comparison = _mongo_unified_lookup(identifier, loqate_checked)
                 elif data_source == 'cds':
-                    from .cds_client import CDSClient, CDSClientError
-                    with CDSClient() as client:
-                        df = client.lookup_entity_as_dataframe(identifier)
-                        if loqate_checked and 'standardized_provider' in df.columns:
-                            df = df[df['standardized_provider'].astype(str).str.startswith('L', na=False)]
-                        columns = df.columns.tolist()
-                        result = df.to_dict(orient='records')
-                        # Address Comparison for CDS API
-                        address_comparison = []
-                        if not df.empty:
-                            comparison_rows = []
-                            for _, addr in df.iterrows():
-                                comparison_rows.append({
-                                    'reported_address_lines': addr.get('reported_address_lines', ''),
-                                    'standardized_address_lines': addr.get('standardized_address_lines', ''),
-                                    'reported_city': addr.get('reported_city', ''),
-                                    'standardized_locality': addr.get('standardized_locality', ''),
-                                    'reported_post_code': addr.get('reported_post_code', ''),
-                                    'standardized_postal_code': addr.get('standardized_postal_code', ''),
-                                    'reported_country_label': addr.get('reported_country_label', ''),
-                                    'standardized_country_name': addr.get('standardized_country_name', '')
-                                })
-                            address_comparison.append({'id': identifier, 'addresses': comparison_rows})
+                    rows = _snapshot_cds_rows([identifier])[0].get(identifier)
+                    if rows is None:
+                        with CDSClient() as client:
+                            rows = location_records(client.lookup_entity(identifier))
+                    columns, result, address_comparison = _cds_unified_result(rows, identifier, loqate_checked)
+                elif data_source == 'both':
+                    entity_comparison = _both_sources_lookup(_split_identifiers(identifier), loqate_checked)
             except Exception as e:
                 error = str(e)
         else:
             error = 'Invalid input.'
     else:
         form = DataSourceChoiceForm()
-        address_comparison = []
-    return render(request, 'address_comparison_app/unified_lookup.html', {'form': form, 'result': result, 'columns': columns, 'error': error, 'loqate_checked': loqate_checked, 'address_comparison': address_comparison})
+    return render(request, 'address_comparison_app/unified_lookup.html', {'form': form, 'result': result, 'columns': columns, 'error': error, 'loqate_checked': loqate_checked, 'address_comparison': address_comparison, 'entity_comparison': entity_comparison})
+
+async def cds_lookup_async_view(request):
+    """
+    Async variant of cds_lookup_view: awaits the CDS API via AsyncCDSClient instead of blocking a thread.
+    """
+    result = None
+    error = None
+    if request.method == 'POST':
+        form = CDSLookupForm(request.POST)
+        if form.is_valid():
+            identifier = form.cleaned_data['identifier']
+            try:
+                async with AsyncCDSClient() as client:
+                    result = await client.lookup_entity_as_dataframe(identifier)
+            except CDSClientError as e:
+                error = str(e)
+        else:
+            error = 'Invalid input.'
+    else:
+        form = CDSLookupForm()
+    return render(request, 'address_comparison_app/cds_lookup.html', {'form': form, 'result': result, 'error': error})
+
+async def unified_lookup_async_view(request):
+    """
+    Async variant of unified_lookup_view. The CDS branch awaits AsyncCDSClient;
+    the MongoDB branch (pymongo is blocking) runs in a worker thread.
+    """
+    result = None
+    error = None
+    columns = []
+    loqate_checked = False
+    address_comparison = []
+    entity_comparison = []
+    if request.method == 'POST':
+        form = DataSourceChoiceForm(request.POST)
+        if form.is_valid():
+            data_source = form.cleaned_data['data_source']
+            identifier = form.cleaned_data['identifier']
+            loqate_checked = form.cleaned_data.get('loqate_filter', False)
+            try:
+                if data_source == 'mongo':
+                    columns, result, address_comparison = await sync_to_async(_mongo_unified_lookup)(identifier, loqate_checked)
+                elif data_source == 'cds':
+                    rows = _snapshot_cds_rows([identifier])[0].get(identifier)
+                    if rows is None:
+                        async with AsyncCDSClient() as client:
+                            rows = location_records(await client.lookup_entity(identifier))
+                    columns, result, address_comparison = _cds_unified_result(rows, identifier, loqate_checked)
+                elif data_source == 'both':
+                    entity_comparison = await _both_sources_lookup_async(_split_identifiers(identifier), loqate_checked)
+            except Exception as e:
+                error = str(e)
+        else:
+            error = 'Invalid input.'
+    else:
+        form = DataSourceChoiceForm()
+    return render(request, 'address_comparison_app/unified_lookup.html', {'form': form, 'result': result, 'columns': columns, 'error': error, 'loqate_checked': loqate_checked, 'address_comparison': address_comparison, 'entity_comparison': entity_comparison})
 
 # Example usage of CDSConfig in a Django view or utility:
 # cds_config = CDSConfig.from_env()
 # print(cds_config.token_service)
 # You can now use cds_config to initialize your CDS API client logic.
+
+def _export_format(params):
+    """
+    Validate the requested export format; returns (format, error_response).
+    """
+    export_format = params.get('format', 'csv').lower()
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return export_format, HttpResponseBadRequest(f"Unsupported export format: {export_format}")
+    if export_format == 'parquet':
+        try:
+            import_pyarrow()
+        except ImportError:
+            return export_format, HttpResponse("Parquet export requires pyarrow to be installed.", status=501)
+    return export_format, None
+
+def _streaming_export(chunks, export_format, columns, basename):
+    """
+    Wrap DataFrame chunks in a StreamingHttpResponse serialized as CSV or Parquet.
+    """
+    response = StreamingHttpResponse(iter_export(chunks, export_format, columns), content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{basename}.{export_format}"'
+    return response
+
+def mongo_export_view(request):
+    """
+    Stream MongoDB query results as CSV or Parquet ('format' parameter).
+    Takes the same inputs as mongo_query_view ('ids', 'loqate_filter'); rows are read from the
+    aggregation cursor and serialized batch by batch, so large exports run in constant memory.
+    """
+    params = request.POST if request.method == 'POST' else request.GET
+    export_format, error_response = _export_format(params)
+    if error_response is not None:
+        return error_response
+    values = [v.strip() for v in params.get('ids', '').split(',') if v.strip()]
+    filter_dict = {'_id': {'$in': values}} if values else {}
+    loqate_checked = params.get('loqate_filter') == 'on'
+    handler = DataHandler(MongoDBSource(MONGO_CONFIG['uri'], MONGO_CONFIG['database'], MONGO_CONFIG['collection']))
+    chunks = handler.stream_flat_addresses(filter_dict, loqate_only=loqate_checked, batch_size=EXPORT_BATCH_SIZE, columns=ADDRESS_COLUMNS)
+    return _streaming_export(chunks, export_format, ADDRESS_COLUMNS, 'mongo_addresses')
+
+def cds_export_view(request):
+    """
+    Stream CDS lookups for comma-separated 'identifiers' (entity IDs or BVD IDs) as CSV or Parquet.
+    Identifiers are looked up in concurrent batches and each batch is written out as soon as it completes.
+    """
+    params = request.POST if request.method == 'POST' else request.GET
+    export_format, error_response = _export_format(params)
+    if error_response is not None:
+        return error_response
+    raw = params.get('identifiers') or params.get('identifier', '')
+    identifiers = [v.strip() for v in raw.split(',') if v.strip()]
+    if not identifiers:
+        return HttpResponseBadRequest("No identifiers given.")
+    client = CDSClient()
+    chunks = client.iter_multiple_entities_as_dataframes(identifiers, batch_size=EXPORT_CDS_BATCH_SIZE)
+    if params.get('loqate_filter') == 'on':
+        chunks = (loqate_batch_rows(df) for df in chunks)
+    return _streaming_export(chunks, export_format, BATCH_COLUMNS, 'cds_addresses')
+
+def _job_urls(job):
+    """
+    Status and download URLs of a comparison job.
+    """
+    return {
+        'status_url': reverse('job_status', args=[job.pk]),
+        'download_url': reverse('job_download', args=[job.pk]),
+    }
+
+@require_POST
+def job_submit_view(request):
+    """
+    Queue a background comparison for a large ID list ('source', 'identifiers', 'loqate_filter', 'format').
+    Responds 202 with the job id and its status/download URLs; the work runs on the local job pool.
+    """
+    form = ComparisonJobForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    export_format, error_response = _export_format({'format': form.cleaned_data.get('format') or 'csv'})
+    if error_response is not None:
+        return error_response
+    job = submit_job(
+        form.cleaned_data['identifiers'], form.cleaned_data['source'],
+        loqate_only=form.cleaned_data['loqate_filter'], export_format=export_format
+    )
+    return JsonResponse({'job_id': str(job.pk), 'status': job.status, **_job_urls(job)}, status=202)
+
+@require_GET
+def job_status_view(request, job_id):
+    """
+    Progress of a comparison job as JSON.
+    """
+    job = get_object_or_404(ComparisonJob, pk=job_id)
+    return JsonResponse({**job.as_dict(), **_job_urls(job)})
+
+@require_GET
+def job_download_view(request, job_id):
+    """
+    Download a finished job's result file (409 while the job is still queued or running).
+    """
+    job = get_object_or_404(ComparisonJob, pk=job_id)
+    if job.status != ComparisonJob.DONE or not job.result_path or not os.path.exists(job.result_path):
+        return JsonResponse(job.as_dict(), status=409)
+    return FileResponse(
+        open(job.result_path, 'rb'), as_attachment=True,
+        filename=f'{job.source}_comparison_{job.pk}.{job.export_format}',
+        content_type=EXPORT_CONTENT_TYPES[job.export_format]
+    )
@@ -0,0 +1,50 @@
+# bench_ascii_normalization.py: Compare per-cell ASCII normalization with the memoized batch engine.
+# Usage (from the repository root): python -m benchmarks.bench_ascii_normalization [--cells 1000000]
+import argparse
+import gc
+import time
+import unicodedata
+
+from address_comparison_app.ascii_normalizer import AsciiNormalizer
+from benchmarks.generators import make_vocabulary_records
+
+
+def legacy_normalize(value):
+    """
+    Per-cell normalization as DataHandler._normalize_row did it before the memoized engine.
+    """
+    if isinstance(value, str):
+        return unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+    if isinstance(value, list):
+        return [unicodedata.normalize('NFKD', i).encode('ascii', 'ignore').decode('ascii') if isinstance(i, str) else i for i in value]
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-cell ASCII normalization with the memoized batch engine')
+    parser.add_argument('--cells', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    records = make_vocabulary_records(args.cells)
+    gc.collect()
+    start = time.perf_counter()
+    expected = [{k: legacy_normalize(v) for k, v in row.items()} for row in records]
+    legacy_seconds = time.perf_counter() - start
+
+    normalizer = AsciiNormalizer()
+    batch = [dict(row) for row in records]
+    gc.collect()
+    start = time.perf_counter()
+    normalizer.normalize_records(batch)
+    engine_seconds = time.perf_counter() - start
+
+    assert batch == expected, 'memoized engine output differs from per-cell normalization'
+    print(f'cells:            {len(records) * len(records[0]):,}')
+    print(f'per-cell legacy:  {legacy_seconds:.3f}s')
+    print(f'memoized engine:  {engine_seconds:.3f}s')
+    print(f'speedup:          {legacy_seconds / engine_seconds:.1f}x')
+    print(f'memo table:       {normalizer.cache_info()}')
+
+
+if __name__ == '__main__':
+    main()
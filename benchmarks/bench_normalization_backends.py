@@ -0,0 +1,46 @@
+# bench_normalization_backends.py: Time the pandas and Spark normalization backends on growing document batches.
+# Usage (from the repository root): python -m benchmarks.bench_normalization_backends [--sizes 10000 100000 1000000]
+import argparse
+import gc
+import time
+
+from address_comparison_app.normalization_backends import PandasBackend, SparkBackend, spark_available
+from benchmarks.generators import make_document_batch
+
+
+def timed(backend, documents):
+    gc.collect()
+    start = time.perf_counter()
+    rows = len(backend.normalize(documents))
+    return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the pandas and Spark normalization backends on growing document batches')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 200_000, 1_000_000])
+    parser.add_argument('--master', default=None, help="Spark master (default: SPARK_MASTER, local[*])")
+    args = parser.parse_args()
+
+    backends = [PandasBackend()]
+    if spark_available():
+        spark = SparkBackend(master=args.master)
+        spark.normalize(make_document_batch(100))  # start the session and Python workers outside the timings
+        backends.append(spark)
+    else:
+        print('pyspark is not installed: timing the pandas backend only')
+
+    print(f'{"documents":>10} ' + ' '.join(f'{b.name + " (s)":>12}' for b in backends) + f' {"rows":>10}')
+    crossover = None
+    for size in args.sizes:
+        documents = make_document_batch(size)
+        results = [timed(backend, documents) for backend in backends]
+        print(f'{size:>10,} ' + ' '.join(f'{seconds:>12.3f}' for seconds, _ in results) + f' {results[0][1]:>10,}')
+        if crossover is None and len(results) > 1 and results[1][0] < results[0][0]:
+            crossover = size
+    if len(backends) > 1:
+        print(f'spark faster from: {f"{crossover:,} documents" if crossover else "not within the measured sizes"}'
+              ' (set SPARK_MIN_DOCUMENTS accordingly)')
+
+
+if __name__ == '__main__':
+    main()
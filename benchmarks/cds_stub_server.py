@@ -0,0 +1,210 @@
+# cds_stub_server.py: Local stand-in for the CDS token service and locations endpoint, for offline load tests.
+# Usage (from the repository root):
+#   python -m benchmarks.cds_stub_server [--port 8765] [--latency lognormal:40:0.5] [--rate-429 0.05] [--addresses 5]
+# Point the client at it with MAPTokenService=http://127.0.0.1:8765/token and BasedURLCDS=http://127.0.0.1:8765/
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.generators import make_cds_response
+
+STUB_TOKEN = 'stub-token'
+LOCATIONS_PATH = '/legalentities/firmographics/locations'
+
+
+def parse_latency(spec):
+    """
+    Latency sampler (returning seconds) from a spec in milliseconds: 'fixed:MS', 'uniform:LOW:HIGH',
+    'normal:MEAN:SD', 'lognormal:MEDIAN:SIGMA' or 'exp:MEAN'.
+    """
+    kind, *args = spec.split(':')
+    try:
+        args = [float(a) for a in args]
+        samplers = {
+            'fixed': lambda ms: lambda rng: ms,
+            'uniform': lambda low, high: lambda rng: rng.uniform(low, high),
+            'normal': lambda mean, sd: lambda rng: max(0.0, rng.gauss(mean, sd)),
+            'lognormal': lambda median, sigma: lambda rng: rng.lognormvariate(math.log(max(median, 1e-6)), sigma),
+            'exp': lambda mean: lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0,
+        }
+        sample_ms = samplers[kind](*args)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid latency spec: {spec}")
+    return lambda rng: sample_ms(rng) / 1000
+
+
+@lru_cache(maxsize=65536)
+def locations_payload(identifier, addresses):
+    """
+    JSON body for one entity with `addresses` addresses, deterministic per identifier.
+    """
+    response = make_cds_response(addresses, seed=zlib.crc32(identifier.encode('utf-8')))
+    entity_id = int(identifier) if identifier.isdigit() else 100000000 + zlib.crc32(identifier.encode('utf-8')) % 100000000
+    bvd_id = identifier if not identifier.isdigit() else f'BVD{identifier}'
+    locations = [location for entity in response['data'] for location in entity['locations']]
+    return json.dumps({'data': [{'entityId': entity_id, 'bvdId': bvd_id, 'locations': locations}]}).encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle on, keep-alive clients stall ~40ms on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', headers=None):
+        stub = self.server.stub
+        stub.record(status)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub = self.server.stub
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if urlparse(self.path).path.rstrip('/') != '/token':
+            return self._reply(404, b'{"error": "not found"}')
+        time.sleep(stub.sample(stub.token_latency))
+        self._reply(200, json.dumps({'token': STUB_TOKEN}).encode('utf-8'))
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        if url.path == '/_stats':
+            return self._reply(200, json.dumps(stub.stats()).encode('utf-8'))
+        if url.path.rstrip('/') != LOCATIONS_PATH:
+            return self._reply(404, b'{"error": "not found"}')
+        if self.headers.get('Authorization') != f'Bearer {STUB_TOKEN}':
+            return self._reply(401, b'{"error": "invalid token"}')
+        params = parse_qs(url.query)
+        identifier = (params.get('entityid') or params.get('bvdid') or [''])[0]
+        time.sleep(stub.sample(stub.latency))
+        fault = stub.fault()
+        if fault == 429:
+            return self._reply(429, b'{"error": "too many requests"}', {'Retry-After': str(stub.retry_after)})
+        if fault == 503:
+            return self._reply(503, b'{"error": "unavailable"}')
+        if fault == 404 or not identifier:
+            return self._reply(404, b'{"error": "entity not found"}')
+        self._reply(200, locations_payload(identifier, stub.addresses))
+
+
+# StubCDSServer serves the stand-in endpoints from a ThreadingHTTPServer (one thread per connection),
+# either from the command line or in-process on a background thread (start()/stop() or as a context manager).
+class StubCDSServer:
+    def __init__(self, host='127.0.0.1', port=0, latency='fixed:0', token_latency='fixed:0', rate_429=0.0,
+                 rate_5xx=0.0, rate_404=0.0, addresses=5, retry_after=1, seed=None):
+        self.latency = parse_latency(latency)
+        self.token_latency = parse_latency(token_latency)
+        self.rate_429, self.rate_5xx, self.rate_404 = rate_429, rate_5xx, rate_404
+        self.addresses = addresses
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def sample(self, sampler):
+        with self._lock:
+            return sampler(self._rng)
+
+    def fault(self):
+        """
+        The injected error status for a request (429, 503 or 404), or None.
+        """
+        with self._lock:
+            draw = self._rng.random()
+        for status, rate in ((429, self.rate_429), (503, self.rate_5xx), (404, self.rate_404)):
+            if draw < rate:
+                return status
+            draw -= rate
+        return None
+
+    def record(self, status):
+        with self._lock:
+            self._counts[status] = self._counts.get(status, 0) + 1
+
+    def stats(self):
+        """
+        Responses served so far, by status code.
+        """
+        with self._lock:
+            return {str(status): count for status, count in sorted(self._counts.items())}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='cds-stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def add_server_arguments(parser):
+    """
+    Stand-in server options, shared with the load driver.
+    """
+    parser.add_argument('--latency', default='lognormal:40:0.5', help="Locations latency in ms (fixed:MS, uniform:LOW:HIGH, "
+                                                                     "normal:MEAN:SD, lognormal:MEDIAN:SIGMA, exp:MEAN)")
+    parser.add_argument('--token-latency', default='fixed:100', help="Token endpoint latency in ms")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction of lookups answered 429 Too Many Requests")
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help="Fraction of lookups answered 503")
+    parser.add_argument('--rate-404', type=float, default=0.0, help="Fraction of lookups answered 404")
+    parser.add_argument('--retry-after', type=float, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--addresses', type=int, default=5, help="Addresses per entity (payload size)")
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def server_from_args(args, host='127.0.0.1', port=0):
+    return StubCDSServer(host, port, latency=args.latency, token_latency=args.token_latency, rate_429=args.rate_429,
+                         rate_5xx=args.rate_5xx, rate_404=args.rate_404, addresses=args.addresses,
+                         retry_after=args.retry_after, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in CDS server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    server = server_from_args(args, args.host, args.port)
+    print(f'CDS stand-in listening on {server.url} (token: {server.url}/token, base URL: {server.url}/)')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
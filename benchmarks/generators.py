@@ -0,0 +1,175 @@
+# generators.py: Deterministic synthetic MongoDB documents, CDS API responses and address frames for benchmarks.
+import random
+
+import pandas as pd
+
+CITIES = ['Málaga', 'São Paulo', 'Zürich', 'Kraków', 'Besançon', 'Łódź', 'Córdoba', 'Malmö',
+          'London', 'New York', 'Toronto', 'Berlin', 'Paris', 'Madrid']
+STREETS = ['Calle de Alcalá', 'Rua Augusta', 'Bahnhofstraße', 'Main Street', 'Avenue des Champs-Élysées',
+           'Queen Street West', 'Via Roma', 'Rue de Rivoli', 'Broadway', 'High St']
+COUNTRIES = [('ES', 'España', 'Spain'), ('BR', 'Brasil', 'Brazil'), ('CH', 'Schweiz', 'Switzerland'),
+             ('PL', 'Polska', 'Poland'), ('GB', 'United Kingdom', 'United Kingdom'), ('DE', 'Deutschland', 'Germany')]
+PROVIDERS = ['Loqate', 'Loqate', 'Loqate', 'Internal', 'Other']
+CATEGORIES = [('REG', 'Registered address'), ('HQ', 'Headquarters'), ('BR', 'Branch')]
+
+
+def _address_parts(rng):
+    """
+    One reported address and its standardized counterpart (sometimes abbreviated or upper-cased).
+    """
+    number = rng.randint(1, 999)
+    street = rng.choice(STREETS)
+    city = rng.choice(CITIES)
+    code, local_name, english_name = rng.choice(COUNTRIES)
+    post_code = f'{rng.randint(10000, 99999)}'
+    line = f'{street} {number}'
+    standardized_line = line.upper() if rng.random() < 0.3 else line.replace('Street', 'St')
+    reported = {
+        'addressLines': [line, f'Floor {rng.randint(1, 20)}'] if rng.random() < 0.3 else [line],
+        'city': city,
+        'postCode': post_code,
+        'phoneNumbers': [f'+{rng.randint(10, 99)} {rng.randint(100000000, 999999999)}'],
+        'faxNumbers': [],
+    }
+    standardized = {
+        'addressLines': [standardized_line],
+        'provider': rng.choice(PROVIDERS),
+        'verificationCode': f'V{rng.randint(1, 4)}-P{rng.randint(1, 4)}',
+        'qualityIndex': rng.choice(['A', 'B', 'C', 'D']),
+        'countryName': english_name,
+        'locality': city if rng.random() < 0.9 else None,
+        'thoroughfare': street,
+        'premise': str(number),
+        'postalCode': post_code if rng.random() < 0.9 else f'{rng.randint(10000, 99999)}',
+        'longitude': round(rng.uniform(-120, 120), 6),
+        'latitude': round(rng.uniform(-60, 60), 6),
+    }
+    return reported, standardized, (code, local_name, english_name)
+
+
+def _mongo_document(rng, index, limit, max_addresses, max_localized):
+    """
+    One MongoDB document of 1..max_addresses addresses of 1..max_localized variants each, holding at
+    most `limit` localized addresses; returns the document and the number of localized addresses in it.
+    """
+    addresses = []
+    used = 0
+    for _ in range(rng.randint(1, max_addresses)):
+        localized = []
+        for _ in range(min(limit - used, rng.randint(1, max_localized))):
+            reported, standardized, _ = _address_parts(rng)
+            standardized.update({'ISO31662': None, 'ISO31663': None, 'ISO3166N': None})
+            localized.append({'reportedAddress': reported, 'standardizedAddress': standardized})
+            used += 1
+        if localized:
+            addresses.append({'localizedAddresses': localized})
+    return {'_id': f'BVD{index:09d}', 'd': {'addresses': addresses}}, used
+
+
+def make_mongo_documents(rows, seed=42, max_addresses=2, max_localized=2):
+    """
+    Documents shaped like the MongoDB collection (d.addresses[].localizedAddresses[]) holding exactly
+    `rows` localized addresses in total, 1..max_addresses addresses of 1..max_localized variants each.
+    """
+    rng = random.Random(seed)
+    documents = []
+    remaining = rows
+    while remaining > 0:
+        document, used = _mongo_document(rng, len(documents), remaining, max_addresses, max_localized)
+        documents.append(document)
+        remaining -= used
+    return documents
+
+
+def make_document_batch(count, seed=42, max_addresses=2, max_localized=2):
+    """
+    Exactly `count` documents shaped like make_mongo_documents (for batch sizes measured in documents).
+    """
+    rng = random.Random(seed)
+    limit = max_addresses * max_localized
+    return [_mongo_document(rng, i, limit, max_addresses, max_localized)[0] for i in range(count)]
+
+
+def make_cds_response(rows, seed=42, max_locations=3, max_addresses=2):
+    """
+    A CDS firmographics/locations response (data[].locations[].addresses[]) holding exactly `rows`
+    addresses, spread over entities of 1..max_locations locations with 1..max_addresses addresses each.
+    """
+    rng = random.Random(seed)
+    entities = []
+    remaining = rows
+    while remaining > 0:
+        locations = []
+        for _ in range(rng.randint(1, max_locations)):
+            addresses = []
+            for _ in range(min(remaining, rng.randint(1, max_addresses))):
+                reported, standardized, (code, local_name, _) = _address_parts(rng)
+                reported['country'] = {'code': code, 'label': local_name}
+                standardized.update({'iso31662': code, 'iso31663': None, 'iso3166N': None})
+                addresses.append({'reported': reported, 'standardized': standardized})
+                remaining -= 1
+            if addresses:
+                category_code, category_label = rng.choice(CATEGORIES)
+                locations.append({'categories': [{'code': category_code, 'label': category_label}], 'addresses': addresses})
+        entities.append({'entityId': 100000000 + len(entities), 'bvdId': f'BVD{len(entities):09d}', 'locations': locations})
+    return {'data': entities}
+
+
+def perturb(rng, value):
+    """
+    Standardizer-like variation: abbreviation, case change, dropped or swapped character.
+    """
+    pick = rng.random()
+    if pick < 0.4:
+        return value
+    if pick < 0.6:
+        return value.upper()
+    if pick < 0.8 and len(value) > 3:
+        i = rng.randrange(len(value) - 1)
+        return value[:i] + value[i + 1:]
+    return value.replace('Street', 'St').replace('Avenue', 'Ave')
+
+
+def make_similarity_frame(rows, seed=42):
+    """
+    An explode_location_data-shaped DataFrame of `rows` reported/standardized column pairs, the
+    standardized side perturbed like a standardizer's output (with some missing or wrong values).
+    """
+    rng = random.Random(seed)
+    data = {name: [] for name in (
+        'reported_address_lines', 'standardized_address_lines', 'reported_city', 'standardized_locality',
+        'reported_post_code', 'standardized_postal_code', 'reported_country_label', 'standardized_country_name')}
+    for _ in range(rows):
+        reported, _, (_, _, country) = _address_parts(rng)
+        line, city, code = reported['addressLines'][0], reported['city'], reported['postCode']
+        data['reported_address_lines'].append(line)
+        data['standardized_address_lines'].append(perturb(rng, line))
+        data['reported_city'].append(city)
+        data['standardized_locality'].append(perturb(rng, city) if rng.random() > 0.05 else None)
+        data['reported_post_code'].append(code)
+        data['standardized_postal_code'].append(code if rng.random() > 0.1 else f'{rng.randint(10000, 99999)}')
+        data['reported_country_label'].append(country)
+        data['standardized_country_name'].append(country)
+    return pd.DataFrame(data)
+
+
+def make_vocabulary_records(cells, columns=10, seed=42):
+    """
+    Row dicts totalling roughly `cells` cells drawn from the address vocabulary above (accented and
+    plain ASCII values), with some list and None cells.
+    """
+    vocabulary = CITIES + STREETS + PROVIDERS[:2] + [name for country in COUNTRIES for name in country[1:]]
+    rng = random.Random(seed)
+    records = []
+    for _ in range(max(1, cells // columns)):
+        row = {}
+        for c in range(columns):
+            pick = rng.random()
+            if pick < 0.1:
+                row[f'col{c}'] = None
+            elif pick < 0.2:
+                row[f'col{c}'] = [rng.choice(vocabulary), rng.choice(vocabulary)]
+            else:
+                row[f'col{c}'] = rng.choice(vocabulary)
+        records.append(row)
+    return records
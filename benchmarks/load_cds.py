@@ -0,0 +1,239 @@
+# load_cds.py: Load-test CDSClient and the unified lookup views against the local CDS stand-in server,
+# reporting throughput and p50/p95/p99 latency.
+# Usage (from the repository root):
+#   python -m benchmarks.load_cds [--target client|view|view-async] [--requests 2000] [--concurrency 16]
+#                                 [--latency lognormal:40:0.5] [--rate-429 0.05] [--url http://127.0.0.1:8765]
+#                                 [--no-token-cache]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.cds_stub_server import add_server_arguments, server_from_args
+
+VIEW_PATHS = {'view': '/address-comparison/unified-lookup/', 'view-async': '/address-comparison/unified-lookup/async/'}
+
+
+def configure_environment(url, cache, token_cache_dir=None):
+    """
+    Point CDSConfig.from_env at the stand-in server (set before the client or Django reads it).
+    The response cache is off unless requested, so every lookup reaches the server. The file token
+    cache stays on as in production, in token_cache_dir (a fresh directory, so the run starts without
+    a token); without a directory it is disabled and every client fetches its own token.
+    """
+    os.environ.update({
+        'MAPTokenService': f'{url}/token', 'BasedURLCDS': f'{url}/', 'ApiName': 'stub', 'PEToken': 'stub',
+        'CookieGT': '', 'CookieCDS': '', 'CDSCacheTTL': str(900 if cache else 0), 'ADDRESS_SNAPSHOT_PATH': '',
+        'CDSTokenCache': '1' if token_cache_dir else '0', 'CDSTokenCacheDir': token_cache_dir or '',
+    })
+    os.environ.setdefault('DjangoKey', 'load-test-only')
+
+
+def client_target():
+    """
+    One lookup through a CDSClient shared by all threads, as the views and jobs use it.
+    """
+    from address_comparison_app.cds_client import CDSClient
+    client = CDSClient()
+
+    def lookup(identifier):
+        client.lookup_entity(identifier)
+    return lookup
+
+
+def setup_django():
+    """
+    Configure Django for the view targets; lookups do not use comparison jobs, so job recovery
+    (which needs a migrated database) is not hooked to the first request.
+    """
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webapp.settings')
+    django.setup()
+    from django.core.signals import request_started
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    request_started.disconnect(dispatch_uid='address_comparison_app.recover_jobs')
+
+
+def check_response(response):
+    """
+    Raise for a failed lookup: a non-200 status or a rendered error message.
+    """
+    if response.status_code != 200:
+        raise RuntimeError(f'HTTP {response.status_code}')
+    if response.context['error']:
+        raise RuntimeError(response.context['error'])
+
+
+def view_target(path):
+    """
+    One POST of the unified lookup form (CDS source) through the Django test client (WSGI request
+    path), one client per thread.
+    """
+    setup_django()
+    from django.test import Client
+    local = threading.local()
+
+    def lookup(identifier):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        check_response(local.client.post(path, {'data_source': 'cds', 'identifier': identifier}))
+    return lookup
+
+
+def async_view_target(path):
+    """
+    One POST of the unified lookup form (CDS source) through Django's ASGI test client, awaited on
+    the driver's event loop, so the async view runs natively rather than on a worker thread.
+    """
+    setup_django()
+    from django.test import AsyncClient
+    client = AsyncClient()
+
+    async def lookup(identifier):
+        check_response(await client.post(path, {'data_source': 'cds', 'identifier': identifier}))
+    return lookup
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def run_load(lookup, identifiers, concurrency):
+    """
+    Issue one lookup per identifier from concurrency threads; returns (latencies, errors, elapsed seconds).
+    """
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def timed(identifier):
+        start = time.perf_counter()
+        try:
+            lookup(identifier)
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, identifiers))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run_load_async(lookup, identifiers, concurrency):
+    """
+    Await one lookup per identifier on a single event loop, at most concurrency in flight;
+    returns (latencies, errors, elapsed seconds) like run_load.
+    """
+    latencies = []
+    errors = {}
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(identifier):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await lookup(identifier)
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed(identifier) for identifier in identifiers))
+        return time.perf_counter() - started
+
+    return latencies, errors, asyncio.run(run())
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        'requests': len(latencies), 'errors': sum(errors.values()), 'error_types': errors,
+        'seconds': round(elapsed, 3), 'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 0.50)), 'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)), 'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def server_stats(url):
+    import requests
+    try:
+        return requests.get(f'{url}/_stats', timeout=5).json()
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test CDSClient and the unified lookup views against a CDS stand-in')
+    parser.add_argument('--target', choices=['client', *VIEW_PATHS], default='client')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--distinct', type=int, default=0, help="Distinct identifiers cycled through (default: one per request)")
+    parser.add_argument('--cache', action='store_true', help="Keep the CDS response cache on (CDSCacheTTL=900)")
+    parser.add_argument('--no-token-cache', action='store_true',
+                        help="Disable the shared file token cache (CDSTokenCache=0), reported as a separate variant")
+    parser.add_argument('--url', help="Use an already running stand-in instead of starting one in-process")
+    parser.add_argument('--warmup', type=int, default=20, help="Untimed requests before the run (token fetch, connections)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    logging.getLogger('address_comparison_app').setLevel(logging.WARNING)
+
+    server = None if args.url else server_from_args(args).start()
+    url = (args.url or server.url).rstrip('/')
+    token_cache_dir = None if args.no_token_cache else tempfile.mkdtemp(prefix='cds-token-cache-')
+    configure_environment(url, args.cache, token_cache_dir)
+    try:
+        if args.target == 'client':
+            lookup, runner = client_target(), run_load
+        elif args.target == 'view-async':
+            lookup, runner = async_view_target(VIEW_PATHS[args.target]), run_load_async
+        else:
+            lookup, runner = view_target(VIEW_PATHS[args.target]), run_load
+        distinct = args.distinct or args.requests
+        identifiers = [str(100000000 + i % distinct) for i in range(args.requests)]
+        warmup = [str(200000000 + i) for i in range(args.warmup)]
+        runner(lookup, warmup, min(args.concurrency, max(1, args.warmup)))
+        report = summarize(*runner(lookup, identifiers, args.concurrency))
+        report.update({'target': args.target, 'concurrency': args.concurrency, 'token_cache': token_cache_dir is not None,
+                       'server_responses': server_stats(url)})
+    finally:
+        if server is not None:
+            server.stop()
+        if token_cache_dir is not None:
+            shutil.rmtree(token_cache_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    variant = '' if report['token_cache'] else ' (no token cache)'
+    print(f"{report['target']}{variant}: {report['requests']:,} requests, concurrency {report['concurrency']}, "
+          f"{report['errors']:,} errors {report['error_types'] or ''}")
+    print(f"throughput {report['throughput_rps']} req/s over {report['seconds']} s")
+    print(f"latency ms  p50 {report['p50_ms']}  p95 {report['p95_ms']}  p99 {report['p99_ms']}  max {report['max_ms']}")
+    print(f"server responses by status (incl. warm-up and retries): {report['server_responses']}")
+
+
+if __name__ == '__main__':
+    main()
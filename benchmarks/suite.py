@@ -0,0 +1,215 @@
+# suite.py: Time and peak-memory benchmarks of the normalization, flattening, grouping and rendering paths.
+# Usage (from the repository root):
+#   python -m benchmarks.suite [--sizes 1000 100000 1000000] [--cases normalize_addresses ...] [--compare OLD.json]
+# Results are written to benchmarks/results/<timestamp>.json; --compare prints the change against an earlier run.
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webapp.settings')
+django.setup()
+
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from address_comparison_app.ascii_normalizer import AsciiNormalizer
+from address_comparison_app.cds_client import LOCATION_COLUMNS, explode_location_data, location_records
+from address_comparison_app.comparison import compare_cds_rows, compare_mongo_rows
+from address_comparison_app.data_handler import ADDRESS_COLUMNS, DataHandler
+from address_comparison_app.normalization_backends import PandasBackend
+from benchmarks.generators import make_cds_response, make_mongo_documents
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class Fixtures:
+    """
+    Inputs of one size, built lazily and shared by the cases (never part of a measurement).
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self._cache = {}
+
+    def _get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def documents(self):
+        return self._get('documents', lambda: make_mongo_documents(self.rows))
+
+    @property
+    def raw_rows(self):
+        return self._get('raw_rows', lambda: list(DataHandler(None)._iter_rows(self.documents)))
+
+    @property
+    def mongo_records(self):
+        return self._get('mongo_records', lambda: DataHandler(None, AsciiNormalizer()).flatten_addresses(self.documents).to_dict('records'))
+
+    @property
+    def cds_response(self):
+        return self._get('cds_response', lambda: make_cds_response(self.rows))
+
+    @property
+    def cds_rows(self):
+        return self._get('cds_rows', lambda: location_records(self.cds_response))
+
+
+def case_normalize_addresses(fixtures):
+    handler = DataHandler(None, AsciiNormalizer(), backend=PandasBackend())
+    return lambda: handler.normalize_addresses(fixtures.documents)
+
+
+def case_normalize_row(fixtures):
+    rows = fixtures.raw_rows
+    def run():
+        handler = DataHandler(None, AsciiNormalizer())
+        return [handler._normalize_row(row) for row in rows]
+    return run
+
+
+def case_explode_location_data(fixtures):
+    return lambda: explode_location_data(fixtures.cds_response)
+
+
+def case_group_mongo_rows(fixtures):
+    return lambda: compare_mongo_rows(fixtures.mongo_records)
+
+
+def case_group_cds_rows(fixtures):
+    return lambda: compare_cds_rows(fixtures.cds_rows, 'BVD000000000')
+
+
+def case_render_mongo_query(fixtures):
+    request = RequestFactory().post('/address-comparison/mongo/')
+    records = fixtures.mongo_records
+    def run():
+        groups = compare_mongo_rows(records)
+        context = {'result': records, 'grouped_result': groups, 'address_comparison': groups, 'error': None,
+                   'columns': ADDRESS_COLUMNS, 'selected_columns': ADDRESS_COLUMNS, 'loqate_checked': False,
+                   'ids': '', 'page_size': len(groups), 'next_cursor': None}
+        return render_to_string('address_comparison_app/mongo_query.html', context, request)
+    return run
+
+
+def case_render_unified_lookup(fixtures):
+    request = RequestFactory().post('/address-comparison/unified-lookup/')
+    rows = fixtures.cds_rows
+    def run():
+        result, groups = compare_cds_rows(rows, 'BVD000000000')
+        context = {'form': None, 'result': result, 'columns': LOCATION_COLUMNS, 'error': None, 'loqate_checked': False,
+                   'address_comparison': groups, 'entity_comparison': []}
+        return render_to_string('address_comparison_app/unified_lookup.html', context, request)
+    return run
+
+
+CASES = {
+    'normalize_addresses': case_normalize_addresses,
+    'normalize_row': case_normalize_row,
+    'explode_location_data': case_explode_location_data,
+    'group_mongo_rows': case_group_mongo_rows,
+    'group_cds_rows': case_group_cds_rows,
+    'render_mongo_query': case_render_mongo_query,
+    'render_unified_lookup': case_render_unified_lookup,
+}
+
+
+def measure(run, repeat=3, memory=True):
+    """
+    Best and mean wall time over repeat runs, then the peak traced allocation of one more run
+    (tracemalloc slows execution, so it never overlaps the timed runs).
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+        del result
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = run()
+            peak = tracemalloc.get_traced_memory()[1]
+            del result
+        finally:
+            tracemalloc.stop()
+    return {'seconds': min(times), 'mean_seconds': sum(times) / len(times), 'peak_bytes': peak}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """
+    Print each case's time and peak memory relative to an earlier results file.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['case'], r['rows']): r for r in json.load(f)['results']}
+    print(f'\ncompared with {baseline_path}:')
+    for r in results:
+        old = baseline.get((r['case'], r['rows']))
+        if old is None:
+            continue
+        time_ratio = r['seconds'] / old['seconds'] if old['seconds'] else float('nan')
+        memory = ''
+        if r['peak_bytes'] and old.get('peak_bytes'):
+            memory = f"  memory x{r['peak_bytes'] / old['peak_bytes']:.2f}"
+        print(f"{r['case']:<24} {r['rows']:>10,}  time x{time_ratio:.2f}{memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite for the address comparison app')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000], help="Address rows per input")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory run")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', metavar='OLD_JSON', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    results = []
+    print(f'{"case":<24} {"rows":>10} {"best (s)":>10} {"mean (s)":>10} {"peak (MiB)":>11}')
+    for size in args.sizes:
+        fixtures = Fixtures(size)
+        for name in args.cases:
+            run = CASES[name](fixtures)
+            run()  # warm-up (template loading, fixture construction)
+            stats = measure(run, max(1, args.repeat), memory=not args.no_memory)
+            results.append({'case': name, 'rows': size, **stats})
+            peak = f"{stats['peak_bytes'] / 2 ** 20:>11.1f}" if stats['peak_bytes'] is not None else f'{"-":>11}'
+            print(f"{name:<24} {size:>10,} {stats['seconds']:>10.4f} {stats['mean_seconds']:>10.4f} {peak}")
+        del fixtures
+        gc.collect()
+
+    output = args.output or os.path.join(RESULTS_DIR, started.strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'started_at': started.isoformat(), 'git_commit': git_commit(), 'python': sys.version.split()[0],
+            'platform': platform.platform(), 'repeat': args.repeat, 'results': results,
+        }, f, indent=2)
+    print(f'\nresults written to {output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -85,6 +85,11 @@ DATABASES = {
     }
 }
 
+# Shared MongoClient tuning (see address_comparison_app.data_handler.get_shared_client)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_MAX_TIME_MS = int(os.environ.get('MONGO_MAX_TIME_MS', '30000'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators